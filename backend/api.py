@@ -2,13 +2,26 @@ import asyncio
 import json
 import logging
 import os
-from typing import AsyncGenerator
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, Dict, Optional
 
 from fastapi import FastAPI
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import BaseMessage, HumanMessage
+from langgraph.types import Command
 from langgraph_agent.graph.graph import agent_graph
+from langgraph_agent.graph.llm import warmup_llm_clients, close_llm_clients, get_llm_pool_metrics
+from langgraph_agent.graph.checkpointer import get_checkpointer, get_checkpointer_metrics
+from langgraph_agent.graph.a2a_directory import get_a2a_directory
+from langgraph_agent.graph.mcp_client import MCPConnectionManager
+from langgraph_agent.graph.fast_path import get_fast_path_stats
+from langgraph_agent.graph.intent_classifier import get_intent_classifier_stats
+from langgraph_agent.graph.http_session import close_http_sessions, get_http_session_metrics
+from langgraph_agent.graph.circuit_breaker import get_circuit_breaker_stats
+from langgraph_agent.prompts.builders.supervisor_builder import get_supervisor_cache_stats
+from langgraph_agent.config import global_config
 
 def setup_logging():
 
@@ -34,30 +47,287 @@ def setup_logging():
 # Initialize logging
 setup_logging()
 
-app = FastAPI(title="Juzhigongfang Agent API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 启动时预热共享 LLM 客户端与连接池
+    try:
+        warmup_llm_clients()
+    except Exception as e:
+        logging.warning(f"LLM client warmup failed: {e}")
+    # 并发预取 A2A agent card，并启动后台刷新
+    try:
+        await get_a2a_directory().start(global_config.load_a2a_config())
+    except Exception as e:
+        logging.warning(f"A2A directory warmup failed: {e}")
+    yield
+    # 关闭时释放连接池
+    await get_a2a_directory().close()
+    await close_llm_clients()
+    await close_http_sessions()
+
+app = FastAPI(title="Juzhigongfang Agent API", lifespan=lifespan)
 
 class ChatRequest(BaseModel):
     content: str
+    # 为 True 时通过 astream_events 实时推送 token / 节点 / 工具 / 日志事件
+    stream: bool = False
+    # 会话ID，作为 checkpointer 的 thread_id；携带相同ID的后续请求从已保存的状态继续。
+    # 未提供时本次请求使用临时会话，执行结束后删除其检查点
+    session_id: Optional[str] = None
+
+# 工具结果在 SSE 中的最大长度，避免大段搜索结果阻塞前端
+STREAM_TOOL_OUTPUT_MAX_CHARS = int(os.getenv("STREAM_TOOL_OUTPUT_MAX_CHARS", "2000"))
+# 工具参数中由框架注入的字段，不向前端转发
+_INJECTED_TOOL_ARGS = {"state", "special_config_param"}
+# 图中的业务节点名称，用于从 astream_events 中过滤出节点切换事件
+_GRAPH_NODE_NAMES = set(getattr(agent_graph, "nodes", {}) or {}) - {"__start__", "__end__"}
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no" # Disable buffering for Nginx/proxies
+}
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """格式化一条带类型的 SSE 事件"""
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+def _truncate(value: Any, limit: int = STREAM_TOOL_OUTPUT_MAX_CHARS) -> str:
+    text = value if isinstance(value, str) else str(value)
+    if len(text) > limit:
+        return text[:limit] + "...(truncated)"
+    return text
+
+
+def _chunk_text(chunk: Any) -> str:
+    """从 AIMessageChunk 中提取文本增量（兼容 content 为 list 的情况）"""
+    content = getattr(chunk, "content", "")
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            part.get("text", "") if isinstance(part, dict) else str(part)
+            for part in content
+        )
+    return ""
+
+
+def _tool_output_text(output: Any) -> str:
+    """工具返回 (state, message) 元组或 ToolMessage，这里只取可展示的部分"""
+    if isinstance(output, tuple) and output:
+        output = output[-1]
+    if isinstance(output, BaseMessage):
+        output = output.content
+    return _truncate(output)
+
+
+def _extract_logs(output: Any) -> Optional[list]:
+    """从节点输出（dict 或 Command）或中间状态中取出 logs"""
+    update = output.update if isinstance(output, Command) else output
+    if isinstance(update, dict):
+        logs = update.get("logs")
+        if isinstance(logs, list):
+            return logs
+    return None
+
+
+class _LogsTracker:
+    """记录已推送的 logs，只转发新增或状态发生变化的条目"""
+
+    def __init__(self):
+        self._sent: Dict[int, str] = {}
+
+    def diff(self, logs: list) -> list:
+        changed = []
+        for index, entry in enumerate(logs):
+            fingerprint = json.dumps(entry, ensure_ascii=False, sort_keys=True, default=str)
+            if self._sent.get(index) != fingerprint:
+                self._sent[index] = fingerprint
+                changed.append({"index": index, "entry": entry})
+        return changed
+
+
+def _convert_stream_event(event: Dict[str, Any], logs_tracker: _LogsTracker) -> list:
+    """将 astream_events(v2) 事件转换为前端可消费的 SSE 事件列表"""
+    kind = event.get("event")
+    name = event.get("name", "")
+    data = event.get("data", {}) or {}
+    metadata = event.get("metadata", {}) or {}
+    node = metadata.get("langgraph_node")
+    out = []
+
+    if kind == "on_chat_model_stream":
+        text = _chunk_text(data.get("chunk"))
+        if text:
+            out.append(_sse("token", {"node": node, "content": text}))
+
+    elif kind in ("on_chain_start", "on_chain_end") and name in _GRAPH_NODE_NAMES and node == name:
+        status = "start" if kind == "on_chain_start" else "end"
+        out.append(_sse("node", {"node": name, "status": status}))
+        if kind == "on_chain_end":
+            logs = _extract_logs(data.get("output"))
+            if logs:
+                for item in logs_tracker.diff(logs):
+                    out.append(_sse("log", item))
+
+    elif kind == "on_tool_start":
+        args = data.get("input")
+        if isinstance(args, dict):
+            args = {k: v for k, v in args.items() if k not in _INJECTED_TOOL_ARGS}
+        out.append(_sse("tool", {
+            "node": node,
+            "name": name,
+            "status": "start",
+            "run_id": event.get("run_id"),
+            "args": args,
+        }))
+
+    elif kind in ("on_tool_end", "on_tool_error"):
+        payload = {
+            "node": node,
+            "name": name,
+            "status": "end" if kind == "on_tool_end" else "error",
+            "run_id": event.get("run_id"),
+        }
+        if kind == "on_tool_end":
+            payload["output"] = _tool_output_text(data.get("output"))
+        else:
+            payload["error"] = str(data.get("error"))
+        out.append(_sse("tool", payload))
+
+    elif kind == "on_custom_event":
+        if name == "copilotkit_manually_emit_message":
+            out.append(_sse("message", {"node": node, **data}))
+        elif name == "copilotkit_manually_emit_tool_call":
+            out.append(_sse("tool_call", {"node": node, **data}))
+        elif name == "copilotkit_manually_emit_intermediate_state":
+            logs = _extract_logs(data)
+            if logs:
+                for item in logs_tracker.diff(logs):
+                    out.append(_sse("log", item))
+
+    return out
+
+
+def _final_content(result: Any) -> str:
+    if not isinstance(result, dict):
+        return ""
+    messages = result.get("messages", [])
+    if messages:
+        return messages[-1].content
+    return ""
+
+
+def _session_config(session_id: str) -> Dict[str, Any]:
+    return {"configurable": {"thread_id": session_id, "session_id": session_id}}
+
+
+async def _release_session(session_id: str) -> None:
+    """删除临时会话的检查点，未携带 session_id 的请求不会被续接"""
+    checkpointer = get_checkpointer()
+    if checkpointer is None:
+        return
+    try:
+        await checkpointer.adelete_thread(session_id)
+    except Exception as e:
+        logging.warning(f"Failed to release checkpoint for {session_id}: {e}")
+
+
+async def _run_graph(state: Dict[str, Any], session_id: str, persist: bool) -> Any:
+    try:
+        # 为避免容器环境中 LangGraph 节点调用缺少 config 参数的问题，这里显式传入 config
+        return await agent_graph.ainvoke(state, _session_config(session_id))
+    finally:
+        if not persist:
+            await _release_session(session_id)
+
+
+async def _stream_graph_events(
+        state: Dict[str, Any],
+        session_id: str,
+        persist: bool = True,
+) -> AsyncGenerator[str, None]:
+    """
+    通过 astream_events 实时转发图执行过程，空闲时发送 keep-alive 注释。
+    生产者在独立任务中运行，客户端断开时取消该任务；persist 为 False 时结束后删除检查点。
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    async def produce():
+        logs_tracker = _LogsTracker()
+        final_state = None
+        try:
+            async for event in agent_graph.astream_events(state, _session_config(session_id), version="v2"):
+                # 顶层图结束事件携带最终状态
+                if event.get("event") == "on_chain_end" and not event.get("parent_ids"):
+                    final_state = (event.get("data") or {}).get("output")
+                for item in _convert_stream_event(event, logs_tracker):
+                    await queue.put(item)
+            await queue.put(_sse("final", {
+                "content": _final_content(final_state),
+                "session_id": session_id if persist else None,
+            }))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Error streaming agent: {e}")
+            await queue.put(_sse("error", {"error": str(e)}))
+        finally:
+            if not persist:
+                await _release_session(session_id)
+            await queue.put(done)
+
+    task = asyncio.create_task(produce())
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=1.0)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if item is done:
+                break
+            yield item
+    finally:
+        if not task.done():
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+
 
 @app.post("/chat")
 async def chat_endpoint(request: ChatRequest):
     """
     Endpoint that accepts a content string, invokes the agent graph,
     and returns the last message content via SSE to avoid timeouts.
+
+    With ``stream=true`` the graph is run via ``astream_events`` and token
+    deltas, node transitions, tool calls and log entries are forwarded as
+    typed SSE events (token / node / tool / tool_call / message / log / final / error).
     """
-    
-    async def event_generator() -> AsyncGenerator[str, None]:
-        # Initialize state with the user's message
-        state = {
-            "messages": [HumanMessage(content=request.content)],
-        }
-        
-        # 为避免容器环境中 LangGraph 节点调用缺少 config 参数的问题，这里显式传入 config
-        task = asyncio.create_task(
-            agent_graph.ainvoke(
-                state
-            )
+
+    # Initialize state with the user's message
+    persist = bool(request.session_id)
+    session_id = request.session_id or f"session_{uuid.uuid4().hex}"
+    state = {
+        "messages": [HumanMessage(content=request.content)],
+    }
+
+    if request.stream:
+        return StreamingResponse(
+            _stream_graph_events(state, session_id, persist),
+            media_type="text/event-stream",
+            headers=SSE_HEADERS
         )
+
+    async def event_generator() -> AsyncGenerator[str, None]:
+        task = asyncio.create_task(_run_graph(state, session_id, persist))
         
         try:
             # Loop while the task is running
@@ -72,12 +342,10 @@ async def chat_endpoint(request: ChatRequest):
 
             result = await task
             
-            messages = result.get("messages", [])
-            final_content = ""
-            if messages:
-                final_content = messages[-1].content
-            
-            payload = json.dumps({"content": final_content}, ensure_ascii=False)
+            payload = json.dumps(
+                {"content": _final_content(result), "session_id": session_id if persist else None},
+                ensure_ascii=False,
+            )
             yield f"data: {payload}\n\n"
             
         except Exception as e:
@@ -88,16 +356,28 @@ async def chat_endpoint(request: ChatRequest):
     return StreamingResponse(
         event_generator(), 
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no" # Disable buffering for Nginx/proxies
-        }
+        headers=SSE_HEADERS
     )
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Expose connection pool usage metrics."""
+    return {
+        "llm_pool": get_llm_pool_metrics(),
+        "http_sessions": get_http_session_metrics(),
+        "checkpointer": get_checkpointer_metrics(),
+        "a2a_directory": get_a2a_directory().stats(),
+        "mcp_servers": MCPConnectionManager.get_instance().get_server_health(),
+        "supervisor_cache": get_supervisor_cache_stats(),
+        "supervisor_routing": get_fast_path_stats(),
+        "coordinator_classifier": get_intent_classifier_stats(),
+        "a2a_circuit_breakers": get_circuit_breaker_stats(),
+    }
+
 if __name__ == "__main__":
     import uvicorn
     # Run the server
     uvicorn.run("api:app", host="0.0.0.0", port=18100, reload=True)
 
 ## curl -N -X POST http://localhost:18100/chat -H "Content-Type: application/json" -d '{"content": "你好"}'
+## curl -N -X POST http://localhost:18100/chat -H "Content-Type: application/json" -d '{"content": "你好", "stream": true}'
@@ -64,6 +64,12 @@ class Config(BaseSettings):
     
     A2A_SERVERS_CONFIG: str = os.getenv("A2A_SERVERS_CONFIG", "config/a2a_server.json")
 
+    # 是否将通过 npx mcp-remote 桥接的 joinai-* 服务改为直接使用 streamable_http 连接
+    MCP_NATIVE_HTTP: bool = os.getenv("MCP_NATIVE_HTTP", "true").lower() in ("1", "true", "yes")
+
+    # 自动改用 streamable_http 的服务名前缀（逗号分隔）
+    MCP_NATIVE_HTTP_PREFIXES: str = os.getenv("MCP_NATIVE_HTTP_PREFIXES", "joinai-")
+
     async def load_mcp_config(self) -> Dict[str, Any]:
         """
         加载并解析MCP服务器配置文件（异步版本）。
@@ -129,6 +135,9 @@ class Config(BaseSettings):
             except Exception as e:
                 logger.warning(f"处理 joinai-serper/joinai-serpapi/joinai-jina 配置失败: {e}")
 
+            if self.MCP_NATIVE_HTTP:
+                config_data = self._use_native_http_transport(config_data)
+
             logger.info(f"成功加载MCP配置文件: {config_path}")
             return config_data
         except FileNotFoundError:
@@ -141,6 +150,59 @@ class Config(BaseSettings):
             logger.error(f"读取MCP配置文件时发生错误: {e}")
             raise
 
+    def _use_native_http_transport(self, config_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        将 joinai-* 服务的 `npx mcp-remote <url>` stdio 桥接配置改写为直接的 streamable_http 连接，
+        省去每个服务的 Node 进程与一次额外转发。
+        """
+        prefixes = tuple(p.strip() for p in self.MCP_NATIVE_HTTP_PREFIXES.split(",") if p.strip())
+        result = {}
+        for name, conn in config_data.items():
+            native = None
+            if prefixes and name.startswith(prefixes):
+                native = self._mcp_remote_to_streamable_http(conn)
+            if native is not None:
+                logger.info(f"MCP服务 {name} 使用 streamable_http 直连: {native['url']}")
+                result[name] = native
+            else:
+                result[name] = conn
+        return result
+
+    @staticmethod
+    def _mcp_remote_to_streamable_http(conn: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """解析 mcp-remote 参数，返回等价的 streamable_http 配置；不是 mcp-remote 桥接时返回 None"""
+        if conn.get("transport") != "stdio":
+            return None
+        args = list(conn.get("args") or [])
+        if "mcp-remote" not in args:
+            return None
+
+        url = None
+        headers = {}
+        rest = args[args.index("mcp-remote") + 1:]
+        i = 0
+        while i < len(rest):
+            arg = rest[i]
+            if arg == "--header" and i + 1 < len(rest):
+                key, _, value = rest[i + 1].partition(":")
+                headers[key.strip()] = value.strip()
+                i += 2
+                continue
+            if url is None and arg.startswith(("http://", "https://")):
+                url = arg
+            i += 1
+        if url is None:
+            return None
+
+        native = {"transport": "streamable_http", "url": url}
+        if headers:
+            native["headers"] = headers
+        # 保留 max_concurrency / tool_timeout 等扩展字段
+        for key, value in conn.items():
+            if key not in ("command", "args", "transport", "env", "cwd"):
+                native[key] = value
+        return native
+
     def load_a2a_config(self) -> Dict[str, Any]:
         """
         加载并解析A2A服务器配置文件。
@@ -2,24 +2,33 @@ import asyncio
 import json
 import logging
 import os
+import time
 import traceback
 import uuid
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
 import aiohttp
 from langchain_core.callbacks.manager import adispatch_custom_event
 from langchain_core.messages import AIMessage
 from langchain_core.runnables import RunnableConfig
-from python_a2a import Message, TextContent, MessageRole, A2AClient
+from python_a2a import Message, TextContent, MessageRole, AgentCard, AgentSkill
 
+from .circuit_breaker import a2a_breakers
+from .http_session import get_http_session
+from .sse import iter_sse_events
+from .utils import send_temp_message_to_frontend
 from .state import AgentState
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
 
+# 流式响应内容片段回调
+ChunkCallback = Callable[[str], Awaitable[None]]
+
+
 @dataclass
 class A2AAgentInfo:
     """A2A 智能体信息数据类 - 简化版本"""
@@ -40,6 +49,7 @@ class A2AExecutionResult:
     session_id: str  # 会话ID
     task_id: str = ""  # 任务ID
     error_msg: str = ""  # 错误信息
+    retryable: bool = False  # 失败是否由超时、连接或服务暂时不可用导致（可重试，计入熔断统计）
 
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典格式"""
@@ -50,51 +60,178 @@ class A2AExecutionResult:
             "status": self.status,
             "session_id": self.session_id,
             "task_id": self.task_id,
-            "error_msg": self.error_msg
+            "error_msg": self.error_msg,
+            "retryable": self.retryable
         }
 
 
+class A2AHTTPError(ConnectionError):
+    """A2A 服务返回的 HTTP 错误，保留状态码供调用方区分端点不存在与服务端错误"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+
+
+class A2AApplicationError(Exception):
+    """A2A 智能体返回的业务错误（JSON-RPC error、错误产物、流式 error 事件）：请求已被处理，不可重试"""
+
+
+# 端点不存在：请求未被处理，可以换其他端点重发而不会重复执行任务
+_ENDPOINT_MISSING_STATUSES = frozenset({404, 405})
+# 服务暂时不可用：可以重试，并计入熔断统计
+_UNAVAILABLE_STATUSES = frozenset({408, 429, 502, 503, 504})
+
+
+def _is_transport_error(error: Optional[BaseException]) -> bool:
+    """超时、连接失败与服务暂时不可用属于传输/可用性错误；智能体返回的业务错误不属于"""
+    if isinstance(error, A2AHTTPError):
+        return error.status in _UNAVAILABLE_STATUSES
+    return isinstance(error, (asyncio.TimeoutError, aiohttp.ClientConnectionError))
+
+
 class A2AHttpClient2:
+    """
+    原生异步的 A2A 协议客户端（兼容 python_a2a 服务端的接口约定）。
 
-    def __init__(self, base_url: str, timeout: int = None):
-        base_url = base_url.rstrip('/')
-        self._client: Optional[A2AClient] = None
-        self._base_url = base_url
-        self._timeout = timeout
-
-    async def _ensure_client(self) -> A2AClient:
-        """确保客户端已创建（在线程中创建，避免阻塞）"""
-        if self._client is None:
-            def _create_client():
-                return A2AClient(endpoint_url=self._base_url, timeout=self._timeout)
-            self._client = await asyncio.to_thread(_create_client)
-        return self._client
-
-    async def _get_agent_card(self) -> Optional[Any]:
-        """获取agent card，复用客户端或创建新客户端"""
-        # 如果客户端已存在，尝试直接使用
-        if self._client is not None:
-            try:
-                card = await asyncio.to_thread(self._client.get_agent_card)
-                if card and card.name != "Unknown Agent" and card.description != "Agent card not available":
-                    return card
-            except Exception:
-                self._client = None
+    应通过 get_a2a_http_client 按 base_url 获取共享实例：agent card、流式能力与可用的消息端点
+    只在首次使用时确定。所有请求都通过共享的 aiohttp 会话发出，不再占用默认线程池；
+    并发调用数受 A2A_MAX_CONCURRENCY 限制，图执行被取消时 CancelledError 会直接中断请求。
+    """
 
-        # 在单独的线程中创建客户端并获取card
-        def _get_card_sync():
-            client = A2AClient(endpoint_url=self._base_url, timeout=self._timeout)
-            card = client.get_agent_card()
-            return client, card
+    # 与 python_a2a A2AClient 相同的 agent card 端点顺序
+    CARD_PATHS = ("/.well-known/agent.json", "/agent.json", "/a2a/agent.json")
+    TASK_PATHS = ("/tasks/send", "/a2a/tasks/send")
+    MESSAGE_PATHS = ("", "/a2a")
+    STREAM_PATHS = ("/stream", "/a2a/stream")
 
-        client, card = await asyncio.to_thread(_get_card_sync)
+    def __init__(self, base_url: str, timeout: int = None):
+        self._base_url = base_url.rstrip('/')
+        if timeout is None:
+            timeout = int(os.environ.get("A2A_TIMEOUT", "600"))
+        connect_timeout = int(os.environ.get("A2A_CONNECT_TIMEOUT", "150"))
+        self._timeout = aiohttp.ClientTimeout(
+            total=timeout,
+            connect=connect_timeout,
+            sock_read=int(os.environ.get("A2A_READ_TIMEOUT", "300")),
+            sock_connect=connect_timeout
+        )
+        # agent card 请求只需要很短的超时，避免目录刷新被慢服务拖住
+        self._card_timeout = aiohttp.ClientTimeout(total=min(timeout, 30), connect=connect_timeout)
+        self._max_concurrency = max(1, int(os.environ.get("A2A_MAX_CONCURRENCY", "8")))
+        self._card: Optional[AgentCard] = None
+        # 流式能力（由 agent card 确定，None 表示尚未确定）
+        self._streaming: Optional[bool] = None
+        # 上次调用成功的端点 ("task"/"message"/"stream", url)，None 表示需要重新探测
+        self._endpoint: Optional[Tuple[str, str]] = None
+        # 事件循环 -> 并发信号量（asyncio 原语绑定创建时的事件循环）
+        self._limiters: Dict[int, Tuple[asyncio.AbstractEventLoop, asyncio.Semaphore]] = {}
+        # 进行中的远端取消请求（保留引用，避免任务被提前回收）
+        self._cancel_tasks = set()
+
+    def _limiter(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        entry = self._limiters.get(id(loop))
+        if entry is None or entry[0] is not loop:
+            entry = (loop, asyncio.Semaphore(self._max_concurrency))
+            self._limiters = {key: value for key, value in self._limiters.items() if not value[0].is_closed()}
+            self._limiters[id(loop)] = entry
+        return entry[1]
+
+    def invalidate(self) -> None:
+        """丢弃已缓存的 agent card、流式能力与端点，下次调用时重新获取"""
+        self._card = None
+        self._streaming = None
+        self._endpoint = None
+
+    # ---------------- agent card ----------------
+
+    async def _fetch_agent_card(self) -> AgentCard:
+        """按 A2A 协议约定的端点顺序拉取 agent card"""
+        session = get_http_session("a2a")
+        last_error: Optional[Exception] = None
+        for path in self.CARD_PATHS:
+            try:
+                async with session.get(
+                        f"{self._base_url}{path}",
+                        headers={"Accept": "application/json"},
+                        timeout=self._card_timeout
+                ) as response:
+                    response.raise_for_status()
+                    data = await response.json(content_type=None)
+                if isinstance(data, dict):
+                    break
+                last_error = ValueError(f"agent card 格式错误: {path}")
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                last_error = e
+        else:
+            raise ConnectionError(f"获取 agent card 失败: {last_error}")
+
+        skills = [
+            AgentSkill(
+                id=skill.get("id", str(uuid.uuid4())),
+                name=skill.get("name", "Unknown Skill"),
+                description=skill.get("description", ""),
+                tags=skill.get("tags", []),
+                examples=skill.get("examples", [])
+            )
+            for skill in data.get("skills", []) if isinstance(skill, dict)
+        ]
+        return AgentCard(
+            name=data.get("name", "Unknown Agent"),
+            description=data.get("description", ""),
+            url=self._base_url,
+            version=data.get("version", "unknown"),
+            authentication=data.get("authentication"),
+            capabilities=data.get("capabilities") or {},
+            skills=skills,
+            provider=data.get("provider"),
+            documentation_url=data.get("documentationUrl")
+        )
 
-        # 如果获取成功，保存客户端实例
-        if card and card.name != "Unknown Agent" and card.description != "Agent card not available":
-            self._client = client
+    async def _get_agent_card(self, refresh: bool = False) -> Optional[AgentCard]:
+        """
+        获取agent card，优先使用缓存
 
+        Args:
+            refresh: 为 True 时重新拉取 agent card（内容变化时替换缓存，流式能力与端点重新确定）
+        """
+        if self._card is not None and not refresh:
+            return self._card
+
+        card = await self._fetch_agent_card()
+        if card.name != "Unknown Agent" and card.description != "Agent card not available":
+            if self._card is not None and self._card_fingerprint(card) != self._card_fingerprint(self._card):
+                self.invalidate()
+            self._card = card
         return card
 
+    async def refresh_card(self) -> Optional[AgentCard]:
+        """重新拉取 agent card，供目录服务定期刷新使用"""
+        return await self._get_agent_card(refresh=True)
+
+    @staticmethod
+    def _card_fingerprint(card: AgentCard) -> Dict[str, Any]:
+        data = card.to_dict()
+        # 未声明 id 的技能每次解析都会生成随机 id，比较时忽略
+        data["skills"] = [
+            {key: value for key, value in skill.items() if key != "id"}
+            for skill in data.get("skills", [])
+        ]
+        return data
+
+    async def _supports_streaming(self) -> bool:
+        """流式能力取自 agent card，未声明或获取失败时按不支持处理"""
+        if self._streaming is None:
+            try:
+                card = await self._get_agent_card()
+                capabilities = card.capabilities if card else None
+                self._streaming = bool(isinstance(capabilities, dict) and capabilities.get("streaming"))
+            except ConnectionError as e:
+                logger.warning(f"获取 A2A agent card 失败，按非流式调用: {e}")
+                return False
+        return self._streaming
+
     async def get_a2a_name(self) -> str:
         """获取A2A智能体名称"""
         try:
@@ -113,8 +250,10 @@ class A2AHttpClient2:
             logger.warning(f"获取A2A描述失败: {str(e)}")
             return "Agent card not available"
 
-    async def call_a2a_agent(self, agent_id: str, session_id: str,
-                             messages: List[Dict], user_id: str = "") -> A2AExecutionResult:
+    # ---------------- 消息调用 ----------------
+
+    async def call_a2a_agent(self, agent_id: str, session_id: str, messages: List[Dict], user_id: str = "",
+                             on_chunk: Optional[ChunkCallback] = None) -> A2AExecutionResult:
         """
          调用 A2A 智能体
 
@@ -123,41 +262,145 @@ class A2AHttpClient2:
              session_id: 会话ID
              messages: 消息列表
              user_id: 用户ID
+             on_chunk: 流式响应收到内容片段时的回调（用于向前端实时转发）
 
          Returns:
              A2AExecutionResult: 执行结果
          """
-        # 确保客户端已创建
-        await self._ensure_client()
-
         # 创建带有必需 role 参数的消息
         message = Message(
             content=TextContent(text=messages[0]['content']),
             role=MessageRole.USER
         )
 
-        # 检查流式支持（异步方法，直接await）
-        stream_flag = await self._client.check_streaming_support()
-
         try:
-            if stream_flag:
-                return await self._handle_sse_response(message, session_id)
-            else:
-                return await self._handle_json_response(message, session_id)
+            # 超出并发上限时在此排队，取消会直接中断等待
+            async with self._limiter():
+                if await self._supports_streaming():
+                    result = await self._handle_sse_response(message, session_id, on_chunk)
+                else:
+                    result = await self._handle_json_response(message, session_id)
+        except asyncio.TimeoutError:
+            logger.error("A2A 请求超时")
+            result = A2AExecutionResult(
+                type="error",
+                content="",
+                final=True,
+                status=False,
+                session_id=session_id,
+                error_msg="请求超时",
+                retryable=True
+            )
         except Exception as e:
             logger.error(f"A2A 请求异常: {str(e)}", exc_info=True)
-            return A2AExecutionResult(
+            result = A2AExecutionResult(
                 type="error",
                 content="",
                 final=True,
                 status=False,
                 session_id=session_id,
-                error_msg=f"请求异常: {str(e)}"
+                error_msg=f"请求异常: {str(e)}",
+                retryable=_is_transport_error(e)
             )
 
+        if result.type == "error":
+            # 服务可能已重启或能力发生变化，下次调用重新获取 agent card
+            self.invalidate()
+        return result
+
+    def _candidate_endpoints(self, kind: str) -> List[Tuple[str, str]]:
+        """返回待尝试的端点，上次成功的端点排在最前"""
+        if kind == "stream":
+            candidates = [("stream", f"{self._base_url}{path}") for path in self.STREAM_PATHS]
+        else:
+            candidates = [("task", f"{self._base_url}{path}") for path in self.TASK_PATHS]
+            candidates += [("message", f"{self._base_url}{path}") for path in self.MESSAGE_PATHS]
+        if self._endpoint in candidates:
+            candidates.remove(self._endpoint)
+            candidates.insert(0, self._endpoint)
+        return candidates
+
+    async def _post_json(self, url: str, payload: Dict[str, Any]) -> Any:
+        session = get_http_session("a2a")
+        async with session.post(
+                url,
+                json=payload,
+                headers={"Content-Type": "application/json", "Accept": "application/json"},
+                timeout=self._timeout
+        ) as response:
+            if response.status >= 400:
+                error_text = await response.text()
+                raise A2AHTTPError(response.status, error_text[:200])
+            text = await response.text()
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            return text
+
+    async def _send_task(self, url: str, message: Message, session_id: str) -> str:
+        """以 JSON-RPC tasks/send 发送消息，返回任务产物中的文本"""
+        task_id = str(uuid.uuid4())
+        payload = {
+            "jsonrpc": "2.0",
+            "id": 1,
+            "method": "tasks/send",
+            "params": {"id": task_id, "sessionId": session_id, "message": message.to_dict()}
+        }
+        try:
+            data = await self._post_json(url, payload)
+        except asyncio.CancelledError:
+            # 图执行被取消：通知远端取消任务，不等待结果
+            self._schedule_cancel(url[:-len("/send")] + "/cancel", task_id)
+            raise
+        if not isinstance(data, dict):
+            raise ValueError("tasks/send 响应不是 JSON 对象")
+        if data.get("error"):
+            raise A2AApplicationError(f"tasks/send 返回错误: {data['error']}")
+        result = data.get("result")
+        if not result and "text" in data:
+            return str(data["text"])
+        if not isinstance(result, dict):
+            raise ValueError("tasks/send 响应缺少 result")
+        text = _extract_artifact_text(result.get("artifacts") or [])
+        if text is None:
+            raise ValueError("tasks/send 响应中没有文本产物")
+        return text
+
+    def _schedule_cancel(self, cancel_url: str, task_id: str) -> None:
+        """在后台发送 tasks/cancel，调用方的取消不等待其完成"""
+        cancel_task = asyncio.ensure_future(self._cancel_task(cancel_url, task_id))
+        self._cancel_tasks.add(cancel_task)
+        cancel_task.add_done_callback(self._cancel_tasks.discard)
+
+    async def _cancel_task(self, url: str, task_id: str) -> None:
+        """尽力通知远端取消任务（tasks/cancel），失败时忽略"""
+        payload = {"jsonrpc": "2.0", "id": 1, "method": "tasks/cancel", "params": {"id": task_id}}
+        try:
+            session = get_http_session("a2a")
+            async with session.post(url, json=payload, timeout=aiohttp.ClientTimeout(total=5)) as response:
+                await response.read()
+        except Exception as e:
+            logger.debug(f"取消 A2A 任务失败: {e}")
+
+    async def _send_message(self, url: str, message: Message) -> str:
+        """直接发送 python_a2a 消息（旧版接口），返回回复文本"""
+        data = await self._post_json(url, message.to_dict())
+        if isinstance(data, str):
+            if not data.strip():
+                raise ValueError("消息响应为空")
+            return data.strip()
+        if isinstance(data, dict) and isinstance(data.get("parts"), list) and "content" not in data:
+            reply = Message.from_google_a2a(data)
+        else:
+            reply = Message.from_dict(data)
+        return _message_text(reply)
+
     async def _handle_json_response(self, message: Message, session_id: str) -> A2AExecutionResult:
         """
-        处理普通 JSON 响应
+        处理普通 JSON 响应：依次尝试 tasks/send 与旧版消息端点，并记住可用的端点。
+
+        只有端点不存在（404/405）或连接未建立时才尝试下一个端点；请求已被服务端处理后的错误
+        （5xx、JSON-RPC error、错误产物、响应格式错误）直接抛出，避免同一任务被执行两次
 
         Args:
             message: A2A 消息对象
@@ -166,18 +409,29 @@ class A2AHttpClient2:
         Returns:
             A2AExecutionResult: 处理后的结果
         """
-        try:
-            await self._ensure_client()
-
-            # 包装同步的 send_message 调用
-            def _send_message():
-                return self._client.send_message(message)
-            data = await asyncio.to_thread(_send_message)
-
+        last_error: Optional[Exception] = None
+        for endpoint in self._candidate_endpoints("json"):
+            kind, url = endpoint
+            try:
+                if kind == "task":
+                    text = await self._send_task(url, message, session_id)
+                else:
+                    text = await self._send_message(url, message)
+            except A2AHTTPError as e:
+                if e.status not in _ENDPOINT_MISSING_STATUSES:
+                    raise
+                logger.debug(f"A2A 端点 {url} 不可用: {e}")
+                last_error = e
+                continue
+            except aiohttp.ClientConnectorError as e:
+                # 连接未建立，请求没有发出
+                logger.debug(f"A2A 端点 {url} 连接失败: {e}")
+                last_error = e
+                continue
+            self._endpoint = endpoint
             return A2AExecutionResult(
                 type='text',
-                content=data,
-                # 兼容 'final' 和 'finished' 两个字段名
+                content=text,
                 final=True,
                 status=True,
                 session_id=session_id,
@@ -185,81 +439,73 @@ class A2AHttpClient2:
                 error_msg=''
             )
 
-        except Exception as e:
-            logger.error(f"处理 JSON 响应异常: {str(e)}")
-            return A2AExecutionResult(
-                type="error",
-                content="",
-                final=True,
-                status=False,
-                session_id=session_id,
-                error_msg=f"JSON 处理异常: {str(e)}"
-            )
+        logger.error(f"处理 JSON 响应异常: {last_error}")
+        return A2AExecutionResult(
+            type="error",
+            content="",
+            final=True,
+            status=False,
+            session_id=session_id,
+            error_msg=f"JSON 处理异常: {last_error}",
+            retryable=_is_transport_error(last_error)
+        )
 
-    async def _handle_sse_response(self, message: Message, session_id: str) -> A2AExecutionResult:
-        """
-        处理 SSE 流式响应 - 简化版本
-        只收集所有接收到的内容，当流结束时返回结果
+    async def _handle_sse_response(self, message: Message, session_id: str,
+                                   on_chunk: Optional[ChunkCallback] = None) -> A2AExecutionResult:
         """
-        all_content = ""  # 累积所有内容
-
-        def _process_sse_line(line: str) -> Tuple[str, bool]:
-            """处理SSE行，返回(内容, 是否结束)"""
-            line = line.strip()
-            if line.startswith('data:'):
-                data_content = line[5:].lstrip()
-                if data_content == '[DONE]':
-                    return "", True
-                if data_content and data_content != '[DONE]':
-                    return data_content, False
-            elif line and not (line == '' or line.startswith(':')):
-                return line, False
-            return "", False
+        处理 SSE 流式响应 - 增量解码事件，内容片段到达时通过 on_chunk 转发，流结束时返回累积的内容；
+        流式端点均不可用时回退到普通 JSON 调用。
 
-        try:
-            # 尝试作为异步迭代器使用 stream_response
+        消息的 message_id 作为任务 id，图执行被取消时向同一前缀下的 tasks/cancel 发送取消通知
+        """
+        if not message.message_id:
+            message.message_id = str(uuid.uuid4())
+        session = get_http_session("a2a")
+        headers = {"Content-Type": "application/json", "Accept": "text/event-stream"}
+        content_parts: List[str] = []
+        last_error: Optional[Exception] = None
+
+        for endpoint in self._candidate_endpoints("stream"):
+            _, url = endpoint
             try:
-                async for line in self._client.stream_response(message):
-                    content, is_done = _process_sse_line(line)
-                    if is_done:
-                        break
-                    if content:
-                        all_content += content
-            except (TypeError, AttributeError):
-                # 如果是同步迭代器，在线程中运行并转换为异步
-                def _get_stream():
-                    return list(self._client.stream_response(message))
-                lines = await asyncio.to_thread(_get_stream)
-                for line in lines:
-                    content, is_done = _process_sse_line(line)
-                    if is_done:
-                        break
-                    if content:
-                        all_content += content
-
-        except asyncio.TimeoutError:
-            logger.error("SSE流读取超时")
-            return A2AExecutionResult(
-                type="error",
-                content="",
-                final=True,
-                status=False,
-                session_id=session_id,
-                error_msg="SSE流读取超时，A2A服务响应时间过长"
-            )
-
-        except Exception as e:
-            logger.error(f"处理 SSE 响应异常: {str(e)}")
-            return A2AExecutionResult(
-                type="error",
-                content="",
-                final=True,
-                status=False,
-                session_id=session_id,
-                error_msg=f"SSE 处理异常: {str(e)}"
-            )
+                async with session.post(url, json=message.to_dict(), headers=headers,
+                                        timeout=self._timeout) as response:
+                    if response.status >= 400:
+                        error = A2AHTTPError(response.status, (await response.text())[:200])
+                        if response.status not in _ENDPOINT_MISSING_STATUSES:
+                            raise error
+                        last_error = error
+                        continue
+                    self._endpoint = endpoint
+                    try:
+                        # 按到达的字节块解码：未消费的数据留在 socket 缓冲区，服务端写入随之受限
+                        async for event in iter_sse_events(response.content):
+                            if event.data == "[DONE]":
+                                break
+                            chunk = _parse_sse_chunk(event.data)
+                            if event.event == "error":
+                                raise A2AApplicationError(f"A2A 流式响应错误: {chunk}")
+                            if chunk:
+                                content_parts.append(chunk)
+                                if on_chunk is not None:
+                                    await on_chunk(chunk)
+                    except asyncio.CancelledError:
+                        # 关闭连接之外，同时通知远端取消任务，不等待结果
+                        self._schedule_cancel(url[:-len("/stream")] + "/tasks/cancel", message.message_id)
+                        raise
+                break
+            except aiohttp.ClientConnectorError as e:
+                # 连接未建立，请求没有发出；其他错误说明请求已送达，不再切换端点重发
+                last_error = e
+                continue
+        else:
+            logger.warning(f"A2A 流式端点不可用，回退到普通调用: {last_error}")
+            self._streaming = False
+            self._endpoint = None
+            return await self._handle_json_response(message, session_id)
 
         # 流结束，返回结果
+        all_content = "".join(content_parts)
         if all_content.strip():
             return A2AExecutionResult(
                 type="text",
@@ -280,6 +526,71 @@ class A2AHttpClient2:
             )
 
 
+def _message_text(message: Message) -> str:
+    """提取 python_a2a 消息中的文本"""
+    content = message.content
+    text = getattr(content, "text", None)
+    if text is not None:
+        return text
+    if getattr(content, "message", None) is not None:
+        raise A2AApplicationError(f"A2A 智能体返回错误: {content.message}")
+    return str(content)
+
+
+def _extract_artifact_text(artifacts: List[Dict[str, Any]]) -> Optional[str]:
+    """提取任务产物中的第一段文本"""
+    for artifact in artifacts:
+        for part in artifact.get("parts") or []:
+            if not isinstance(part, dict):
+                continue
+            if part.get("type") == "text":
+                return part.get("text", "")
+            if part.get("type") == "error":
+                raise A2AApplicationError(f"A2A 智能体返回错误: {part.get('message', '')}")
+            if part.get("type") == "function_response":
+                return json.dumps(part.get("response", {}), ensure_ascii=False)
+    return None
+
+
+def _parse_sse_chunk(data: str) -> str:
+    """解析 SSE data 字段：JSON 数据按 python_a2a 的约定提取文本，否则原样返回"""
+    try:
+        chunk = json.loads(data)
+    except json.JSONDecodeError:
+        return data
+    if isinstance(chunk, str):
+        return chunk
+    if isinstance(chunk, dict):
+        content = chunk.get("content")
+        if isinstance(content, str):
+            return content
+        if isinstance(content, dict) and "text" in content:
+            return str(content["text"])
+        if "text" in chunk:
+            return str(chunk["text"])
+        if "error" in chunk:
+            return str(chunk["error"])
+        for part in chunk.get("parts") or []:
+            if isinstance(part, dict) and part.get("type") == "text":
+                return part.get("text", "")
+        return ""
+    return data
+
+
+# (base_url, timeout) -> 共享的 A2AHttpClient2 实例
+_a2a_clients: Dict[Tuple[str, Optional[int]], A2AHttpClient2] = {}
+
+
+def get_a2a_http_client(base_url: str, timeout: int = None) -> A2AHttpClient2:
+    """按 base_url 获取共享的 A2AHttpClient2，供目录服务、A2AManager 与 a2a_agent_node 复用"""
+    key = (base_url.rstrip('/'), timeout)
+    client = _a2a_clients.get(key)
+    if client is None:
+        client = A2AHttpClient2(base_url, timeout)
+        _a2a_clients[key] = client
+    return client
+
+
 class A2AHttpClient:
     """A2A HTTP 客户端，处理与 A2A 服务的通信"""
 
@@ -311,8 +622,8 @@ class A2AHttpClient:
 
         logger.info(f"A2A客户端初始化完成: 总超时={timeout}s, 连接超时={connect_timeout}s, 读取超时={read_timeout}s")
 
-    async def call_a2a_agent(self, agent_id: str, session_id: str,
-                             messages: List[Dict], user_id: str = "") -> A2AExecutionResult:
+    async def call_a2a_agent(self, agent_id: str, session_id: str, messages: List[Dict], user_id: str = "",
+                             on_chunk: Optional[ChunkCallback] = None) -> A2AExecutionResult:
         """
         调用 A2A 智能体
 
@@ -321,6 +632,7 @@ class A2AHttpClient:
             session_id: 会话ID
             messages: 消息列表
             user_id: 用户ID
+            on_chunk: 流式响应收到内容片段时的回调（用于向前端实时转发）
 
         Returns:
             A2AExecutionResult: 执行结果
@@ -339,39 +651,41 @@ class A2AHttpClient:
             logger.info(f"请求数据: {json.dumps(payload, indent=2, ensure_ascii=False)}")
 
             # 发送 POST 请求
-            async with aiohttp.ClientSession(timeout=self.timeout) as session:
-                headers = {
-                    'Content-Type': 'application/json',
-                    'Accept': 'text/event-stream'  # 支持 SSE
-                }
-
-                async with session.post(
-                        self.api_url,
-                        json=payload,
-                        headers=headers
-                ) as response:
+            # 使用共享会话复用连接，超时按请求设置
+            session = get_http_session("a2a")
+            headers = {
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream'  # 支持 SSE
+            }
+
+            async with session.post(
+                    self.api_url,
+                    json=payload,
+                    headers=headers,
+                    timeout=self.timeout
+            ) as response:
+
+                logger.info(f"响应状态码: {response.status}")
+
+                if response.status != 200:
+                    error_text = await response.text()
+                    logger.error(f"A2A 请求失败: {response.status}, 内容: {error_text}")
+                    return A2AExecutionResult(
+                        type="error",
+                        content="",
+                        final=True,
+                        status=False,
+                        session_id=session_id,
+                        error_msg=f"HTTP {response.status}: {error_text}"
+                    )
 
-                    logger.info(f"响应状态码: {response.status}")
-
-                    if response.status != 200:
-                        error_text = await response.text()
-                        logger.error(f"A2A 请求失败: {response.status}, 内容: {error_text}")
-                        return A2AExecutionResult(
-                            type="error",
-                            content="",
-                            final=True,
-                            status=False,
-                            session_id=session_id,
-                            error_msg=f"HTTP {response.status}: {error_text}"
-                        )
-
-                    # 检查是否是 SSE 响应
-                    content_type = response.headers.get('content-type', '')
-                    if 'text/event-stream' in content_type:
-                        return await self._handle_sse_response(response, session_id)
-                    else:
-                        # 处理普通 JSON 响应
-                        return await self._handle_json_response(response, session_id)
+                # 检查是否是 SSE 响应
+                content_type = response.headers.get('content-type', '')
+                if 'text/event-stream' in content_type:
+                    return await self._handle_sse_response(response, session_id, on_chunk)
+                else:
+                    # 处理普通 JSON 响应
+                    return await self._handle_json_response(response, session_id)
 
         except asyncio.TimeoutError:
             logger.error("A2A 请求超时")
@@ -385,7 +699,6 @@ class A2AHttpClient:
             )
         except Exception as e:
             logger.error(f"A2A 请求异常: {str(e)}")
-            import traceback
             traceback.print_exc()
             return A2AExecutionResult(
                 type="error",
@@ -396,14 +709,15 @@ class A2AHttpClient:
                 error_msg=f"请求异常: {str(e)}"
             )
 
-    async def _handle_sse_response(self, response: aiohttp.ClientResponse,
-                                   session_id: str) -> A2AExecutionResult:
+    async def _handle_sse_response(self, response: aiohttp.ClientResponse, session_id: str,
+                                   on_chunk: Optional[ChunkCallback] = None) -> A2AExecutionResult:
         """
-        处理 SSE 流式响应
+        处理 SSE 流式响应：增量解码事件，内容片段到达时通过 on_chunk 转发
 
         Args:
             response: HTTP 响应对象
             session_id: 会话ID
+            on_chunk: 收到内容片段时的回调（用于向前端实时转发）
 
         Returns:
             A2AExecutionResult: 处理后的结果
@@ -411,109 +725,51 @@ class A2AHttpClient:
         logger.info("处理 SSE 流式响应")
         final_result = None
         content_parts = []
-        all_lines = []  # 记录所有接收到的原始行
+        event_count = 0
 
         try:
-            async for line in response.content:
-                line = line.decode('utf-8').strip()
-                all_lines.append(line)  # 记录原始行用于调试
-
-                logger.debug(f"收到原始SSE行: {line}")
-
-                # 处理标准SSE格式：data: xxx 或 data:xxx（兼容有无空格）
-                if line.startswith('data:'):
-                    # 移除 'data:' 前缀，同时处理可能存在的空格
-                    data_str = line[5:].lstrip()  # 移除 'data:' 并去除前导空格
-
-                    if data_str == '[DONE]':
-                        logger.debug("收到SSE结束标记: [DONE]")
-                        break
-
-                    try:
-                        data = json.loads(data_str)
-                        logger.debug(f"收到 SSE 数据: {data}")
-
-                        # 解析响应数据
-                        result_type = data.get('type', 'text')
-                        content = data.get('content', '')
-                        # 兼容 'final' 和 'finished' 两个字段名
-                        final = data.get('final', data.get('finished', False))
-                        status = data.get('status', True)
-                        task_id = data.get('taskId', '')
-
-                        # 添加详细的调试日志
-                        logger.debug(
-                            f"解析后的数据 - type: {result_type}, content: '{content}', final: {final}, status: {status}")
-                        logger.debug(
-                            f"字段检查 - 'final'字段: {data.get('final')}, 'finished'字段: {data.get('finished')}, 最终final值: {final}, 类型: {type(final)}")
-
-                        # 收集内容
-                        if content:
-                            content_parts.append(str(content))
-                            logger.debug(f"添加内容片段: '{content}', 当前片段数: {len(content_parts)}")
-                        else:
-                            logger.debug(f"内容为空，跳过收集")
-
-                        # 如果是最终响应，记录下来
-                        if final:
-                            final_result = A2AExecutionResult(
-                                type=result_type,
-                                content=content,
-                                final=final,
-                                status=status,
-                                session_id=session_id,
-                                task_id=task_id
-                            )
-                            logger.info(f"收到最终SSE响应: {final_result}")
-                            break
-                        else:
-                            logger.debug(f"当前不是最终响应，继续处理下一行")
-
-                    except json.JSONDecodeError as e:
-                        logger.warning(f"解析 SSE JSON数据失败: {data_str}, 错误: {str(e)}")
-                        continue
-
-                # 处理非标准格式：直接是JSON数据（无data:前缀）
-                elif line.startswith('{') and line.endswith('}'):
-                    try:
-                        data = json.loads(line)
-                        logger.info(f"收到直接JSON数据: {data}")
-
-                        result_type = data.get('type', 'text')
-                        content = data.get('content', '')
-                        # 兼容 'final' 和 'finished' 两个字段名
-                        final = data.get('final', data.get('finished', False))
-                        status = data.get('status', True)
-                        task_id = data.get('taskId', '')
-
-                        if content:
-                            content_parts.append(str(content))
-
-                        if final:
-                            final_result = A2AExecutionResult(
-                                type=result_type,
-                                content=content,
-                                final=final,
-                                status=status,
-                                session_id=session_id,
-                                task_id=task_id
-                            )
-                            logger.info(f"收到最终直接JSON响应: {final_result}")
-                            break
-
-                    except json.JSONDecodeError as e:
-                        logger.warning(f"解析直接JSON数据失败: {line}, 错误: {str(e)}")
-                        continue
+            async for event in iter_sse_events(response.content):
+                event_count += 1
+                if event.data == '[DONE]':
+                    logger.debug("收到SSE结束标记: [DONE]")
+                    break
 
-                # 忽略空行和注释行
-                elif line == '' or line.startswith(':'):
+                try:
+                    data = json.loads(event.data)
+                except json.JSONDecodeError as e:
+                    logger.warning(f"解析 SSE JSON数据失败: {event.data[:200]}, 错误: {str(e)}")
+                    continue
+                if not isinstance(data, dict):
                     continue
 
-                # 其他格式的行，记录但不处理
-                else:
-                    logger.debug(f"收到未识别格式的SSE行: {line}")
+                # 解析响应数据
+                result_type = data.get('type', 'text')
+                content = data.get('content', '')
+                # 兼容 'final' 和 'finished' 两个字段名
+                final = data.get('final', data.get('finished', False))
+                status = data.get('status', True)
+                task_id = data.get('taskId', '')
+
+                # 收集内容
+                if content:
+                    content_parts.append(str(content))
+                    if on_chunk is not None and not final:
+                        await on_chunk(str(content))
+
+                # 如果是最终响应，记录下来
+                if final:
+                    final_result = A2AExecutionResult(
+                        type=result_type,
+                        content=content,
+                        final=final,
+                        status=status,
+                        session_id=session_id,
+                        task_id=task_id
+                    )
+                    logger.info(f"收到最终SSE响应: type={result_type}, status={status}")
+                    break
 
-            logger.info(f"SSE流处理完成，共处理 {len(all_lines)} 行数据")
+            logger.info(f"SSE流处理完成，共处理 {event_count} 个事件，{len(content_parts)} 个内容片段")
 
         except asyncio.TimeoutError:
             logger.error("SSE流读取超时")
@@ -528,7 +784,6 @@ class A2AHttpClient:
 
         except Exception as e:
             logger.error(f"处理 SSE 响应异常: {str(e)}")
-            import traceback
             traceback.print_exc()
 
             return A2AExecutionResult(
@@ -540,16 +795,6 @@ class A2AHttpClient:
                 error_msg=f"SSE 处理异常: {str(e)}"
             )
 
-        # 处理结果
-        # 调试信息：记录所有接收到的原始数据
-        logger.info(f"SSE响应总共接收到 {len(all_lines)} 行数据")
-        logger.info(f"收集到 {len(content_parts)} 个内容片段")
-        # 只输出前10行作为调试信息，避免日志过长
-        logger.debug(f"前10行SSE原始数据: {all_lines[:10]}")
-
-        # 调试信息：检查final_result的状态
-        logger.info(f"SSE处理循环结束后，final_result状态: {final_result}")
-
         # 如果没有收到最终结果，使用收集的内容组合
         if final_result is None:
             if content_parts:
@@ -564,9 +809,7 @@ class A2AHttpClient:
                 )
                 logger.info(f"使用收集的内容组合最终结果: {len(combined_content)} 字符")
             else:
-                # 记录详细的调试信息
-                debug_info = f"原始SSE行数: {len(all_lines)}, 前10行: {all_lines[:10]}"
-                logger.error(f"未收到任何有效内容: {debug_info}")
+                logger.error(f"未收到任何有效内容，共 {event_count} 个SSE事件")
 
                 final_result = A2AExecutionResult(
                     type="text",
@@ -574,7 +817,7 @@ class A2AHttpClient:
                     final=True,
                     status=False,
                     session_id=session_id,
-                    error_msg=f"未收到明确的最终响应，{debug_info}"
+                    error_msg=f"未收到明确的最终响应，SSE事件数: {event_count}"
                 )
         else:
             # 如果收到了最终结果，但内容为空，则使用收集的内容片段
@@ -591,7 +834,6 @@ class A2AHttpClient:
                 )
                 logger.info(f"最终结果内容为空，使用收集的内容片段: {len(combined_content)} 字符")
 
-        logger.info(f"SSE 处理完成: {final_result}")
         return final_result
 
     async def _handle_json_response(self, response: aiohttp.ClientResponse,
@@ -633,6 +875,49 @@ class A2AHttpClient:
             )
 
 
+class _A2AStreamForwarder:
+    """
+    将 A2A 流式内容实时转发到前端：与最终消息使用同一个 message_id，前端按 id 更新消息内容。
+    """
+
+    def __init__(self, agent_name: str, message_id: str, config: RunnableConfig):
+        self.agent_name = agent_name
+        self.message_id = message_id
+        self.config = config
+        self.interval = float(os.environ.get("A2A_STREAM_FORWARD_INTERVAL", "0.3"))
+        self.forwarded = 0
+        self._content = ""
+        self._last_emit = 0.0
+        self._disabled = False
+
+    def reset(self) -> None:
+        """重试前清空已累积的内容"""
+        self._content = ""
+        self._last_emit = 0.0
+
+    async def __call__(self, chunk: str) -> None:
+        self._content += chunk
+        if self._disabled or time.monotonic() - self._last_emit < self.interval:
+            return
+        self._last_emit = time.monotonic()
+        partial = A2AExecutionResult(type="text", content=self._content, final=False, status=True, session_id="")
+        try:
+            await adispatch_custom_event(
+                "copilotkit_manually_emit_message",
+                {
+                    "message": format_a2a_response(partial, self.agent_name),
+                    "message_id": self.message_id,
+                    "role": "assistant"
+                },
+                config=self.config,
+            )
+            self.forwarded += 1
+        except Exception as e:
+            # 转发失败不影响 A2A 调用本身
+            logger.warning(f"A2A 流式内容转发失败，后续不再转发: {e}")
+            self._disabled = True
+
+
 async def a2a_agent_node(state: AgentState, config: RunnableConfig, agent_info: A2AAgentInfo) -> Dict:
     """
     A2A 智能体节点执行函数 - 优化版本
@@ -675,48 +960,71 @@ async def a2a_agent_node(state: AgentState, config: RunnableConfig, agent_info:
 
         logger.info(f"A2A调用配置: 最大重试次数={max_retries}")
 
+        # 重试复用同一个共享客户端，不再每次重新拉取 agent card
+        client = get_a2a_http_client(agent_info.base_url)
+        # 熔断器与重试预算按智能体在所有会话间共享
+        breaker = a2a_breakers.breaker(agent_info.agent_id)
+        retry_budget = a2a_breakers.retry_budget(agent_info.agent_id)
+        # 流式内容实时转发到前端，最终消息使用同一个 message_id 覆盖
+        message_id = str(uuid.uuid4())
+        forwarder = _A2AStreamForwarder(agent_info.name, message_id, config)
         while retry_count < max_retries:
+            if not breaker.allow():
+                logger.warning(f"A2A 智能体 {agent_info.name} 熔断中，跳过调用")
+                result = A2AExecutionResult(
+                    type="error",
+                    content="",
+                    final=True,
+                    status=False,
+                    session_id=session_id,
+                    error_msg="智能体熔断中，服务暂时不可用"
+                )
+                break
+
+            # 重试预算按原始调用计算，重试本身不计入调用数
+            if retry_count == 0:
+                retry_budget.record_call()
             try:
-                client = A2AHttpClient2(agent_info.base_url)
+                forwarder.reset()
                 result = await client.call_a2a_agent(
                     agent_info.agent_id,
                     session_id,
                     messages,
-                    agent_info.user_id
+                    agent_info.user_id,
+                    on_chunk=forwarder
                 )
-
-                # 如果成功或者不是超时错误，跳出重试循环
-                if result.status or "超时" not in result.error_msg:
-                    break
-
-                # 如果是超时错误，进行重试
-                retry_count += 1
-                if retry_count < max_retries:
-                    wait_time = 2 ** retry_count  # 指数退避：2, 4, 8秒
-                    logger.warning(f"A2A调用超时，等待 {wait_time} 秒后重试 (尝试 {retry_count + 1}/{max_retries})")
-                    await asyncio.sleep(wait_time)
-                else:
-                    logger.error(f"A2A调用失败，已达到最大重试次数: {result.error_msg}")
-
+            except asyncio.CancelledError:
+                # 图执行被取消，本次调用不计入熔断统计
+                breaker.release()
+                raise
             except Exception as e:
-                retry_count += 1
-                logger.error(f"A2A调用异常 (尝试 {retry_count}/{max_retries}): {str(e)}")
+                logger.error(f"A2A调用异常 (尝试 {retry_count + 1}/{max_retries}): {str(e)}")
+                result = A2AExecutionResult(
+                    type="error",
+                    content="",
+                    final=True,
+                    status=False,
+                    session_id=session_id,
+                    error_msg=f"A2A调用异常: {str(e)}",
+                    retryable=_is_transport_error(e)
+                )
 
-                if retry_count < max_retries:
-                    wait_time = 2 ** retry_count
-                    logger.info(f"等待 {wait_time} 秒后重试...")
-                    await asyncio.sleep(wait_time)
-                else:
-                    # 创建错误结果
-                    result = A2AExecutionResult(
-                        type="error",
-                        content="",
-                        final=True,
-                        status=False,
-                        session_id=session_id,
-                        error_msg=f"A2A调用异常，已达到最大重试次数: {str(e)}"
-                    )
-                    break
+            # 熔断器只统计服务可用性：智能体返回的业务错误说明服务可达，按成功计
+            if not result.retryable:
+                breaker.record_success()
+                break
+            breaker.record_failure()
+
+            retry_count += 1
+            if retry_count >= max_retries:
+                logger.error(f"A2A调用失败，已达到最大重试次数: {result.error_msg}")
+                break
+            if not retry_budget.try_acquire():
+                logger.warning(f"A2A 智能体 {agent_info.name} 重试预算已用尽，不再重试")
+                break
+            wait_time = retry_budget.backoff(retry_count)
+            logger.warning(f"A2A调用失败，等待 {wait_time:.1f} 秒后重试 (尝试 {retry_count + 1}/{max_retries})")
+            await asyncio.sleep(wait_time)
 
         logger.info(f"📊 A2A 执行结果: {result.status}, 类型: {result.type}")
         if not result.status:
@@ -727,7 +1035,6 @@ async def a2a_agent_node(state: AgentState, config: RunnableConfig, agent_info:
             # 成功：添加 AI 响应消息
             ai_content = format_a2a_response(result, agent_info.name)
 
-            message_id = str(uuid.uuid4())
             # 先临时提交消息，用于向用户快速展示结果
             await adispatch_custom_event(
                 "copilotkit_manually_emit_message",
@@ -771,7 +1078,12 @@ async def a2a_agent_node(state: AgentState, config: RunnableConfig, agent_info:
         else:
             # 失败：添加错误消息
             error_content = format_a2a_error(result, agent_info.name)
-            error_message = AIMessage(content=error_content, name=node_name)
+            if forwarder.forwarded:
+                # 已向前端转发过部分内容，用错误信息覆盖同一条消息
+                await send_temp_message_to_frontend(error_content, message_id, "assistant", config)
+                error_message = AIMessage(id=message_id, content=error_content, name=node_name)
+            else:
+                error_message = AIMessage(content=error_content, name=node_name)
 
             state["messages"].append(error_message)
             state["inner_messages"].append(error_message)
@@ -847,7 +1159,6 @@ async def a2a_agent_node(state: AgentState, config: RunnableConfig, agent_info:
 
     except Exception as e:
         logger.error(f"💥 A2A 智能体节点执行异常: {str(e)}")
-        import traceback
         traceback.print_exc()
 
         # 添加异常错误消息
@@ -1012,7 +1323,6 @@ def get_a2a_agents_from_state(state: AgentState) -> List[A2AAgentInfo]:
 
         except Exception as e:
             logger.error(f"✗ 创建 A2A 智能体信息失败: {config}, 错误: {str(e)}")
-            import traceback
             traceback.print_exc()
             continue
 
@@ -0,0 +1,240 @@
+"""
+A2A 智能体目录服务
+
+启动时并发获取 a2a_server.json 中所有启用智能体的 agent card，按 TTL 缓存在内存中，
+并由后台任务定期刷新。initial_setup_node 直接从内存读取 state["a2a_agents"]，
+不再在每次请求的关键路径上同步拉取 agent card。
+"""
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from .a2a_agent import get_a2a_http_client
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN_AGENT_NAME = "Unknown Agent"
+UNKNOWN_AGENT_DESC = "Agent card not available"
+
+
+@dataclass
+class A2ADirectoryEntry:
+    """目录中的单个智能体条目"""
+    agent_id: str
+    base_url: str
+    name: str = UNKNOWN_AGENT_NAME
+    desc: str = UNKNOWN_AGENT_DESC
+    available: bool = False  # 最近一次是否成功获取 card
+    fetched_at: float = 0.0
+    last_error: str = ""
+    fetch_count: int = 0
+
+    def to_state(self) -> Dict[str, Any]:
+        """转换为 state["a2a_agents"] 中的格式"""
+        return {
+            "name": self.name,
+            "agent_id": self.agent_id,
+            "desc": self.desc,
+            "base_url": self.base_url,
+        }
+
+
+@dataclass
+class _LoopTasks:
+    """绑定单个事件循环的后台任务（asyncio 任务只能在创建它的事件循环中等待）"""
+    inflight: Dict[str, asyncio.Task] = field(default_factory=dict)
+    refresh_task: Optional[asyncio.Task] = None
+    background_refresh: Optional[asyncio.Task] = None
+
+
+class A2ADirectory:
+    """
+    A2A 智能体目录（进程级单例）
+    """
+    _instance: Optional["A2ADirectory"] = None
+
+    @classmethod
+    def get_instance(cls) -> "A2ADirectory":
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self):
+        self.ttl = float(os.getenv("A2A_CARD_TTL", "300"))
+        self.failure_ttl = float(os.getenv("A2A_CARD_FAILURE_TTL", "30"))
+        self.refresh_interval = float(os.getenv("A2A_CARD_REFRESH_INTERVAL", "120"))
+        self.fetch_timeout = float(os.getenv("A2A_CARD_FETCH_TIMEOUT", "10"))
+
+        # 条目只是普通数据，在所有事件循环间共享
+        self._config: Dict[str, Dict[str, Any]] = {}
+        self._entries: Dict[str, A2ADirectoryEntry] = {}
+        # 事件循环 id -> (事件循环, 该事件循环中的任务)
+        self._loop_tasks: Dict[int, Tuple[asyncio.AbstractEventLoop, _LoopTasks]] = {}
+
+    # ---------------- 配置与状态 ----------------
+
+    def _set_config(self, a2a_config: Dict[str, Dict[str, Any]]) -> None:
+        enabled = {
+            key: value for key, value in (a2a_config or {}).items()
+            if value.get("enabled", False) and value.get("base_url")
+        }
+        if enabled == self._config:
+            return
+        self._config = enabled
+        # 移除已下线的智能体；base_url 变化的条目需要重新获取
+        for agent_id in list(self._entries):
+            cfg = enabled.get(agent_id)
+            if cfg is None or cfg["base_url"].rstrip("/") != self._entries[agent_id].base_url:
+                del self._entries[agent_id]
+
+    def _is_fresh(self, entry: Optional[A2ADirectoryEntry]) -> bool:
+        if entry is None:
+            return False
+        ttl = self.ttl if entry.available else self.failure_ttl
+        return time.monotonic() - entry.fetched_at < ttl
+
+    def _tasks(self) -> _LoopTasks:
+        """获取当前事件循环的任务，不存在时创建（需在协程中调用）"""
+        loop = asyncio.get_running_loop()
+        entry = self._loop_tasks.get(id(loop))
+        # 事件循环 id 可能被新的事件循环复用，需同时比较事件循环对象
+        if entry is None or entry[0] is not loop:
+            # 已关闭的事件循环中的任务不会再运行，直接丢弃
+            for key, (other_loop, _) in list(self._loop_tasks.items()):
+                if other_loop.is_closed():
+                    self._loop_tasks.pop(key, None)
+            entry = (loop, _LoopTasks())
+            self._loop_tasks[id(loop)] = entry
+        return entry[1]
+
+    # ---------------- 获取 card ----------------
+
+    async def _fetch(self, agent_id: str, cfg: Dict[str, Any]) -> A2ADirectoryEntry:
+        base_url = cfg["base_url"].rstrip("/")
+        previous = self._entries.get(agent_id)
+        entry = A2ADirectoryEntry(agent_id=agent_id, base_url=base_url)
+        entry.fetch_count = (previous.fetch_count if previous else 0) + 1
+        try:
+            # 与 a2a_agent_node 共享客户端：刷新 card 的同时更新其缓存的流式能力
+            client = get_a2a_http_client(base_url)
+            card = await asyncio.wait_for(client.refresh_card(), timeout=self.fetch_timeout)
+            if card and card.name != UNKNOWN_AGENT_NAME and card.description != UNKNOWN_AGENT_DESC:
+                entry.name = card.name
+                entry.desc = card.description
+                entry.available = True
+            else:
+                entry.last_error = "agent card not available"
+        except Exception as e:
+            entry.last_error = str(e) or type(e).__name__
+            logger.warning(f"[A2ADirectory] 获取 {agent_id} agent card 失败: {entry.last_error}")
+
+        if not entry.available and previous is not None and previous.available:
+            # 获取失败时继续提供上一次成功的信息，按失败 TTL 重试
+            entry.name = previous.name
+            entry.desc = previous.desc
+        entry.fetched_at = time.monotonic()
+        self._entries[agent_id] = entry
+        return entry
+
+    def _fetch_once(self, agent_id: str, cfg: Dict[str, Any]) -> asyncio.Task:
+        """同一事件循环中对同一智能体的并发获取请求合并为一个任务"""
+        inflight = self._tasks().inflight
+        task = inflight.get(agent_id)
+        if task is None or task.done():
+            task = asyncio.create_task(self._fetch(agent_id, cfg))
+            inflight[agent_id] = task
+            task.add_done_callback(lambda _t, key=agent_id: inflight.pop(key, None))
+        return task
+
+    async def refresh(self, force: bool = False) -> None:
+        """并发刷新过期（或全部）条目"""
+        targets = [
+            (agent_id, cfg) for agent_id, cfg in self._config.items()
+            if force or not self._is_fresh(self._entries.get(agent_id))
+        ]
+        if not targets:
+            return
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(self._fetch_once(agent_id, cfg) for agent_id, cfg in targets),
+            return_exceptions=True,
+        )
+        logger.info(f"[A2ADirectory] 刷新 {len(targets)} 个智能体，耗时 {(time.perf_counter() - started) * 1000:.0f}ms")
+
+    # ---------------- 后台刷新 ----------------
+
+    def _ensure_refresh_loop(self) -> None:
+        tasks = self._tasks()
+        if tasks.refresh_task is not None and not tasks.refresh_task.done():
+            return
+        tasks.refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.sleep(self.refresh_interval)
+                await self.refresh()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.warning(f"[A2ADirectory] 后台刷新失败: {e}")
+
+    # ---------------- 对外接口 ----------------
+
+    async def start(self, a2a_config: Dict[str, Dict[str, Any]]) -> None:
+        """服务启动时预取所有 card 并启动后台刷新"""
+        self._set_config(a2a_config)
+        await self.refresh(force=True)
+        self._ensure_refresh_loop()
+
+    async def get_agents(self, a2a_config: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        返回 state["a2a_agents"] 格式的智能体列表。
+        仅在条目缺失时同步等待获取；已缓存但过期的条目直接返回并在后台刷新。
+        """
+        self._set_config(a2a_config)
+        missing = [(key, cfg) for key, cfg in self._config.items() if key not in self._entries]
+        if missing:
+            await asyncio.gather(*(self._fetch_once(key, cfg) for key, cfg in missing), return_exceptions=True)
+        if any(not self._is_fresh(self._entries.get(key)) for key in self._config):
+            tasks = self._tasks()
+            if tasks.background_refresh is None or tasks.background_refresh.done():
+                tasks.background_refresh = asyncio.create_task(self.refresh())
+        self._ensure_refresh_loop()
+
+        return [self._entries[key].to_state() for key in self._config if key in self._entries]
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            agent_id: {
+                "name": entry.name,
+                "available": entry.available,
+                "age_seconds": round(now - entry.fetched_at, 1),
+                "fetch_count": entry.fetch_count,
+                "last_error": entry.last_error,
+            }
+            for agent_id, entry in self._entries.items()
+        }
+
+    async def close(self) -> None:
+        """停止当前事件循环中的后台刷新，其他事件循环中的任务保持不变"""
+        loop = asyncio.get_running_loop()
+        entry = self._loop_tasks.pop(id(loop), None)
+        if entry is None or entry[0] is not loop:
+            return
+        tasks = entry[1]
+        pending = [
+            task for task in (tasks.refresh_task, tasks.background_refresh, *tasks.inflight.values())
+            if task is not None and not task.done()
+        ]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+def get_a2a_directory() -> A2ADirectory:
+    return A2ADirectory.get_instance()
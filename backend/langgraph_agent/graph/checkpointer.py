@@ -0,0 +1,310 @@
+"""
+图检查点（checkpointer）工厂
+
+通过环境变量 CHECKPOINTER_BACKEND（memory / sqlite / postgres / none）选择后端，按 thread_id（即 session_id）持久化图状态，
+后续轮次从保存的状态继续执行，跳过已完成的初始化工作。
+
+sqlite / postgres 后端分别依赖 langgraph-checkpoint-sqlite(aiosqlite) 与
+langgraph-checkpoint-postgres(psycopg[pool])，未安装时回退到内存实现。
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import MemorySaver
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedMemorySaver(MemorySaver):
+    """
+    带容量上限与空闲过期的内存 checkpointer。
+
+    按 thread_id 记录最近一次读写时间，会话数超过 max_threads 时淘汰最久未访问的会话，
+    空闲超过 ttl 秒的会话在下一次读写时清理，避免进程内状态无限增长。
+    """
+
+    def __init__(self, max_threads: int = 1000, ttl: float = 3600.0):
+        super().__init__()
+        self.max_threads = max(1, max_threads)
+        self.ttl = ttl
+        self._access: "OrderedDict[str, float]" = OrderedDict()
+        self._access_lock = threading.Lock()
+        self._evicted = 0
+
+    def _touch(self, config) -> None:
+        thread_id = (config or {}).get("configurable", {}).get("thread_id")
+        if thread_id is None:
+            return
+        now = time.monotonic()
+        expired = []
+        with self._access_lock:
+            self._access[thread_id] = now
+            self._access.move_to_end(thread_id)
+            while len(self._access) > self.max_threads or (
+                    self.ttl > 0 and now - next(iter(self._access.values())) > self.ttl
+            ):
+                expired.append(self._access.popitem(last=False)[0])
+            self._evicted += len(expired)
+        for old_thread_id in expired:
+            super().delete_thread(old_thread_id)
+
+    def get_tuple(self, config):
+        result = super().get_tuple(config)
+        # 只记录已有检查点的会话，读取不存在的会话不应挤占容量
+        if result is not None:
+            self._touch(config)
+        return result
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        result = super().put(config, checkpoint, metadata, new_versions)
+        self._touch(config)
+        return result
+
+    def delete_thread(self, thread_id):
+        with self._access_lock:
+            self._access.pop(thread_id, None)
+        return super().delete_thread(thread_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._access_lock:
+            return {"threads": len(self._access), "evicted_threads": self._evicted}
+
+
+class InstrumentedCheckpointer(BaseCheckpointSaver):
+    """
+    包装任意 checkpointer，记录读写延迟与状态大小，并在首次使用时执行异步 setup。
+    """
+
+    def __init__(
+            self,
+            inner: BaseCheckpointSaver,
+            backend: str,
+            setup: Optional[Callable[[], Awaitable[None]]] = None,
+            size_sample_every: int = 10,
+    ):
+        super().__init__(serde=inner.serde)
+        self.inner = inner
+        self.backend = backend
+        self._setup = setup
+        self._setup_done = setup is None
+        self._setup_lock: Optional[asyncio.Lock] = None
+        self._size_sample_every = max(1, size_sample_every)
+        self._lock = threading.Lock()
+        self._metrics = {
+            "writes": 0,
+            "write_latency_ms_total": 0.0,
+            "write_latency_ms_max": 0.0,
+            "pending_writes": 0,
+            "reads": 0,
+            "read_latency_ms_total": 0.0,
+            "last_state_bytes": 0,
+            "max_state_bytes": 0,
+            "errors": 0,
+        }
+
+    @property
+    def config_specs(self):
+        return self.inner.config_specs
+
+    async def _ensure_setup(self) -> None:
+        if self._setup_done:
+            return
+        if self._setup_lock is None:
+            self._setup_lock = asyncio.Lock()
+        async with self._setup_lock:
+            if self._setup_done:
+                return
+            await self._setup()
+            self._setup_done = True
+            logger.info(f"[Checkpointer] {self.backend} 初始化完成")
+
+    def _record(self, kind: str, started: float) -> None:
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._lock:
+            if kind == "write":
+                self._metrics["writes"] += 1
+                self._metrics["write_latency_ms_total"] += elapsed
+                self._metrics["write_latency_ms_max"] = max(self._metrics["write_latency_ms_max"], elapsed)
+            elif kind == "pending_write":
+                self._metrics["pending_writes"] += 1
+                self._metrics["write_latency_ms_total"] += elapsed
+            else:
+                self._metrics["reads"] += 1
+                self._metrics["read_latency_ms_total"] += elapsed
+
+    def _sample_state_size(self, checkpoint: Dict[str, Any]) -> None:
+        # 序列化有成本，只按采样间隔统计
+        if self._metrics["writes"] % self._size_sample_every != 0:
+            return
+        try:
+            _, data = self.serde.dumps_typed(checkpoint)
+            size = len(data)
+        except Exception:
+            return
+        with self._lock:
+            self._metrics["last_state_bytes"] = size
+            self._metrics["max_state_bytes"] = max(self._metrics["max_state_bytes"], size)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = dict(self._metrics)
+        writes = metrics["writes"] + metrics["pending_writes"]
+        metrics["backend"] = self.backend
+        if isinstance(self.inner, BoundedMemorySaver):
+            metrics.update(self.inner.stats())
+        metrics["avg_write_latency_ms"] = round(metrics["write_latency_ms_total"] / writes, 3) if writes else 0.0
+        metrics["avg_read_latency_ms"] = (
+            round(metrics["read_latency_ms_total"] / metrics["reads"], 3) if metrics["reads"] else 0.0
+        )
+        return metrics
+
+    # ---------------- 同步接口：直接委托 ----------------
+
+    def get_tuple(self, config):
+        return self.inner.get_tuple(config)
+
+    def list(self, config, *, filter=None, before=None, limit=None) -> Iterator:
+        return self.inner.list(config, filter=filter, before=before, limit=limit)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        return self.inner.put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(self, config, writes, task_id, *args, **kwargs):
+        return self.inner.put_writes(config, writes, task_id, *args, **kwargs)
+
+    def get_next_version(self, current, channel):
+        return self.inner.get_next_version(current, channel)
+
+    def delete_thread(self, thread_id):
+        return self.inner.delete_thread(thread_id)
+
+    # ---------------- 异步接口：带统计 ----------------
+
+    async def aget_tuple(self, config):
+        await self._ensure_setup()
+        started = time.perf_counter()
+        try:
+            return await self.inner.aget_tuple(config)
+        finally:
+            self._record("read", started)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None) -> AsyncIterator:
+        await self._ensure_setup()
+        async for item in self.inner.alist(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def adelete_thread(self, thread_id):
+        await self._ensure_setup()
+        return await self.inner.adelete_thread(thread_id)
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        await self._ensure_setup()
+        started = time.perf_counter()
+        try:
+            result = await self.inner.aput(config, checkpoint, metadata, new_versions)
+        except Exception:
+            with self._lock:
+                self._metrics["errors"] += 1
+            raise
+        self._record("write", started)
+        self._sample_state_size(checkpoint)
+        return result
+
+    async def aput_writes(self, config, writes, task_id, *args, **kwargs):
+        await self._ensure_setup()
+        started = time.perf_counter()
+        try:
+            return await self.inner.aput_writes(config, writes, task_id, *args, **kwargs)
+        except Exception:
+            with self._lock:
+                self._metrics["errors"] += 1
+            raise
+        finally:
+            self._record("pending_write", started)
+
+
+def _create_sqlite_checkpointer() -> InstrumentedCheckpointer:
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    path = os.getenv("CHECKPOINTER_SQLITE_PATH", "./checkpoints.sqlite")
+    # aiosqlite.connect 返回的连接对象在 setup 时才真正打开
+    saver = AsyncSqliteSaver(aiosqlite.connect(path))
+    return InstrumentedCheckpointer(saver, "sqlite", setup=saver.setup, size_sample_every=_sample_every())
+
+
+def _create_postgres_checkpointer() -> InstrumentedCheckpointer:
+    from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+    from psycopg.rows import dict_row
+    from psycopg_pool import AsyncConnectionPool
+
+    uri = os.getenv("CHECKPOINTER_POSTGRES_URI")
+    if not uri:
+        raise ValueError("CHECKPOINTER_POSTGRES_URI 未配置")
+    pool = AsyncConnectionPool(
+        uri,
+        max_size=int(os.getenv("CHECKPOINTER_POSTGRES_POOL_SIZE", "10")),
+        open=False,
+        kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row},
+    )
+    saver = AsyncPostgresSaver(pool)
+
+    async def setup():
+        await pool.open()
+        await saver.setup()
+
+    return InstrumentedCheckpointer(saver, "postgres", setup=setup, size_sample_every=_sample_every())
+
+
+def _sample_every() -> int:
+    return int(os.getenv("CHECKPOINT_SIZE_SAMPLE_EVERY", "10"))
+
+
+def create_checkpointer() -> Optional[InstrumentedCheckpointer]:
+    """根据 CHECKPOINTER_BACKEND 创建 checkpointer，失败时回退到内存实现"""
+    backend = os.getenv("CHECKPOINTER_BACKEND", "memory").strip().lower()
+    if backend in ("", "none", "off", "false"):
+        logger.info("[Checkpointer] 已禁用")
+        return None
+
+    try:
+        if backend == "sqlite":
+            return _create_sqlite_checkpointer()
+        if backend in ("postgres", "postgresql"):
+            return _create_postgres_checkpointer()
+        if backend != "memory":
+            logger.warning(f"[Checkpointer] 未知后端 {backend}，使用内存实现")
+    except Exception as e:
+        logger.warning(f"[Checkpointer] {backend} 初始化失败，回退到内存实现: {e}")
+
+    saver = BoundedMemorySaver(
+        max_threads=int(os.getenv("CHECKPOINTER_MEMORY_MAX_THREADS", "1000")),
+        ttl=float(os.getenv("CHECKPOINTER_MEMORY_TTL", "3600")),
+    )
+    return InstrumentedCheckpointer(saver, "memory", size_sample_every=_sample_every())
+
+
+# 进程级单例
+_checkpointer: Optional[InstrumentedCheckpointer] = None
+_checkpointer_created = False
+
+
+def get_checkpointer() -> Optional[InstrumentedCheckpointer]:
+    global _checkpointer, _checkpointer_created
+    if not _checkpointer_created:
+        _checkpointer = create_checkpointer()
+        _checkpointer_created = True
+    return _checkpointer
+
+
+def get_checkpointer_metrics() -> Dict[str, Any]:
+    """获取检查点读写延迟与状态大小指标"""
+    if _checkpointer is None:
+        return {"backend": "none"}
+    return _checkpointer.metrics()
@@ -0,0 +1,247 @@
+"""
+A2A 智能体熔断器与重试预算（进程级，所有会话共享）
+
+每个智能体一个熔断器：
+- closed：统计时间窗口内的调用结果，失败率达到阈值时打开；
+- open：直接拒绝调用，supervisor 不再把该智能体提供给 LLM 选择；冷却时间随连续打开次数指数增长；
+- half_open：冷却结束后只放行少量探测调用，探测成功则关闭，失败则重新打开。
+只有超时、连接失败与服务暂时不可用（A2AExecutionResult.retryable）计为失败；
+智能体返回的业务错误说明服务可达，按成功统计。
+重试受预算限制：窗口内的重试次数不超过调用次数的一定比例（另有少量保底），退避时间带随机抖动。
+"""
+import logging
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+class RetryBudget:
+    """窗口内的重试预算：可重试次数 = 调用次数 × 比例 + 保底次数"""
+
+    def __init__(self, window: float, ratio: float, min_retries: int,
+                 base_delay: float, max_delay: float, clock: Callable[[], float] = time.monotonic):
+        self.window = window
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._clock = clock
+        self._calls: Deque[float] = deque()
+        self._retries: Deque[float] = deque()
+
+    def _trim(self, now: float) -> None:
+        for events in (self._calls, self._retries):
+            while events and now - events[0] > self.window:
+                events.popleft()
+
+    def record_call(self) -> None:
+        self._calls.append(self._clock())
+
+    def try_acquire(self) -> bool:
+        """预算充足时占用一次重试并返回 True"""
+        now = self._clock()
+        self._trim(now)
+        if len(self._retries) >= len(self._calls) * self.ratio + self.min_retries:
+            return False
+        self._retries.append(now)
+        return True
+
+    def backoff(self, attempt: int) -> float:
+        """第 attempt 次重试前的等待时间（full jitter 指数退避）"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def stats(self) -> Dict[str, int]:
+        self._trim(self._clock())
+        return {"calls": len(self._calls), "retries": len(self._retries)}
+
+
+class CircuitBreaker:
+    """单个智能体的熔断器"""
+
+    def __init__(
+            self,
+            name: str,
+            window: float = 60,
+            min_calls: int = 4,
+            failure_rate: float = 0.5,
+            open_seconds: float = 30,
+            max_open_seconds: float = 300,
+            half_open_probes: int = 1,
+            clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.half_open_probes = half_open_probes
+        self._clock = clock
+        self.state = CLOSED
+        # (时间, 是否成功)
+        self._results: Deque[Tuple[float, bool]] = deque()
+        self._opened_at = 0.0
+        self._open_count = 0
+        self._probes = 0
+        self._stats = {"calls": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    # ---------------- 状态 ----------------
+
+    def _cooldown(self) -> float:
+        return min(self.max_open_seconds, self.open_seconds * (2 ** max(0, self._open_count - 1)))
+
+    def _refresh(self) -> str:
+        """open 状态冷却结束后进入 half_open"""
+        if self.state == OPEN and self._clock() - self._opened_at >= self._cooldown():
+            self.state = HALF_OPEN
+            self._probes = 0
+            logger.info(f"[熔断器] {self.name} 冷却结束，进入半开状态")
+        return self.state
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self._opened_at = self._clock()
+        self._open_count += 1
+        self._probes = 0
+        self._results.clear()
+        self._stats["opened"] += 1
+        logger.warning(f"[熔断器] {self.name} 已打开，{self._cooldown():.0f} 秒内拒绝调用")
+
+    def _close(self) -> None:
+        self.state = CLOSED
+        self._open_count = 0
+        self._probes = 0
+        self._results.clear()
+        logger.info(f"[熔断器] {self.name} 已恢复")
+
+    # ---------------- 对外接口 ----------------
+
+    def available(self) -> bool:
+        """是否可以接收新调用（不占用探测名额，供路由决策使用）"""
+        state = self._refresh()
+        return state == CLOSED or (state == HALF_OPEN and self._probes < self.half_open_probes)
+
+    def allow(self) -> bool:
+        """调用前检查：允许时返回 True（半开状态下占用一个探测名额），调用结束后必须记录结果"""
+        state = self._refresh()
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and self._probes < self.half_open_probes:
+            self._probes += 1
+            return True
+        self._stats["rejected"] += 1
+        return False
+
+    def record_success(self) -> None:
+        self._stats["calls"] += 1
+        if self.state == HALF_OPEN:
+            self._close()
+            return
+        self._record(True)
+
+    def record_failure(self) -> None:
+        self._stats["calls"] += 1
+        self._stats["failures"] += 1
+        if self.state == HALF_OPEN:
+            self._open()
+            return
+        if self.state == CLOSED:
+            self._record(False)
+
+    def release(self) -> None:
+        """调用被取消，未得到结果：归还半开状态的探测名额"""
+        if self.state == HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def _record(self, ok: bool) -> None:
+        now = self._clock()
+        self._results.append((now, ok))
+        while self._results and now - self._results[0][0] > self.window:
+            self._results.popleft()
+        if ok or len(self._results) < self.min_calls:
+            return
+        failures = sum(1 for _, result in self._results if not result)
+        if failures / len(self._results) >= self.failure_rate:
+            self._open()
+
+    def stats(self) -> Dict[str, Any]:
+        state = self._refresh()
+        failures = sum(1 for _, ok in self._results if not ok)
+        return {
+            "state": state,
+            **self._stats,
+            "window_calls": len(self._results),
+            "window_failures": failures,
+            "cooldown": round(self._cooldown(), 1) if state == OPEN else 0,
+        }
+
+
+class CircuitBreakerRegistry:
+    """按智能体 ID 管理熔断器与重试预算"""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._budgets: Dict[str, RetryBudget] = {}
+
+    def breaker(self, key: str) -> CircuitBreaker:
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                key,
+                window=_env_float("A2A_BREAKER_WINDOW", 60),
+                min_calls=int(_env_float("A2A_BREAKER_MIN_CALLS", 4)),
+                failure_rate=_env_float("A2A_BREAKER_FAILURE_RATE", 0.5),
+                open_seconds=_env_float("A2A_BREAKER_OPEN_SECONDS", 30),
+                max_open_seconds=_env_float("A2A_BREAKER_MAX_OPEN_SECONDS", 300),
+                half_open_probes=int(_env_float("A2A_BREAKER_HALF_OPEN_PROBES", 1)),
+                clock=self._clock,
+            )
+            self._breakers[key] = breaker
+        return breaker
+
+    def retry_budget(self, key: str) -> RetryBudget:
+        budget = self._budgets.get(key)
+        if budget is None:
+            budget = RetryBudget(
+                window=_env_float("A2A_BREAKER_WINDOW", 60),
+                ratio=_env_float("A2A_RETRY_BUDGET_RATIO", 0.2),
+                min_retries=int(_env_float("A2A_RETRY_MIN_PER_WINDOW", 3)),
+                base_delay=_env_float("A2A_RETRY_BASE_DELAY", 1),
+                max_delay=_env_float("A2A_RETRY_MAX_DELAY", 16),
+                clock=self._clock,
+            )
+            self._budgets[key] = budget
+        return budget
+
+    def available(self, key: Optional[str]) -> bool:
+        """智能体当前是否可被路由（未记录过的智能体视为可用）"""
+        breaker = self._breakers.get(key) if key else None
+        return breaker is None or breaker.available()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            key: {**breaker.stats(), "retry_budget": self.retry_budget(key).stats()}
+            for key, breaker in self._breakers.items()
+        }
+
+
+# 全局 A2A 熔断器注册表
+a2a_breakers = CircuitBreakerRegistry()
+
+
+def get_circuit_breaker_stats() -> Dict[str, Any]:
+    """各 A2A 智能体的熔断状态与重试预算使用情况"""
+    return a2a_breakers.stats()
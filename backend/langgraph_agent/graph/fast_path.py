@@ -0,0 +1,102 @@
+"""
+Supervisor 快速路由
+
+下一步可由规则唯一确定时直接给出路由决策，跳过 supervisor 的结构化输出 LLM 调用；
+无法确定时返回 None，仍由 supervisor LLM 决策。
+
+快速路由只做决策，不修改 current_step_index 等工作流字段（由执行步骤的智能体节点维护）。
+目前只有“reporter 已完成 → FINISH”一条规则：supervisor 的结构化输出不产生 workflow_plan，
+工具执行器或智能体完成后的下一步（再次调用工具、交给 reporter 或直接回答）没有可依据的计划，
+仍需 LLM 判断。
+"""
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from langchain_core.messages import AIMessage
+
+from langgraph_agent.graph.state import AgentState
+
+SUPERVISOR_FAST_PATH = os.getenv("SUPERVISOR_FAST_PATH", "true").lower() in ("1", "true", "yes")
+
+# reporter 成功生成报告后在最终消息的 additional_kwargs 中写入该标记
+REPORT_COMPLETED_KEY = "report_completed"
+
+
+@dataclass
+class FastPathDecision:
+    """快速路由决策，字段与 supervisor 的结构化输出一致"""
+    next: str
+    rule: str
+    sub_task: str = ""
+    final_answer: str = ""
+
+
+def _reporter_finished(state: AgentState) -> bool:
+    """reporter 已成功生成报告（reporter 只能作为最后一步且不能再次调用）；生成失败时由 supervisor 决定如何答复"""
+    inner_messages = state.get("inner_messages") or []
+    if not inner_messages:
+        return False
+    last_message = inner_messages[-1]
+    if not isinstance(last_message, AIMessage) or last_message.name != "reporter":
+        return False
+    return bool(last_message.additional_kwargs.get(REPORT_COMPLETED_KEY))
+
+
+class FastPathRouter:
+    """
+    Supervisor 快速路由器。
+
+    规则按顺序匹配：
+    1. reporter_finished：reporter 已完成 → FINISH
+    """
+
+    def __init__(self, enabled: bool = SUPERVISOR_FAST_PATH):
+        self.enabled = enabled
+        self._rule_hits: Dict[str, int] = {}
+        self._llm_decisions = 0
+
+    def route(self, state: AgentState) -> Optional[FastPathDecision]:
+        """
+        尝试不调用 LLM 直接确定下一步
+
+        Args:
+            state: 当前状态
+
+        Returns:
+            FastPathDecision，无法唯一确定时返回 None
+        """
+        if not self.enabled:
+            return None
+
+        decision = None
+        if _reporter_finished(state):
+            decision = FastPathDecision(next="FINISH", rule="reporter_finished")
+
+        if decision is not None:
+            self._rule_hits[decision.rule] = self._rule_hits.get(decision.rule, 0) + 1
+        return decision
+
+    def record_llm_decision(self) -> None:
+        """记录一次回退到 supervisor LLM 的决策"""
+        self._llm_decisions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        fast_path = sum(self._rule_hits.values())
+        total = fast_path + self._llm_decisions
+        return {
+            "enabled": self.enabled,
+            "fast_path": fast_path,
+            "llm": self._llm_decisions,
+            "fast_path_ratio": round(fast_path / total, 3) if total else 0.0,
+            "rules": dict(self._rule_hits),
+        }
+
+
+# 全局快速路由器实例
+fast_path_router = FastPathRouter()
+
+
+def get_fast_path_stats() -> Dict[str, Any]:
+    """快速路由与 LLM 路由的命中情况"""
+    return fast_path_router.stats()
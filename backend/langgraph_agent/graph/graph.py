@@ -1,18 +1,26 @@
-import copy
+import hashlib
 import uuid
-from typing import Tuple
+from collections import OrderedDict
+from copy import deepcopy
+from typing import Awaitable, Callable, Tuple
 
 from langchain_core.callbacks.manager import adispatch_custom_event
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from langchain_core.messages import (
     ToolCall,
 )
 from langgraph.graph import StateGraph, START
 
-from langgraph_agent.graph.a2a_agent import create_a2a_agent_info_from_config, a2a_agent_node, A2AHttpClient2
+from langgraph_agent.graph.checkpointer import get_checkpointer
+from langgraph_agent.graph.a2a_directory import get_a2a_directory
+from langgraph_agent.graph.a2a_agent import create_a2a_agent_info_from_config, a2a_agent_node
+from langgraph_agent.graph.circuit_breaker import a2a_breakers
 from langgraph_agent.graph.mcp_client import MCPConnectionManager
 from langgraph_agent.graph.nodes import *
 from langgraph_agent.graph.reporter_node import generate_reporter, generate_reporter_result
-from langgraph_agent.graph.state import AgentState, create_initial_state
+from langgraph_agent.graph.fast_path import REPORT_COMPLETED_KEY, fast_path_router
+from langgraph_agent.graph.intent_classifier import intent_classifier
+from langgraph_agent.graph.state import AgentState, create_initial_state, reset_turn_state
 from langgraph_agent.prompts import *
 from langgraph_agent.graph.utils import send_temp_tool_call_to_frontend, send_temp_message_to_frontend
 
@@ -35,7 +43,7 @@ from langgraph_agent.tools import (
 )
 from langgraph_agent.tools.sandbox.manager import sbx_manager
 from langgraph_agent.utils.json_utils import json_repair
-from langgraph_agent.utils.message_utils import get_last_show_message_id
+from langgraph_agent.utils.message_utils import get_last_show_message_id, share_messages
 
 # Optional dependency for token counting
 try:
@@ -53,18 +61,146 @@ except Exception:  # pragma: no cover
 logger = logging.getLogger(__name__)
 
 
+# 事件循环 id -> (事件循环, 信号量)：并发工具调用数上限在同一事件循环内的所有批次、所有会话间共享
+_tool_call_limiters: Dict[int, Tuple[asyncio.AbstractEventLoop, asyncio.Semaphore]] = {}
+
+
+def _tool_call_limiter() -> asyncio.Semaphore:
+    """获取当前事件循环的工具并发信号量（asyncio 原语绑定创建时的事件循环），上限由 TOOL_EXECUTOR_MAX_CONCURRENCY 决定"""
+    loop = asyncio.get_running_loop()
+    entry = _tool_call_limiters.get(id(loop))
+    if entry is None or entry[0] is not loop:
+        for key, (other_loop, _) in list(_tool_call_limiters.items()):
+            if other_loop.is_closed():
+                _tool_call_limiters.pop(key, None)
+        entry = (loop, asyncio.Semaphore(max(1, int(os.getenv("TOOL_EXECUTOR_MAX_CONCURRENCY", "4")))))
+        _tool_call_limiters[id(loop)] = entry
+    return entry[1]
+
+
 def create_ai_message(content: str, name: str = None) -> AIMessage:
     """创建带有唯一ID的AIMessage"""
     return AIMessage(content=content, name=name, id=str(uuid.uuid4()))
 
 
 class ContextManager:
-    """Lightweight inlined context manager with basic compression + token counting."""
+    """
+    Lightweight inlined context manager with compression + token counting.
+
+    压缩策略（按顺序，达到预算即停止）：
+    1. 截断较早的工具结果；
+    2. 将较早的对话片段交给 summarizer 生成滚动摘要（按片段哈希缓存，跨轮次复用）；
+    3. 仍超出预算时，对最近窗口内的工具结果做更激进的截断。
+    切分边界不会拆开 tool_calls 与对应的 ToolMessage。
+    """
 
-    def __init__(self, token_threshold: int = 60000):
+    DEFAULT_TOKEN_BUDGET = 41000
+
+    def __init__(
+            self,
+            token_threshold: int = DEFAULT_TOKEN_BUDGET,
+            token_cache_size: Optional[int] = None,
+            summarizer: Optional[Callable[[str, List[Dict[str, Any]], Optional[str]], Awaitable[str]]] = None,
+    ):
+        # 未在 CONTEXT_TOKEN_BUDGETS 中配置（也没有 default）的模型使用该预算
         self.token_threshold = token_threshold
         self.compression_target_ratio = 0.6
         self.min_keep_messages = 6
+        # 摘要生成函数：(model, 待摘要消息, 已有摘要) -> 新摘要
+        self.summarizer = summarizer
+        self.summary_timeout = float(os.getenv("CONTEXT_SUMMARY_TIMEOUT", "60"))
+        self.tool_result_max_chars = int(os.getenv("CONTEXT_TOOL_RESULT_MAX_CHARS", "4000"))
+        # 每个模型的 token 预算，如 {"Qwen3-235B": 28000, "default": 41000}，按模型名子串匹配
+        self._token_budgets = self._load_token_budgets()
+        # 片段摘要值 -> 摘要；thread_id -> (已覆盖消息数, 前缀摘要值, 摘要)
+        self._summary_cache: "OrderedDict[str, str]" = OrderedDict()
+        self._summary_cache_size = int(os.getenv("CONTEXT_SUMMARY_CACHE_SIZE", "256"))
+        self._rolling_summaries: "OrderedDict[str, Tuple[int, str, str]]" = OrderedDict()
+        # 单条消息 token 数缓存：(model, 消息指纹) -> token 数，LRU 淘汰
+        self._token_cache: "OrderedDict[Tuple[Any, ...], int]" = OrderedDict()
+        self._token_cache_size = token_cache_size or int(os.getenv("CONTEXT_TOKEN_CACHE_SIZE", "20000"))
+        # 每个模型的固定开销（如 OpenAI 计数中的 reply priming），按模型缓存
+        self._priming_tokens: Dict[str, int] = {}
+        # 会话级累计统计：thread_id -> 统计信息
+        self._session_stats: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._max_sessions = int(os.getenv("CONTEXT_TOKEN_MAX_SESSIONS", "1000"))
+
+    @staticmethod
+    def _fallback_count(payload: List[Dict[str, Any]]) -> int:
+        total = 0
+        for msg in payload:
+            total += len(str(msg.get("content", "")).split())
+        return total
+
+    def _priming(self, model: str) -> int:
+        """计算 token_counter 对整段消息额外增加的固定 token（与消息条数无关的部分）"""
+        if model not in self._priming_tokens:
+            probe = {"role": "user", "content": "hi"}
+            try:
+                single = token_counter(model=model, messages=[probe])
+                double = token_counter(model=model, messages=[probe, probe])
+                self._priming_tokens[model] = max(0, 2 * single - double)
+            except Exception:
+                self._priming_tokens[model] = 0
+        return self._priming_tokens[model]
+
+    @staticmethod
+    def _message_key(model: str, msg: Dict[str, Any]) -> Tuple[Any, ...]:
+        """消息指纹：id + 内容哈希。str 的哈希值由解释器缓存，重复计算开销很小"""
+        content = msg.get("content", "")
+        if not isinstance(content, str):
+            content = json.dumps(content, ensure_ascii=False, sort_keys=True, default=str)
+        tool_calls = msg.get("tool_calls")
+        tool_calls_key = json.dumps(tool_calls, ensure_ascii=False, sort_keys=True, default=str) if tool_calls else None
+        return (
+            model,
+            msg.get("role"),
+            msg.get("name"),
+            msg.get("message_id"),
+            msg.get("tool_call_id"),
+            len(content),
+            hash(content),
+            tool_calls_key,
+        )
+
+    def _message_tokens(self, model: str, msg: Dict[str, Any], counters: Dict[str, int]) -> int:
+        key = self._message_key(model, msg)
+        cached = self._token_cache.get(key)
+        if cached is not None:
+            self._token_cache.move_to_end(key)
+            counters["hits"] += 1
+            return cached
+
+        counters["misses"] += 1
+        try:
+            tokens = token_counter(model=model, messages=[msg]) - self._priming(model)
+        except Exception:
+            tokens = self._fallback_count([msg])
+        self._token_cache[key] = tokens
+        if len(self._token_cache) > self._token_cache_size:
+            self._token_cache.popitem(last=False)
+        return tokens
+
+    def _record_session(self, thread_id: str, model: str, total: int, counters: Dict[str, int]) -> None:
+        stats = self._session_stats.get(thread_id)
+        if stats is None:
+            stats = {"model": model, "calls": 0, "tokenized_messages": 0, "cached_messages": 0, "total_tokens": 0}
+            self._session_stats[thread_id] = stats
+            if len(self._session_stats) > self._max_sessions:
+                self._session_stats.popitem(last=False)
+        else:
+            self._session_stats.move_to_end(thread_id)
+        stats["model"] = model
+        stats["calls"] += 1
+        stats["tokenized_messages"] += counters["misses"]
+        stats["cached_messages"] += counters["hits"]
+        stats["total_tokens"] = total
+
+    def get_session_stats(self, thread_id: Optional[str]) -> Dict[str, Any]:
+        """返回会话的 token 统计（副本）"""
+        if not thread_id or thread_id not in self._session_stats:
+            return {}
+        return dict(self._session_stats[thread_id])
 
     async def count_tokens(
             self,
@@ -72,18 +208,28 @@ class ContextManager:
             messages: List[Dict[str, Any]],
             system_prompt: Optional[Dict[str, Any]] = None,
             apply_caching: bool = True,
+            thread_id: Optional[str] = None,
     ) -> int:
         payload = []
         if system_prompt:
             payload.append(system_prompt)
         payload.extend(messages)
-        try:
-            return token_counter(model=model, messages=payload)
-        except Exception:
-            total = 0
-            for msg in payload:
-                total += len(str(msg.get("content", "")).split())
-            return total
+
+        if not apply_caching:
+            try:
+                return token_counter(model=model, messages=payload)
+            except Exception:
+                return self._fallback_count(payload)
+
+        # 增量计数：已计数过的消息直接命中缓存，只对新消息调用 token_counter
+        counters = {"hits": 0, "misses": 0}
+        total = self._priming(model)
+        for msg in payload:
+            total += self._message_tokens(model, msg, counters)
+
+        if thread_id:
+            self._record_session(thread_id, model, total, counters)
+        return total
 
     def _flatten_content(self, msg: Dict[str, Any]) -> str:
         content = msg.get("content", "")
@@ -91,13 +237,129 @@ class ContextManager:
             return content
         return json.dumps(content, ensure_ascii=False)
 
+    @staticmethod
+    def _load_token_budgets() -> Dict[str, int]:
+        raw = os.getenv("CONTEXT_TOKEN_BUDGETS", "")
+        if not raw:
+            return {}
+        try:
+            budgets = json.loads(raw)
+            return {str(k): int(v) for k, v in budgets.items()}
+        except Exception as err:
+            logger.warning(f"CONTEXT_TOKEN_BUDGETS 解析失败，使用默认预算: {err}")
+            return {}
+
+    def get_token_budget(self, model: str) -> int:
+        """按模型名获取 token 预算：精确匹配 > 最长子串匹配 > default"""
+        budgets = self._token_budgets
+        if model in budgets:
+            return budgets[model]
+        matches = [key for key in budgets if key != "default" and key in (model or "")]
+        if matches:
+            return budgets[max(matches, key=len)]
+        return budgets.get("default", self.token_threshold)
+
+    @staticmethod
+    def _truncate_text(text: str, max_chars: int) -> str:
+        if len(text) <= max_chars:
+            return text
+        head = max_chars * 2 // 3
+        tail = max_chars - head
+        return f"{text[:head]}\n...[truncated {len(text) - max_chars} chars]...\n{text[-tail:]}"
+
+    def _truncate_tool_results(
+            self,
+            messages: List[Dict[str, Any]],
+            max_chars: int,
+            protect_recent: int,
+    ) -> List[Dict[str, Any]]:
+        """截断工具结果，最近 protect_recent 条保持原样；没有变化时返回原列表"""
+        boundary = max(0, len(messages) - protect_recent)
+        result = None
+        for index in range(boundary):
+            msg = messages[index]
+            if msg.get("role") != "tool":
+                continue
+            content = self._flatten_content(msg)
+            if len(content) <= max_chars:
+                continue
+            if result is None:
+                result = list(messages)
+            # 生成新字典，不修改原消息
+            result[index] = {**msg, "content": self._truncate_text(content, max_chars)}
+        return result if result is not None else messages
+
+    def _find_summary_boundary(self, messages: List[Dict[str, Any]], head: int) -> int:
+        """返回保留窗口的起始下标，保证不会把 ToolMessage 与其 tool_calls 拆开"""
+        cut = max(head, len(messages) - self.min_keep_messages)
+        while cut > head and messages[cut].get("role") == "tool":
+            cut -= 1
+        return cut
+
+    def _extractive_summary(self, segment: List[Dict[str, Any]], previous: Optional[str]) -> str:
+        """summarizer 不可用时的兜底摘要：保留每条消息的开头部分"""
+        lines = [previous] if previous else []
+        for msg in segment:
+            speaker = msg.get("name") or msg.get("role", "")
+            text = " ".join(self._flatten_content(msg).split())
+            lines.append(f"- {speaker}: {text[:200]}")
+        return self._truncate_text("\n".join(lines), self.tool_result_max_chars)
+
+    @staticmethod
+    def _segment_digest(model: str, segment: List[Dict[str, Any]]) -> str:
+        """摘要缓存键：模型与序列化消息的 sha256，不依赖进程内随机化的 hash()，避免不同片段碰撞复用错误摘要"""
+        serialized = json.dumps([model, segment], ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+    async def _summarize_segment(
+            self,
+            model: str,
+            segment: List[Dict[str, Any]],
+            thread_id: Optional[str],
+    ) -> str:
+        segment_hash = self._segment_digest(model, segment)
+        cached = self._summary_cache.get(segment_hash)
+        if cached is not None:
+            self._summary_cache.move_to_end(segment_hash)
+            return cached
+
+        # 滚动摘要：本会话上次摘要覆盖的前缀未变化时，只需摘要新增部分
+        previous, new_part = None, segment
+        rolling = self._rolling_summaries.get(thread_id) if thread_id else None
+        if rolling:
+            covered, prefix_hash, summary = rolling
+            if covered <= len(segment) and self._segment_digest(model, segment[:covered]) == prefix_hash:
+                previous, new_part = summary, segment[covered:]
+        if previous is not None and not new_part:
+            return previous
+
+        summary = None
+        if self.summarizer:
+            try:
+                summary = await asyncio.wait_for(
+                    self.summarizer(model, new_part, previous), timeout=self.summary_timeout
+                )
+            except Exception as err:
+                logger.warning(f"Context summarization failed, using extractive fallback: {err}")
+        if not summary:
+            # 兜底摘要不缓存，下次仍尝试生成 LLM 摘要
+            return self._extractive_summary(new_part, previous)
+
+        self._summary_cache[segment_hash] = summary
+        if len(self._summary_cache) > self._summary_cache_size:
+            self._summary_cache.popitem(last=False)
+        if thread_id:
+            self._rolling_summaries[thread_id] = (len(segment), segment_hash, summary)
+            self._rolling_summaries.move_to_end(thread_id)
+            if len(self._rolling_summaries) > self._max_sessions:
+                self._rolling_summaries.popitem(last=False)
+        return summary
+
     async def compress_messages(
             self,
             messages: List[Dict[str, Any]],
             llm_model: str,
-            max_tokens: Optional[int] = 41000,
-            token_threshold: int = 4096,
-            max_iterations: int = 3,
+            max_tokens: Optional[int] = None,
             actual_total_tokens: Optional[int] = None,
             system_prompt: Optional[Dict[str, Any]] = None,
             thread_id: Optional[str] = None,
@@ -105,34 +367,41 @@ class ContextManager:
         if not messages:
             return messages
 
-        limit = max_tokens or self.token_threshold
+        limit = max_tokens or self.get_token_budget(llm_model)
         current_tokens = (
             actual_total_tokens
             if actual_total_tokens is not None
-            else await self.count_tokens(llm_model, messages, system_prompt)
+            else await self.count_tokens(llm_model, messages, system_prompt, thread_id=thread_id)
         )
         if current_tokens <= limit:
             return messages
 
         target_tokens = int(limit * self.compression_target_ratio)
-        result = list(messages)
 
-        for _ in range(max_iterations):
-            if len(result) <= self.min_keep_messages:
-                break
-
-            drop_count = max(1, len(result) // 8)
-            start = len(result) // 2 - drop_count // 2
-            removed = result[start: start + drop_count]
-            summary_text = f"[context compressed: removed {len(removed)} messages for token control]"
-            summary_msg = {"role": "assistant", "content": summary_text, "name": "context_compression"}
-            result = result[:start] + [summary_msg] + result[start + drop_count:]
-
-            current_tokens = await self.count_tokens(llm_model, result, system_prompt)
+        # 1. 截断较早的工具结果
+        result = self._truncate_tool_results(messages, self.tool_result_max_chars, self.min_keep_messages)
+        if result is not messages:
+            current_tokens = await self.count_tokens(llm_model, result, system_prompt, thread_id=thread_id)
             if current_tokens <= target_tokens:
-                break
+                return result
+
+        # 2. 较早片段替换为滚动摘要；首条用户消息（原始任务）保留
+        head = 1 if result[0].get("role") == "user" else 0
+        cut = self._find_summary_boundary(result, head)
+        if cut - head >= 2:
+            summary_text = await self._summarize_segment(llm_model, result[head:cut], thread_id)
+            summary_msg = {
+                "role": "assistant",
+                "content": f"[context summary of {cut - head} earlier messages]\n{summary_text}",
+                "name": "context_compression",
+            }
+            result = result[:head] + [summary_msg] + result[cut:]
+            current_tokens = await self.count_tokens(llm_model, result, system_prompt, thread_id=thread_id)
+            if current_tokens <= limit:
+                return result
 
-        return result
+        # 3. 最近窗口仍超出预算：对除最后一条外的工具结果做更激进的截断
+        return self._truncate_tool_results(result, max(500, self.tool_result_max_chars // 4), protect_recent=1)
 
 
 class A2AManager:
@@ -366,15 +635,47 @@ class AgentGraph:
         # LLM客户端缓存
         self._llm_clients_cache = {}
         # 上下文压缩管理器
-        self.context_manager = ContextManager()
+        self.context_manager = ContextManager(summarizer=self._summarize_context_segment)
         self._build_workflow()
 
         # MCP相关
         self.mcp_client = MCPConnectionManager.get_instance()
+        # mcp_node 派生数据缓存（工具 schema、prompt），随 mcp_client.tools_version 失效
+        self._mcp_tool_artifacts: Optional[Dict[str, Any]] = None
 
         # A2A相关
         self.a2a_manager = A2AManager()
         self.a2a_config = global_config.load_a2a_config()
+        self.a2a_directory = get_a2a_directory()
+
+    async def _summarize_context_segment(
+            self,
+            model_name: str,
+            segment: List[Dict[str, Any]],
+            previous_summary: Optional[str],
+    ) -> str:
+        """ContextManager 的摘要函数：调用共享 LLM 客户端生成滚动摘要（不向前端推送）"""
+        llm, _ = get_llm_client({}, {})
+        per_message_chars = self.context_manager.tool_result_max_chars // 2
+        lines = []
+        for msg in segment:
+            speaker = msg.get("name") or msg.get("role", "")
+            text = self.context_manager._truncate_text(
+                self.context_manager._flatten_content(msg), per_message_chars
+            )
+            lines.append(f"[{speaker}]\n{text}")
+
+        user_content = ""
+        if previous_summary:
+            user_content += f"# Existing summary\n{previous_summary}\n\n"
+        user_content += "# New messages\n" + "\n\n".join(lines)
+
+        response = await llm.ainvoke(
+            [SystemMessage(content=CONTEXT_SUMMARY_PROMPT), HumanMessage(content=user_content)],
+            # 摘要调用对前端隐藏，且不继承父节点的流式回调
+            config={"tags": ["langsmith:hidden"], "callbacks": []},
+        )
+        return response.content if isinstance(response.content, str) else str(response.content)
 
     def _message_to_context_dict(self, message: BaseMessage) -> Dict[str, Any]:
         role_map = {"ai": "assistant", "human": "user", "system": "system", "tool": "tool"}
@@ -414,7 +715,8 @@ class AgentGraph:
         if payload.get("message_id") is not None:
             common_kwargs["id"] = payload.get("message_id")
 
-        additional_kwargs = payload.get("additional_kwargs") or {}
+        # 拷贝一份，避免下方 pop 修改原消息共享的 additional_kwargs
+        additional_kwargs = dict(payload.get("additional_kwargs") or {})
         tool_calls_raw = payload.get("tool_calls")
         if tool_calls_raw is None and isinstance(additional_kwargs, dict):
             tool_calls_raw = additional_kwargs.get("tool_calls")
@@ -484,17 +786,23 @@ class AgentGraph:
             model_name: str,
             system_message: Optional[BaseMessage] = None,
     ) -> Tuple[List[BaseMessage], Optional[Dict[str, Any]]]:
-        """Apply context compression before invoking the LLM."""
-        base_messages = self._sanitize_messages(copy.deepcopy(state.get("inner_messages", [])))
+        """Apply context compression before invoking the LLM.
+
+        压缩结果只用于本次 LLM 调用，不回写 state：截断后的 ToolMessage 与摘要
+        若经 add_messages 按 id 合并会永久替换检查点中的原始历史。
+        """
+        # _sanitize_messages 返回新列表且共享消息对象，这里无需 deepcopy 整段历史
+        base_messages = self._sanitize_messages(state.get("inner_messages", []))
         if not base_messages:
             return base_messages, None
 
         system_prompt = self._message_to_context_dict(system_message) if system_message else None
         conversation_dicts = [self._message_to_context_dict(msg) for msg in base_messages]
 
+        session_id = state.get("session_id")
         try:
             original_tokens = await self.context_manager.count_tokens(
-                model_name, conversation_dicts, system_prompt, apply_caching=True
+                model_name, conversation_dicts, system_prompt, apply_caching=True, thread_id=session_id
             )
         except Exception as err:
             logger.warning(f"Context token count failed: {err}")
@@ -504,103 +812,89 @@ class AgentGraph:
             compressed_conversation = await self.context_manager.compress_messages(
                 conversation_dicts,
                 model_name,
+                actual_total_tokens=original_tokens,
                 system_prompt=system_prompt,
-                thread_id=state.get("session_id"),
+                thread_id=session_id,
             )
         except Exception as err:
             logger.warning(f"Context compression failed: {err}")
             return base_messages, None
 
-        try:
-            compressed_tokens = await self.context_manager.count_tokens(
-                model_name, compressed_conversation, system_prompt, apply_caching=True
-            )
-        except Exception as err:
-            logger.warning(f"Compressed token count failed: {err}")
+        if compressed_conversation is conversation_dicts:
+            # 未触发压缩，无需重新计数
             compressed_tokens = original_tokens
+        else:
+            try:
+                compressed_tokens = await self.context_manager.count_tokens(
+                    model_name, compressed_conversation, system_prompt, apply_caching=True, thread_id=session_id
+                )
+            except Exception as err:
+                logger.warning(f"Compressed token count failed: {err}")
+                compressed_tokens = original_tokens
 
         ratio = round(compressed_tokens / original_tokens, 4) if original_tokens else 1.0
         stats = {
             "original_tokens": original_tokens,
             "compressed_tokens": compressed_tokens,
             "compression_ratio": ratio,
+            "token_accounting": self.context_manager.get_session_stats(session_id),
         }
 
-        compressed_messages = [self._context_dict_to_message(msg) for msg in compressed_conversation]
-        state["context_compression"] = stats
-        state["inner_messages"] = copy.deepcopy(compressed_messages)
-        state["messages"] = copy.deepcopy(compressed_messages)
+        # 未被压缩的条目直接复用原消息对象（结构共享），仅为新生成的摘要条目构造消息
+        original_by_dict = {id(item): msg for item, msg in zip(conversation_dicts, base_messages)}
+        compressed_messages = [
+            original_by_dict.get(id(item)) or self._context_dict_to_message(item)
+            for item in compressed_conversation
+        ]
 
         logger.info(f"Context compression applied: {original_tokens} -> {compressed_tokens} tokens (ratio {ratio})")
         return compressed_messages, stats
 
+    @staticmethod
+    def _setup_stage_timeouts() -> Dict[str, float]:
+        """初始化各阶段超时（秒），可通过环境变量调整"""
+        return {
+            "a2a": float(os.getenv("SETUP_A2A_TIMEOUT", "15")),
+            "mcp": float(os.getenv("SETUP_MCP_TIMEOUT", "30")),
+            "sandbox": float(os.getenv("SETUP_SANDBOX_TIMEOUT", "60")),
+            # 附件阶段包含等待沙箱的时间
+            "attachment": float(os.getenv("SETUP_ATTACHMENT_TIMEOUT", "180")),
+        }
+
+    @staticmethod
+    async def _run_setup_stage(
+            name: str,
+            stage: Callable[[], Awaitable[Dict[str, Any]]],
+            timeout: float,
+            timings: Dict[str, float],
+    ) -> Dict[str, Any]:
+        """
+        执行单个初始化阶段，记录耗时，返回该阶段要写入 state 的字段；
+        超时或异常时记录日志并降级（返回空字典），不向外抛出
+        """
+        started = time.perf_counter()
+        try:
+            return await asyncio.wait_for(stage(), timeout=timeout) or {}
+        except asyncio.TimeoutError:
+            logger.warning(f"[initial_setup_node] 阶段 {name} 超时({timeout}s)，降级继续")
+            return {}
+        except Exception as e:
+            logger.warning(f"[initial_setup_node] 阶段 {name} 失败，降级继续: {str(e)}")
+            return {}
+        finally:
+            timings[name] = round((time.perf_counter() - started) * 1000, 1)
+
     async def initial_setup_node(self, state: AgentState, config: Dict[str, Any]) -> Command[Literal["coordinator"]]:
         """初始化设置节点 - 优化版本"""
         state = create_initial_state(state)
         input_data = state.get("input", {})
 
-        # 初始化A2A的配置
-        state["a2a_agents"] = []
-        for key, value in self.a2a_config.items():
-            if not value.get("enabled", False):
-                continue
-
-            if any(agent["agent_id"] == key for agent in state["a2a_agents"]):
-                continue
-
-            client = A2AHttpClient2(value["base_url"])
-            name = await client.get_a2a_name()
-            desc = await client.get_a2a_desc()
-            state["a2a_agents"].append(
-                {
-                    "name": name,
-                    "agent_id": key,
-                    "desc": desc,
-                    "base_url": value["base_url"]
-                }
-            )
-
-        # # 新增：初始化 e2b 沙箱
-        # try:
-        #     timeout_str = os.getenv("E2B_SANDBOX_TIMEOUT", "3600")
-        #     try:
-        #         sandbox_timeout = int(timeout_str)
-        #     except Exception:
-        #         sandbox_timeout = 3600
-
-        #     current_sandbox_id = state.get("e2b_sandbox_id")
-        #     if not current_sandbox_id:
-        #         logger.info(f"初始化 e2b 沙箱，timeout={sandbox_timeout}s")
-        #         sandbox = Sandbox.create(timeout=sandbox_timeout)
-        #         state["e2b_sandbox_id"] = getattr(sandbox, "sandbox_id", "")
-        #         logger.info(f"e2b 沙箱初始化完成: {state['e2b_sandbox_id']}")
-        #     else:
-        #         logger.info(f"检测到已有 e2b 沙箱，跳过初始化: {current_sandbox_id}")
-        # except ImportError as e:
-        #     logger.warning(f"未找到 e2b SDK 或配置，跳过沙箱初始化: {str(e)}")
-        # except Exception as e:
-        #     logger.warning(f"e2b 沙箱初始化失败: {str(e)}")
-
-        # 使用 SandboxManager 初始化 e2b 沙箱
-        try:
-            current_sandbox_id = state.get("e2b_sandbox_id")
-
-            if not current_sandbox_id or current_sandbox_id == "your_sandbox_id_here":
-                try:
-                    state, async_sbx = await sbx_manager.get_sandbox_async(state)
-                    sandbox_id = getattr(async_sbx, "sandbox_id", state.get("e2b_sandbox_id", ""))
-                except Exception as e_async:
-                    logger.warning(f"异步沙箱创建失败，尝试同步方式: {str(e_async)}")
-                    state, desktop_sbx = sbx_manager.get_sandbox(state)
-                    sandbox_id = getattr(desktop_sbx, "sandbox_id", state.get("e2b_sandbox_id", ""))
-                state["e2b_sandbox_id"] = sandbox_id
-                logger.info(f"e2b 沙箱初始化完成（manager）: {state['e2b_sandbox_id']}")
-            else:
-                logger.info(f"检测到已有 e2b 沙箱（manager 跳过）: {current_sandbox_id}")
-        except Exception as e:
-            logger.warning(f"e2b 沙箱通过 manager 初始化失败: {str(e)}")
+        # 从检查点恢复的会话：沙箱与已转换的附件不再重复处理，上一轮的计划、日志与执行结果重置
+        if state.get("setup_completed"):
+            logger.info(f"[initial_setup_node] 从检查点恢复会话: {state.get('session_id')}")
+            reset_turn_state(state)
 
-        # 处理消息
+        # 处理消息（同步且开销很小，先于各并发阶段完成，附件阶段依赖其结果）
         import uuid
         message_id = str(uuid.uuid4())
         messages = state.get("messages", [])
@@ -613,28 +907,105 @@ class AgentGraph:
                     messages.append(AIMessage(id=message_id, content=msg.get("content", ""), name="user"))
 
         messages = self._sanitize_messages(messages)
-        state["messages"] = copy.deepcopy(messages)
-        state["inner_messages"] = copy.deepcopy(messages)
+        state["messages"] = share_messages(messages)
+        state["inner_messages"] = share_messages(messages)
 
         logger.info(f"初始Messages：{state['inner_messages']}")
 
-        # 处理A2A智能体信息
-        state = await process_a2a_agents(state)
-        await self.add_dynamic_a2a_nodes(state, config)
-        # 预加载A2A智能体到管理器，确保后续a2a节点可用
-        try:
-            self.a2a_manager.preload_a2a_agents(state)
-        except Exception as e:
-            print(f"预加载A2A智能体失败: {str(e)}")
+        # 各初始化阶段相互独立，并发执行：
+        #   a2a  ──────────────┐
+        #   mcp  ──────────────┤
+        #   sandbox ─> attachment
+        # 每个阶段有独立超时，失败或超时时降级继续，不影响其他阶段。
+        # 各阶段只读取 state、在自己的副本上工作并返回要写入的字段，TaskGroup 结束后按固定顺序写回 state，
+        # 避免并发阶段（以及线程中的同步沙箱创建）同时修改同一个 state
+        timings: Dict[str, float] = {}
+        stage_timeouts = self._setup_stage_timeouts()
+
+        async def a2a_stage():
+            # 从目录服务的内存缓存读取，card 由后台定期刷新；恢复的会话同样重新读取，
+            # 不沿用检查点中可能已过期的智能体列表
+            a2a_state = dict(state)
+            a2a_state["a2a_agents"] = await self.a2a_directory.get_agents(self.a2a_config)
+            await process_a2a_agents(a2a_state)
+            await self.add_dynamic_a2a_nodes(a2a_state, config)
+            # 预加载A2A智能体到管理器，确保后续a2a节点可用
+            try:
+                self.a2a_manager.preload_a2a_agents(a2a_state)
+            except Exception as e:
+                print(f"预加载A2A智能体失败: {str(e)}")
+            return {"a2a_agents": a2a_state.get("a2a_agents", [])}
+
+        async def mcp_stage():
+            # ✅ 修复 BlockingError：load_mcp_config 现在是异步方法，需要 await
+            mcp_config = await global_config.load_mcp_config()
+            await self.mcp_client.start(mcp_config)
+            return {}
+
+        async def sandbox_stage():
+            # 使用 SandboxManager 初始化 e2b 沙箱。恢复的会话中已有的沙箱可能已超时销毁，
+            # 交给 SandboxManager 连接校验，连接失败时创建新沙箱
+            current_sandbox_id = state.get("e2b_sandbox_id")
+            if current_sandbox_id == "your_sandbox_id_here":
+                current_sandbox_id = ""
+            # SandboxManager 会回写传入的 state，只传入它需要的字段
+            sandbox_state = {"e2b_sandbox_id": current_sandbox_id}
+            try:
+                _, async_sbx = await sbx_manager.get_sandbox_async(sandbox_state)
+                sandbox_id = getattr(async_sbx, "sandbox_id", sandbox_state.get("e2b_sandbox_id", ""))
+            except Exception as e_async:
+                logger.warning(f"异步沙箱创建失败，尝试同步方式: {str(e_async)}")
+                # 同步创建会阻塞事件循环，放到线程中执行
+                sandbox_state = {"e2b_sandbox_id": current_sandbox_id}
+                _, desktop_sbx = await asyncio.to_thread(sbx_manager.get_sandbox, sandbox_state)
+                sandbox_id = getattr(desktop_sbx, "sandbox_id", sandbox_state.get("e2b_sandbox_id", ""))
+            if current_sandbox_id and sandbox_id != current_sandbox_id:
+                logger.warning(f"已有 e2b 沙箱不可用，已创建新沙箱: {current_sandbox_id} -> {sandbox_id}")
+            logger.info(f"e2b 沙箱初始化完成（manager）: {sandbox_id}")
+            return {"e2b_sandbox_id": sandbox_id}
+
+        async def attachment_stage():
+            # 附件需要写入沙箱，等待沙箱阶段结束（无论成功与否）后再处理；
+            # shield 保证附件阶段超时被取消时不会连带取消沙箱阶段
+            sandbox_update = await asyncio.shield(sandbox_task)
+            all_files = state.get("files", [])
+            processed_files = state.get("processed_files", [])
+            new_files = [f for f in all_files if f not in processed_files]
+            if not new_files:
+                return {}
+            attachment_state = dict(state)
+            attachment_state.update(sandbox_update)
+            attachment_state["files"] = new_files
+            attachment_state["inner_messages"] = list(state.get("inner_messages") or [])
+            attachment_state["logs"] = list(state.get("logs") or [])
+            await process_attachment(attachment_state, config)
+            return {
+                "inner_messages": attachment_state["inner_messages"],
+                "logs": attachment_state["logs"],
+                "processed_files": list(processed_files) + new_files,
+            }
 
-        # 处理MCP工具信息
-        # ✅ 修复 BlockingError：load_mcp_config 现在是异步方法，需要 await
-        mcp_config = await global_config.load_mcp_config()
-        await self.mcp_client.start(mcp_config)
+        setup_started = time.perf_counter()
+        async with asyncio.TaskGroup() as tg:
+            stage_tasks = [
+                tg.create_task(self._run_setup_stage("a2a", a2a_stage, stage_timeouts["a2a"], timings)),
+                tg.create_task(self._run_setup_stage("mcp", mcp_stage, stage_timeouts["mcp"], timings)),
+            ]
+            sandbox_task = tg.create_task(
+                self._run_setup_stage("sandbox", sandbox_stage, stage_timeouts["sandbox"], timings)
+            )
+            stage_tasks.append(sandbox_task)
+            stage_tasks.append(
+                tg.create_task(self._run_setup_stage("attachment", attachment_stage, stage_timeouts["attachment"], timings))
+            )
+        timings["total"] = round((time.perf_counter() - setup_started) * 1000, 1)
 
-        # 处理附件信息
-        state = await process_attachment(state, config)
+        # 按 a2a → mcp → sandbox → attachment 的顺序写回各阶段结果
+        for task in stage_tasks:
+            state.update(task.result())
 
+        state["setup_timings"] = timings
+        logger.info(f"[initial_setup_node] 初始化阶段耗时(ms): {timings}")
         logger.info(f"附件处理后的Messages：{state['inner_messages']}")
 
         # # 处理知识库信息
@@ -643,15 +1014,17 @@ class AgentGraph:
         # 确保必需的字段存在且正确设置
         if "conversation_round" not in state:
             state["conversation_round"] = 0
-        if "session_id" not in state:
-            # 从config中获取session_id，如果没有则生成一个
-            session_id = config.get("configurable", {}).get("session_id")
+        if not state.get("session_id") or state.get("session_id") == "default_session":
+            # 从config中获取session_id（或 checkpointer 的 thread_id），如果没有则生成一个
+            configurable = config.get("configurable", {})
+            session_id = configurable.get("session_id") or configurable.get("thread_id")
             if not session_id:
                 import uuid
-                session_id = f"session_{uuid.uuid4().hex[:8]}"
+                session_id = f"session_{uuid.uuid4().hex}"
             state["session_id"] = session_id
             print(f"[initial_setup_node] 设置会话ID: {session_id}")
 
+        state["setup_completed"] = True
         state_update = dict(state)
 
         logger.info(f"After Attchment Messages:\n{state['messages']}")
@@ -667,6 +1040,15 @@ class AgentGraph:
 
         logger.info(f"🔄 执行标准协调流程，agent_type: {state.get('agent_type', 'None')}")
 
+        # 寒暄与明显的任务请求无需调用 LLM
+        intent = intent_classifier.classify(state)
+        if intent is not None:
+            logger.info(f"coordinator预分类[{intent.source}]: handoff={intent.handoff}, confidence={intent.confidence}")
+            if intent.handoff:
+                return Command(update={}, goto="supervisor")
+            new_message = create_ai_message(intent.reply, node_name)
+            return Command(update={"messages": new_message, "inner_messages": new_message}, goto="__end__")
+
         llm, model_name = get_llm_client(state, config)
         prompt = COORDINATOR_PROMPT
 
@@ -684,7 +1066,7 @@ class AgentGraph:
         compressed_messages, compression_stats = await self._compress_conversation_for_llm(
             state, model_name, system_message
         )
-        messages = [system_message] + copy.deepcopy(compressed_messages)
+        messages = [system_message] + compressed_messages
         if compression_stats:
             state_update["context_compression"] = compression_stats
         try:
@@ -701,7 +1083,9 @@ class AgentGraph:
             logger.debug(f"Coordinator response: {response_content}")
             new_message = create_ai_message(response_content, node_name)
 
-            if "handoff_to_planner" in response_content:
+            handoff = "handoff_to_planner" in response_content
+            if handoff:
+                intent_classifier.remember(state)
                 goto = "supervisor"
             else:
                 state_update.update({
@@ -709,8 +1093,6 @@ class AgentGraph:
                     "inner_messages": new_message
                 })
                 goto = "__end__"
-            if state.get("context_compression"):
-                state_update["context_compression"] = state["context_compression"]
             logger.info(f"coordinator_node goto{goto}")
 
 
@@ -721,8 +1103,6 @@ class AgentGraph:
                 "messages": new_message,
                 "inner_messages": new_message
             })
-            if state.get("context_compression"):
-                state_update["context_compression"] = state["context_compression"]
             goto = "__end__"
 
         logger.info(f"state_update in coord: {state_update}")
@@ -766,8 +1146,13 @@ class AgentGraph:
             # state_update["logs"] = state["logs"]
             return Command(update=state, goto="__end__")
 
-        # 获取A2A智能体列表
-        a2a_agents = state.get("a2a_agents", [])
+        # 获取A2A智能体列表（熔断中的智能体不提供给 LLM 与快速路由选择）
+        a2a_agents = []
+        for agent in state.get("a2a_agents", []):
+            if a2a_breakers.available(agent.get("agent_id")):
+                a2a_agents.append(agent)
+            else:
+                logger.warning(f"A2A 智能体 {agent.get('name')} 熔断中，本轮不参与路由")
 
         # 获取MCP工具列表 - 简化处理
         mcp_tools = await self.mcp_client.get_tools()
@@ -781,26 +1166,6 @@ class AgentGraph:
                 item[
                     'description'] = "Extract and process content from a specific web page. Requires a complete URL as input (e.g., https://example.com/page), not a search query or keywords."
 
-        # 动态生成supervisor prompt和解析器
-        # generate_supervisor_prompt 等已通过顶部 from langgraph_agent.prompts import * 导入
-
-        prompt = await generate_supervisor_prompt(a2a_agents, mcp_tools_info)
-
-        # logger.info(f"Supervisor Prompt:\n{prompt}")
-
-        llm, model_name = get_llm_client(state, config)
-
-        messages = copy.deepcopy(state["inner_messages"])
-
-        # logger.info(f"supervisor_node messages:{messages}")
-        # 去除中间过程无效的ai消息，避免干扰
-        if isinstance(messages, list):
-            messages = [msg for msg in messages
-                        if not (hasattr(msg, 'content') and
-                                (msg.content == 'handoff_to_planner()' or
-                                 msg.content == '""') or
-                                (hasattr(msg, 'name') and msg.name == 'supervisor'))]
-
         # 获取所有可能的团队成员（包括动态A2A智能体）
         all_team_members = list(TEAM_MEMBERS)
         if a2a_agents:
@@ -810,37 +1175,66 @@ class AgentGraph:
             mcp_names = [f"mcp_{tool.get('name', '')}" for tool in mcp_tools_info if tool.get('name')]
             all_team_members.extend(mcp_names)
 
-        # for message in messages:
-        #     if isinstance(message, BaseMessage) and message.name in all_team_members:
-        #         message.content = RESPONSE_FORMAT.format(message.name, message.content)
+        # 下一步可由规则唯一确定时跳过 supervisor LLM 调用
+        fast_path = fast_path_router.route(state)
 
-        # 创建系统消息（不进行JSON转义，避免影响模型对格式要求的理解）
-        try:
-            system_message = SystemMessage(content=prompt)
-        except Exception as e:
-            print(f"⚠️ 系统prompt创建失败: {str(e)}")
-            # 使用简化的系统消息
-            simple_system_prompt = "你是一个有用的AI助手。"
-            system_message = SystemMessage(content=simple_system_prompt)
+        if fast_path is None:
+            # 动态生成supervisor prompt和解析器
+            # generate_supervisor_prompt 等已通过顶部 from langgraph_agent.prompts import * 导入
 
-        compressed_messages, compression_stats = await self._compress_conversation_for_llm(
-            state, model_name, system_message
-        )
-        messages = [system_message] + copy.deepcopy(compressed_messages)
-        if compression_stats:
-            state["context_compression"] = compression_stats
+            prompt = await generate_supervisor_prompt(a2a_agents, mcp_tools_info)
 
-        try:
-            # 在调用LLM之前，验证和清理所有消息
-            # cleaned_messages = clean_messages(messages)
-            cleaned_messages = messages
-            # 使用结构化输出强制返回JSON，避免非JSON内容
-            dynamic_router = create_dynamic_router(a2a_agents, mcp_tools_info)
-            structured_llm = llm.with_structured_output(dynamic_router)
+            # logger.info(f"Supervisor Prompt:\n{prompt}")
+
+            llm, model_name = get_llm_client(state, config)
+
+            messages = share_messages(state["inner_messages"])
+
+            # logger.info(f"supervisor_node messages:{messages}")
+            # 去除中间过程无效的ai消息，避免干扰
+            if isinstance(messages, list):
+                messages = [msg for msg in messages
+                            if not (hasattr(msg, 'content') and
+                                    (msg.content == 'handoff_to_planner()' or
+                                     msg.content == '""') or
+                                    (hasattr(msg, 'name') and msg.name == 'supervisor'))]
 
-            # structured_llm = llm
-            response = await safe_llm_invoke(structured_llm, config, model_name, cleaned_messages, hidden=True)
-            # print("supervisor:{}".format(response))
+            # for message in messages:
+            #     if isinstance(message, BaseMessage) and message.name in all_team_members:
+            #         message.content = RESPONSE_FORMAT.format(message.name, message.content)
+
+            # 创建系统消息（不进行JSON转义，避免影响模型对格式要求的理解）
+            try:
+                system_message = SystemMessage(content=prompt)
+            except Exception as e:
+                print(f"⚠️ 系统prompt创建失败: {str(e)}")
+                # 使用简化的系统消息
+                simple_system_prompt = "你是一个有用的AI助手。"
+                system_message = SystemMessage(content=simple_system_prompt)
+
+            compressed_messages, compression_stats = await self._compress_conversation_for_llm(
+                state, model_name, system_message
+            )
+            messages = [system_message] + compressed_messages
+            if compression_stats:
+                state["context_compression"] = compression_stats
+
+        try:
+            if fast_path is not None:
+                logger.info(f"Supervisor快速路由[{fast_path.rule}]: {fast_path.next}")
+                response = fast_path
+            else:
+                # 在调用LLM之前，验证和清理所有消息
+                # cleaned_messages = clean_messages(messages)
+                cleaned_messages = messages
+                # 使用结构化输出强制返回JSON，避免非JSON内容
+                dynamic_router = create_dynamic_router(a2a_agents, mcp_tools_info)
+                structured_llm = llm.with_structured_output(dynamic_router)
+
+                # structured_llm = llm
+                response = await safe_llm_invoke(structured_llm, config, model_name, cleaned_messages, hidden=True)
+                fast_path_router.record_llm_decision()
+                # print("supervisor:{}".format(response))
 
             # tought_message = [AIMessage(content=f"正在思考中...")]
 
@@ -949,11 +1343,14 @@ class AgentGraph:
         except Exception as e:
             print(f"绑定工具失败: {str(e)}")
 
-        await self._compress_conversation_for_llm(state, model_name)
+        compressed_messages, compression_stats = await self._compress_conversation_for_llm(state, model_name)
 
-        state_update = await agent_node(state, config, llm, prompt, node_name)
-        if state.get("context_compression"):
-            state_update["context_compression"] = state["context_compression"]
+        state_update = await agent_node(
+            state, config, llm, prompt, node_name,
+            llm_messages=compressed_messages if compression_stats else None,
+        )
+        if compression_stats:
+            state_update["context_compression"] = compression_stats
 
         logger.info("Code agent completed task")
 
@@ -996,11 +1393,14 @@ class AgentGraph:
         except Exception as e:
             print(f"绑定工具失败: {str(e)}")
 
-        await self._compress_conversation_for_llm(state, model_name)
+        compressed_messages, compression_stats = await self._compress_conversation_for_llm(state, model_name)
 
-        state_update = await agent_node(state, config, llm, prompt, node_name)
-        if state.get("context_compression"):
-            state_update["context_compression"] = state["context_compression"]
+        state_update = await agent_node(
+            state, config, llm, prompt, node_name,
+            llm_messages=compressed_messages if compression_stats else None,
+        )
+        if compression_stats:
+            state_update["context_compression"] = compression_stats
 
         logger.info("Research agent completed task")
 
@@ -1037,11 +1437,14 @@ class AgentGraph:
         except Exception as e:
             print(f"绑定工具失败: {str(e)}")
 
-        await self._compress_conversation_for_llm(state, model_name)
+        compressed_messages, compression_stats = await self._compress_conversation_for_llm(state, model_name)
 
-        state_update = await agent_node(state, config, llm, prompt, node_name)
-        if state.get("context_compression"):
-            state_update["context_compression"] = state["context_compression"]
+        state_update = await agent_node(
+            state, config, llm, prompt, node_name,
+            llm_messages=compressed_messages if compression_stats else None,
+        )
+        if compression_stats:
+            state_update["context_compression"] = compression_stats
 
         logger.info("Browser agent completed task")
 
@@ -1198,6 +1601,7 @@ class AgentGraph:
         try:
             result_response = await generate_reporter_result(state, config)
             result_response.name = "reporter"  # 此处一定要设置为reporter，让supervisor知道reporter已执行完成
+            result_response.additional_kwargs[REPORT_COMPLETED_KEY] = True
             state["messages"].append(result_response)
             state["inner_messages"].append(result_response)
         except Exception as e:
@@ -1210,7 +1614,12 @@ class AgentGraph:
             # 运行时消息临时提交
             await send_temp_message_to_frontend(message_content, message_id, "assistant", config)
 
-            new_message = AIMessage(id=message_id, content=message_content, name="reporter")
+            new_message = AIMessage(
+                id=message_id,
+                content=message_content,
+                name="reporter",
+                additional_kwargs={REPORT_COMPLETED_KEY: True},
+            )
             state["messages"].append(new_message)
             state["inner_messages"].append(new_message)
 
@@ -1228,6 +1637,195 @@ class AgentGraph:
             goto="supervisor",
         )
 
+    # 可并发执行的工具（只读/无副作用操作），其余工具按顺序独占执行
+    PARALLEL_SAFE_TOOL_OPERATIONS = {
+        "web": None,  # None 表示所有操作均可并发
+        "files": {"read", "list"},
+    }
+
+    def _is_parallel_safe_tool_call(self, tool_call: Dict[str, Any]) -> bool:
+        name = tool_call.get("name")
+        if name not in self.PARALLEL_SAFE_TOOL_OPERATIONS:
+            return False
+        operations = self.PARALLEL_SAFE_TOOL_OPERATIONS[name]
+        return operations is None or (tool_call.get("args") or {}).get("operation") in operations
+
+    def _plan_tool_batches(self, tool_calls: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """
+        将工具调用划分为批次：相邻的可并发调用合并为一批，其余调用单独成批。
+        批次之间顺序执行，保证有副作用的调用与前后调用的先后关系不变。
+        """
+        if os.getenv("TOOL_EXECUTOR_PARALLEL", "true").lower() != "true":
+            return [[tool_call] for tool_call in tool_calls]
+
+        batches: List[List[Dict[str, Any]]] = []
+        for tool_call in tool_calls:
+            if self._is_parallel_safe_tool_call(tool_call) and batches and \
+                    self._is_parallel_safe_tool_call(batches[-1][-1]):
+                batches[-1].append(tool_call)
+            else:
+                batches.append([tool_call])
+        return batches
+
+    async def _execute_tool_call(
+            self,
+            tool_call: Dict[str, Any],
+            state: AgentState,
+            config: RunnableConfig,
+    ) -> Tuple[AgentState, ToolMessage, Dict[str, Any]]:
+        """执行单个工具调用，返回 (state, ToolMessage, 执行记录)，不修改消息列表"""
+        error_msg = None
+        tool_call_copy = deepcopy(tool_call)
+        tool_name = tool_call_copy["name"]
+        try:
+            tool_call_copy["args"]["state"] = state
+            tool_call_copy["args"]["special_config_param"] = {}
+            # 解析工具调用参数
+            logger.info(f"tool_executor_node tool_name {tool_name}")
+            # 获取工具
+            if tool_name not in self.tools_by_name:
+                error_msg = f"工具 {tool_name} 不存在"
+                print(error_msg)
+                tool_msg = error_msg
+            else:
+                tool = self.tools_by_name[tool_name]
+
+                # 如果调用了attachment工具，清除强制调用标志
+                if hasattr(tool, 'tool_type') and getattr(tool, 'tool_type') == 'attachment':
+                    state["force_attachment_call"] = False
+                    print(f"[tool_executor_node] 已调用附件工具 {tool_name}，清除强制调用标志")
+
+                # 执行工具调用（tool_call_id 通过独立的 config 副本传递，避免并发调用互相覆盖）
+                call_config = {
+                    **config,
+                    "configurable": {**config.get("configurable", {}), "tool_call_id": tool_call_copy.get("id", "")},
+                }
+                state, tool_msg = await tool.ainvoke(tool_call_copy["args"], config=call_config)
+                # 文件URL改造
+                if hasattr(state["messages"][-1], "additional_kwargs"):
+                    tool_calls = getattr(state["messages"][-1], 'additional_kwargs', {}).get('tool_calls', [])
+                    for item in tool_calls:
+                        func = item.get('function', {})
+                        if func.get('name') == 'files':
+                            try:
+                                args = json.loads(func['arguments'])
+                                if 'path' in args:
+                                    # 从路径提取文件名
+                                    args['name'] = os.path.basename(args['path'])
+                                    args['date'] = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())
+                                    if 'content' in args:
+                                        del args['content']
+                                    func['arguments'] = json.dumps(args)
+                            except (json.JSONDecodeError, KeyError) as e:
+                                print(f"参数处理错误: {e}")
+
+                # 使用统一的结果标准化方法
+                tool_msg = normalize_tool_result(tool_msg, tool_name)
+
+                # 增强调试信息：打印工具执行结果
+                print(f"\n========== 工具执行结果 ==========")
+                print(f"工具名称: {tool_name}")
+                print(f"执行状态: 成功")
+                print(f"结果长度: {len(tool_msg)} 字符")
+                print(f"结果预览 (前500字符):")
+                print(f"{tool_msg[:500]}...")
+                print("==================================\n")
+
+        except GraphInterrupt:
+            # 捕捉GraphInterrupt但不处理，直接重新抛出
+            raise
+        except Exception as e:
+            # 记录工具执行错误
+            traceback.print_exc()
+            error_msg = f"工具 {tool_name} 执行出错: {str(e)}"
+            print(error_msg)  # 日志记录
+            tool_msg = error_msg
+            # Remove the state key since we don't need to commit it into the saved state
+            tool_call_copy["args"]["state"] = None
+
+            # 增强调试信息：打印错误详情
+            print(f"\n========== 工具执行错误 ==========")
+            print(f"工具名称: {tool_name}")
+            print(f"错误类型: {type(e).__name__}")
+            print(f"错误信息: {str(e)}")
+            print("==================================\n")
+
+        tool_message = ToolMessage(
+            content=tool_msg,
+            name=tool_name,
+            tool_call_id=tool_call_copy.get("id") or ""
+        )
+        history = {
+            "tool_name": tool_name,
+            "status": "success" if not error_msg else "error",
+            "timestamp": datetime.datetime.now().isoformat(),
+            "result_length": len(str(tool_msg))
+        }
+        return state, tool_message, history
+
+    # 并发调用各自追加、按调用顺序合并的列表字段；logs 不在其中，整批共享同一个列表，
+    # 保证 copilotkit_emit_state 推送给前端的日志一致
+    _FORKED_LIST_KEYS = ("temporary_images", "messages", "inner_messages")
+
+    @classmethod
+    def _fork_tool_state(cls, state: AgentState) -> AgentState:
+        """为并发调用复制 state：消息、图片列表与 structure_tool_results 使用独立容器，其余字段（含 logs）共享"""
+        forked = dict(state)
+        for key in cls._FORKED_LIST_KEYS:
+            forked[key] = list(state.get(key) or [])
+        forked["structure_tool_results"] = dict(state.get("structure_tool_results") or {})
+        return forked
+
+    @classmethod
+    def _merge_tool_states(cls, state: AgentState, forks: List[AgentState]) -> None:
+        """
+        按 tool_calls 的原始顺序（而非完成顺序）将各并发调用对 state 的修改合并回主 state。
+
+        列表字段追加各调用新增的元素；其余字段后面的调用覆盖前面的调用，
+        多个调用写入不同值时记录告警。
+        """
+        base_lengths = {key: len(state.get(key) or []) for key in cls._FORKED_LIST_KEYS}
+        base = dict(state)
+        written: Dict[str, int] = {}
+        for index, forked in enumerate(forks):
+            for key in cls._FORKED_LIST_KEYS:
+                new_items = (forked.get(key) or [])[base_lengths[key]:]
+                if new_items:
+                    state.setdefault(key, [])
+                    state[key].extend(new_items)
+            state.setdefault("structure_tool_results", {})
+            state["structure_tool_results"].update(forked.get("structure_tool_results") or {})
+            for key, value in forked.items():
+                if key in cls._FORKED_LIST_KEYS or key in ("logs", "structure_tool_results"):
+                    continue
+                if key in base and base[key] is value:
+                    continue
+                if key in written and state[key] != value:
+                    logger.warning(f"并发工具调用写入了冲突的 state 字段 {key}，采用第 {index + 1} 个调用的值")
+                state[key] = value
+                written[key] = index
+
+    async def _execute_tool_batch(
+            self,
+            batch: List[Dict[str, Any]],
+            state: AgentState,
+            config: RunnableConfig,
+    ) -> Tuple[AgentState, List[Tuple[ToolMessage, Dict[str, Any]]]]:
+        """并发执行一批可并发的工具调用，每个调用使用独立的 state 副本，按原始顺序合并"""
+        limiter = _tool_call_limiter()
+        forks = [self._fork_tool_state(state) for _ in batch]
+
+        async def run(tool_call, forked):
+            async with limiter:
+                return await self._execute_tool_call(tool_call, forked, config)
+
+        logger.info(f"tool_executor_node 并发执行 {len(batch)} 个工具调用")
+        # gather 的返回顺序与 batch 一致
+        outcomes = await asyncio.gather(*(run(tool_call, forked) for tool_call, forked in zip(batch, forks)))
+
+        self._merge_tool_states(state, [forked for forked, _, _ in outcomes])
+        return state, [(tool_message, history) for _, tool_message, history in outcomes]
+
     async def tool_executor_node(self, state: AgentState, config: RunnableConfig) -> Command[
         Literal["coder", "researcher", "reporter"]]:
         """工具执行节点 - 优化版本"""
@@ -1264,109 +1862,28 @@ class AgentGraph:
         #         goto=state["last_node"]
         #     )
 
-        error_msg = None
         last_message = state["inner_messages"][-1]
         logger.info(f"enter tool_executor_node: {last_message} state:{state}")
 
         # 如果消息中包含工具调用
         if hasattr(last_message, "tool_calls") and last_message.tool_calls:
             logger.info("tool_executor_node hasattr tool_calls")
-            for tool_call in last_message.tool_calls:
-                try:
-                    tool_call_copy = deepcopy(tool_call)
-                    tool_call_copy["args"]["state"] = state
-                    tool_call_copy["args"]["special_config_param"] = {}
-                    # 解析工具调用参数
-                    tool_name = tool_call_copy["name"]
-                    logger.info(f"tool_executor_node tool_name {tool_name}")
-                    # 获取工具
-                    if tool_name not in self.tools_by_name:
-                        error_msg = f"工具 {tool_name} 不存在"
-                        print(error_msg)
-                        error_message = ToolMessage(content=error_msg, name=tool_name,
-                                                    tool_call_id=tool_call_copy.get("id") or "")
-                        state["messages"].append(error_message)
-                        state["inner_messages"].append(error_message)
-                        continue
+            for batch in self._plan_tool_batches(last_message.tool_calls):
+                if len(batch) == 1:
+                    state, tool_message, history = await self._execute_tool_call(batch[0], state, config)
+                    results = [(tool_message, history)]
+                else:
+                    state, results = await self._execute_tool_batch(batch, state, config)
 
-                    tool = self.tools_by_name[tool_name]
-
-                    # 如果调用了attachment工具，清除强制调用标志
-                    if hasattr(tool, 'tool_type') and getattr(tool, 'tool_type') == 'attachment':
-                        state["force_attachment_call"] = False
-                        print(f"[tool_executor_node] 已调用附件工具 {tool_name}，清除强制调用标志")
-
-                    # 执行工具调用
-                    config['configurable']['tool_call_id'] = tool_call_copy.get("id", "")
-                    state, tool_msg = await tool.ainvoke(tool_call_copy["args"], config=config)
-                    # 文件URL改造
-                    if hasattr(state["messages"][-1], "additional_kwargs"):
-                        tool_calls = getattr(state["messages"][-1], 'additional_kwargs', {}).get('tool_calls', [])
-                        for tool_call in tool_calls:
-                            func = tool_call.get('function', {})
-                            if func.get('name') == 'files':
-                                try:
-                                    args = json.loads(func['arguments'])
-                                    if 'path' in args:
-                                        # 从路径提取文件名
-                                        args['name'] = os.path.basename(args['path'])
-                                        args['date'] = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())
-                                        if 'content' in args:
-                                            del args['content']
-                                        func['arguments'] = json.dumps(args)
-                                except (json.JSONDecodeError, KeyError) as e:
-                                    print(f"参数处理错误: {e}")
-
-                    # 使用统一的结果标准化方法
-                    tool_msg = normalize_tool_result(tool_msg, tool_name)
-
-                    # 增强调试信息：打印工具执行结果
-                    print(f"\n========== 工具执行结果 ==========")
-                    print(f"工具名称: {tool_name}")
-                    print(f"执行状态: 成功")
-                    print(f"结果长度: {len(tool_msg)} 字符")
-                    print(f"结果预览 (前500字符):")
-                    print(f"{tool_msg[:500]}...")
-                    print("==================================\n")
-
-                except GraphInterrupt:
-                    # 捕捉GraphInterrupt但不处理，直接重新抛出
-                    raise
-                except Exception as e:
-                    # 记录工具执行错误
-                    traceback.print_exc()
-                    error_msg = f"工具 {tool_call_copy['name']} 执行出错: {str(e)}"
-                    print(error_msg)  # 日志记录
-                    tool_msg = error_msg
-                    # Remove the state key since we don't need to commit it into the saved state
-                    tool_call_copy["args"]["state"] = None
-
-                    # 增强调试信息：打印错误详情
-                    print(f"\n========== 工具执行错误 ==========")
-                    print(f"工具名称: {tool_call_copy['name']}")
-                    print(f"错误类型: {type(e).__name__}")
-                    print(f"错误信息: {str(e)}")
-                    print("==================================\n")
-
-                # 添加工具执行结果到消息列表
-                tool_message = ToolMessage(
-                    content=tool_msg,
-                    name=tool_call_copy["name"],
-                    tool_call_id=tool_call_copy.get("id") or ""
-                )
-                state["messages"].append(tool_message)
-                state["inner_messages"].append(tool_message)
-
-                # 记录工具执行状态
-                if "tool_execution_history" not in state:
-                    state["tool_execution_history"] = []
-
-                state["tool_execution_history"].append({
-                    "tool_name": tool_call_copy["name"],
-                    "status": "success" if not error_msg else "error",
-                    "timestamp": datetime.datetime.now().isoformat(),
-                    "result_length": len(str(tool_msg))
-                })
+                # 按 tool_calls 原始顺序添加工具执行结果
+                for tool_message, history in results:
+                    state["messages"].append(tool_message)
+                    state["inner_messages"].append(tool_message)
+
+                    # 记录工具执行状态
+                    if "tool_execution_history" not in state:
+                        state["tool_execution_history"] = []
+                    state["tool_execution_history"].append(history)
 
         # 设置执行过程完成
         state["logs"][log_index]["done"] = True
@@ -1554,65 +2071,49 @@ class AgentGraph:
 
         return Command(update=state_update, goto="supervisor")
 
-    async def mcp_node(self, state: AgentState, config: RunnableConfig) -> Command[
-        Literal["supervisor", "mcp_tool_executor"]]:
+    @staticmethod
+    def _enhance_mcp_tool_description(name: str, description: str) -> str:
+        base_desc = (description or "").strip()
+        lowered_name = (name or "").lower()
 
-        logger.info("=== MCP 智能体数据准备节点开始 ===")
-        log_index = len(state["logs"])
-        state["log_index"] = log_index
-        message_id = get_last_show_message_id(state["messages"])
-        state["logs"].append({
-            "message": "MCP智能体运行中",
-            "done": False,
-            "messageId": message_id,
-            "sub_logs": [{
-                "message": "🔧 工具准备中",
-                "done": False,
-            }]
-        })
-        await copilotkit_emit_state(config, state)
+        is_browser_task = lowered_name == "browser_task"
 
-        # 获取 MCP 工具
-        mcp_tools = await self.mcp_client.get_tools()
+        if not is_browser_task:
+            return base_desc
 
-        mcp_tools_for_copilotkit: List[Dict[str, Any]] = state.get("copilotkit", {}).get("actions", [])
-        # 调试输出
-        print(f"从状态中获取的 MCP 工具数量: {len(mcp_tools)}")
-
-        # 所有MCP工具
-        all_tools = [*mcp_tools]
-
-        # 绑定工具到LLM实例
-        llm, model_name = get_llm_client(state, config)
-        try:
-            llm = llm.bind_tools(all_tools)
-            print(f"成功绑定 {len(mcp_tools)} 个工具到LLM")
-        except Exception as e:
-            print(f"绑定工具失败: {str(e)}")
-
-        def enhance_mcp_tool_description(name: str, description: str) -> str:
-            base_desc = (description or "").strip()
-            lowered_name = (name or "").lower()
+        extra = (
+            " This tool should be preferred whenever the user asks to open a website,"
+            " browse or extract content from web pages, or fill/submit web forms."
+            " Use it to create a browser automation task for these web interactions"
+            " instead of relying only on static search or reasoning."
+        )
 
-            is_browser_task = lowered_name == "browser_task"
+        if not base_desc:
+            return extra.strip()
 
-            if not is_browser_task:
-                return base_desc
+        return base_desc + " " + extra
 
-            extra = (
-                " This tool should be preferred whenever the user asks to open a website,"
-                " browse or extract content from web pages, or fill/submit web forms."
-                " Use it to create a browser automation task for these web interactions"
-                " instead of relying only on static search or reasoning."
-            )
-
-            if not base_desc:
-                return extra.strip()
+    def _get_mcp_tool_artifacts(self, mcp_tools: List[BaseTool]) -> Dict[str, Any]:
+        """
+        获取 mcp_node 使用的工具派生数据，按 MCPConnectionManager.tools_version 缓存：
+        - tool_schemas: 转换为 OpenAI 格式的工具 schema，供 bind_tools 使用
+        - prompt_tools: 用于生成 prompt 的工具描述
+        - prompts: 按 copilotkit actions 缓存的格式化 prompt 文本
+        """
+        version = self.mcp_client.tools_version
+        artifacts = self._mcp_tool_artifacts
+        if artifacts is not None and artifacts["version"] == version:
+            return artifacts
 
-            return base_desc + " " + extra
+        tool_schemas = []
+        for tool in mcp_tools:
+            try:
+                tool_schemas.append(convert_to_openai_tool(tool))
+            except Exception as e:
+                logger.warning(f"工具 {tool.name} schema 转换失败: {str(e)}")
 
         # 从原始状态数据获取字典格式的 MCP 工具用于生成 prompt
-        mcp_tools_dict_for_prompt = []
+        prompt_tools = []
         for tool in mcp_tools:
             parameters = {}
             if hasattr(tool, "args"):
@@ -1623,19 +2124,36 @@ class AgentGraph:
                 except Exception:
                     pass
 
-            enhanced_description = enhance_mcp_tool_description(
+            enhanced_description = self._enhance_mcp_tool_description(
                 getattr(tool, "name", ""),
                 getattr(tool, "description", ""),
             )
 
-            tool_dict = {
+            prompt_tools.append({
                 'name': tool.name,
                 'description': enhanced_description,
                 'parameters': parameters
-            }
-            mcp_tools_dict_for_prompt.append(tool_dict)
+            })
+
+        artifacts = {
+            "version": version,
+            "tool_schemas": tool_schemas,
+            "prompt_tools": prompt_tools,
+            "prompts": OrderedDict(),
+        }
+        self._mcp_tool_artifacts = artifacts
+        logger.info(f"[MCP] 工具派生数据已重建: {len(tool_schemas)} 个工具, 版本 {version}")
+        return artifacts
+
+    def _get_mcp_tools_prompt(self, artifacts: Dict[str, Any], copilotkit_actions: List[Dict[str, Any]]) -> str:
+        """生成（或从缓存读取）MCP 工具 prompt，copilotkit actions 不同时分别缓存"""
+        cache_key = json.dumps(copilotkit_actions, ensure_ascii=False, sort_keys=True, default=str) if copilotkit_actions else ""
+        prompts: OrderedDict = artifacts["prompts"]
+        if cache_key in prompts:
+            prompts.move_to_end(cache_key)
+            return prompts[cache_key]
 
-        all_mcp_tools_for_prompt = mcp_tools_for_copilotkit + mcp_tools_dict_for_prompt
+        all_mcp_tools_for_prompt = copilotkit_actions + artifacts["prompt_tools"]
 
         # 清理 MCP 工具 prompt
         # format_mcp_tools_for_prompt_english 已通过顶部 from langgraph_agent.prompts import * 导入
@@ -1645,15 +2163,62 @@ class AgentGraph:
             mcp_tools_prompt = (
                     "\n\n <mcp_tools_mounted_status>" + mcp_tools_prompt + "</mcp_tools_mounted_status>") if mcp_tools_prompt else ""
         except Exception as e:
-            print(f"⚠️ MCP工具prompt生成失败: {str(e)}")
-            mcp_tools_prompt = ""
+            logger.warning(f"MCP工具prompt生成失败: {str(e)}")
+            return ""
+
+        prompts[cache_key] = mcp_tools_prompt
+        # 每个工具集版本只保留少量不同 actions 组合的 prompt
+        while len(prompts) > 8:
+            prompts.popitem(last=False)
+        return mcp_tools_prompt
+
+    async def mcp_node(self, state: AgentState, config: RunnableConfig) -> Command[
+        Literal["supervisor", "mcp_tool_executor"]]:
+
+        logger.info("=== MCP 智能体数据准备节点开始 ===")
+        log_index = len(state["logs"])
+        state["log_index"] = log_index
+        message_id = get_last_show_message_id(state["messages"])
+        state["logs"].append({
+            "message": "MCP智能体运行中",
+            "done": False,
+            "messageId": message_id,
+            "sub_logs": [{
+                "message": "🔧 工具准备中",
+                "done": False,
+            }]
+        })
+        await copilotkit_emit_state(config, state)
+
+        # 获取 MCP 工具
+        mcp_tools = await self.mcp_client.get_tools()
+
+        mcp_tools_for_copilotkit: List[Dict[str, Any]] = state.get("copilotkit", {}).get("actions", [])
+        # 调试输出
+        print(f"从状态中获取的 MCP 工具数量: {len(mcp_tools)}")
+
+        # 工具 schema 与 prompt 按工具集版本缓存，工具集不变时直接复用
+        artifacts = self._get_mcp_tool_artifacts(mcp_tools)
+
+        # 绑定工具到LLM实例（使用已转换为 OpenAI 格式的 schema，避免每次重新转换）
+        llm, model_name = get_llm_client(state, config)
+        try:
+            llm = llm.bind_tools(artifacts["tool_schemas"])
+            print(f"成功绑定 {len(mcp_tools)} 个工具到LLM")
+        except Exception as e:
+            print(f"绑定工具失败: {str(e)}")
+
+        mcp_tools_prompt = self._get_mcp_tools_prompt(artifacts, mcp_tools_for_copilotkit)
 
         # 使用llm判断需要使用哪些工具
-        await self._compress_conversation_for_llm(state, model_name)
+        compressed_messages, compression_stats = await self._compress_conversation_for_llm(state, model_name)
 
-        state_update = await agent_node(state, config, llm, mcp_tools_prompt, "mcp_tools")
-        if state.get("context_compression"):
-            state_update["context_compression"] = state["context_compression"]
+        state_update = await agent_node(
+            state, config, llm, mcp_tools_prompt, "mcp_tools",
+            llm_messages=compressed_messages if compression_stats else None,
+        )
+        if compression_stats:
+            state_update["context_compression"] = compression_stats
 
         # 确保last_node字段被正确设置
         if "last_node" not in state_update:
@@ -1672,11 +2237,7 @@ class AgentGraph:
             })
             await copilotkit_emit_state(config, state)
 
-            # 储存mcp_tool数据
-            all_tools_by_name = {}
-            for mcp_tool in mcp_tools:
-                all_tools_by_name[mcp_tool.name] = mcp_tool
-
+            # 储存mcp_tool数据（工具实例在执行节点中通过 MCPConnectionManager 的名称索引获取）
             tools = []
             for tool_call in last_message.tool_calls:
                 tool_call_copy = deepcopy(tool_call)
@@ -1694,7 +2255,7 @@ class AgentGraph:
 
             # delete last tool_call message, avoid duplicate AIMessage which contain tool_call
             state_update["messages"] = state_update["messages"][:-1]
-            state_update["inner_messages"] = copy.deepcopy(state_update["messages"])
+            state_update["inner_messages"] = share_messages(state_update["messages"])
             state_update["logs"] = state["logs"]  # 用于整体对话结束后的logs状态保存
             state_update["mcp_tool_executor_data"] = tools
 
@@ -1738,8 +2299,10 @@ class AgentGraph:
             "mcp_tool_execution_results": state.get("mcp_tool_execution_results", []),
         }
 
+        # 1. 按原始顺序准备每个工具调用：子日志、前端 tool_call 事件
+        prepared = []
         for tool_call in tools:
-            logger.info(f"=== MCP 智能体执行器节点开始执行工具: {tool_call['name']} ===")
+            logger.info(f"=== MCP 智能体执行器节点准备执行工具: {tool_call['name']} ===")
             logger.info(f"工具: {tool_call}")
 
             tool_name = tool_call["name"]
@@ -1757,25 +2320,41 @@ class AgentGraph:
                     "message": f"{tool_name} 工具执行中",
                     "done": False,
                 })
-                await copilotkit_emit_state(config, state)
             else:
                 sub_log_index_for_tool = -1
 
             # 临时提交tool_call信息，并保存在messages中
             await send_temp_tool_call_to_frontend(tool_name, temp_arguments, tool_call_id, config)
-           
-            tool_call_obj = ToolCall(name=tool_name, args=temp_arguments, id=tool_call_id)
-            state_update["messages"].append(AIMessage(name=tool_name, id=tool_call["id"], content="", tool_calls=[tool_call_obj]))
-            state_update["inner_messages"].append(AIMessage(name=tool_name, id=tool_call["id"], content="", tool_calls=[tool_call_obj]))
 
+            prepared.append({
+                "tool_call": tool_call,
+                "tool_name": tool_name,
+                "arguments": arguments,
+                "temp_arguments": temp_arguments,
+                "tool_call_id": tool_call_id,
+                "sub_log_index": sub_log_index_for_tool,
+            })
+
+        # 所有工具的“执行中”状态合并为一次推送
+        if has_log_slot and prepared:
+            await copilotkit_emit_state(config, state)
+
+        # 2. 并发执行：同一服务器的调用（包括其他会话的调用）受 max_concurrency 限制，每个调用有独立超时
+
+        async def _run_tool(item: Dict[str, Any]) -> Tuple[bool, str]:
+            tool_name = item["tool_name"]
             try:
                 # 获取工具实例并执行
                 tool = await self.mcp_client.get_tool_by_name(tool_name)
                 if not tool:
                     raise ValueError(f"工具 {tool_name} 未找到")
 
-                # 执行工具调用
-                tool_result = await tool.ainvoke(arguments)
+                timeout = self.mcp_client.get_tool_timeout(tool_name)
+                async with self.mcp_client.get_server_semaphore(self.mcp_client.get_server_for_tool(tool_name)):
+                    try:
+                        tool_result = await asyncio.wait_for(tool.ainvoke(item["arguments"]), timeout=timeout)
+                    except asyncio.TimeoutError:
+                        raise TimeoutError(f"执行超时（{timeout}s）")
                 print("tool_result:{}".format(tool_result))
 
                 # 处理工具执行结果
@@ -1784,33 +2363,6 @@ class AgentGraph:
                 else:
                     tool_msg = str(tool_result)
 
-                # 提交MCP工具运行结果的ToolMessage
-                tool_message = ToolMessage(name=tool_name, content=tool_msg, tool_call_id=tool_call_id)
-                state_update["inner_messages"].append(tool_message)
-                state_update["messages"].append(tool_message)
-
-                state_update["mcp_tool_execution_results"].append({
-                    "id": tool_call_id,
-                    "result": tool_message.content,
-                    "status": "success"
-                })
-
-                # 对 browser-use 的 monitor_task 工具，保存步骤信息到状态中
-                if tool_name == "monitor_task":
-                    parsed_steps = None
-                    try:
-                        import json as _json
-                        parsed = _json.loads(tool_msg)
-                        if isinstance(parsed, dict):
-                            parsed_steps = parsed
-                        else:
-                            parsed_steps = {"raw": parsed}
-                    except Exception:
-                        parsed_steps = {"raw": tool_msg}
-
-                    state["browser_use_steps"] = parsed_steps
-                    state_update["browser_use_steps"] = parsed_steps
-
                 # 增强调试信息：打印工具执行结果
                 print(f"\n========== 工具执行结果 ==========")
                 print(f"工具名称: {tool_name}")
@@ -1819,14 +2371,11 @@ class AgentGraph:
                 print(f"结果预览 (前500字符):")
                 print(f"{tool_msg[:500]}...")
                 print("==================================\n")
-
-                state["logs"][log_index]["sub_logs"][sub_log_index_for_tool]["message"] = f"⚙️ {tool_name} 工具执行成功"
-                state["logs"][log_index]["sub_logs"][sub_log_index_for_tool]["done"] = True
-                await copilotkit_emit_state(config, state)
+                succeeded = True
             except Exception as e:
                 # 记录工具执行错误
                 traceback.print_exc()
-                raw_error = str(e)
+                raw_error = str(e) or type(e).__name__
                 # 清理异常内容，避免把整段 HTML 或超长文本塞进对话，导致上下文暴涨
                 cleaned_error = re.sub(r"<[^>]+>", "", raw_error)
                 max_len = 800
@@ -1836,26 +2385,59 @@ class AgentGraph:
                 print(error_msg)  # 日志记录
                 tool_msg = error_msg
 
-                # 提交错误结果的ToolMessage
-                tool_message = ToolMessage(name=tool_name, content=tool_msg, tool_call_id=tool_call_id)
-                state_update["inner_messages"].append(tool_message)
-                state_update["messages"].append(tool_message)
-                state_update["mcp_tool_execution_results"].append({
-                    "id": tool_call_id,
-                    "result": "未获取到工具结果",
-                    "status": "failed"
-                })
-
                 # 增强调试信息：打印错误详情
                 print(f"\n========== 工具执行错误 ==========")
                 print(f"工具名称: {tool_name}")
                 print(f"错误类型: {type(e).__name__}")
                 print(f"错误信息: {cleaned_error}")
                 print("==================================\n")
+                succeeded = False
 
-                state["logs"][log_index]["sub_logs"][sub_log_index_for_tool]["message"] = f"⚙️ {tool_name} 工具执行异常"
-                state["logs"][log_index]["sub_logs"][sub_log_index_for_tool]["done"] = True
+            # 每个工具完成时推送一次状态
+            if has_log_slot and item["sub_log_index"] >= 0:
+                sub_log = state["logs"][log_index]["sub_logs"][item["sub_log_index"]]
+                sub_log["message"] = f"⚙️ {tool_name} 工具执行{'成功' if succeeded else '异常'}"
+                sub_log["done"] = True
                 await copilotkit_emit_state(config, state)
+            return succeeded, tool_msg
+
+        outcomes = await asyncio.gather(*(_run_tool(item) for item in prepared))
+
+        # 3. 按原始顺序写入消息与执行结果
+        for item, (succeeded, tool_msg) in zip(prepared, outcomes):
+            tool_name = item["tool_name"]
+            tool_call_id = item["tool_call_id"]
+
+            tool_call_obj = ToolCall(name=tool_name, args=item["temp_arguments"], id=tool_call_id)
+            state_update["messages"].append(AIMessage(name=tool_name, id=item["tool_call"]["id"], content="", tool_calls=[tool_call_obj]))
+            state_update["inner_messages"].append(AIMessage(name=tool_name, id=item["tool_call"]["id"], content="", tool_calls=[tool_call_obj]))
+
+            # 提交MCP工具运行结果的ToolMessage
+            tool_message = ToolMessage(name=tool_name, content=tool_msg, tool_call_id=tool_call_id)
+            state_update["inner_messages"].append(tool_message)
+            state_update["messages"].append(tool_message)
+
+            state_update["mcp_tool_execution_results"].append({
+                "id": tool_call_id,
+                "result": tool_message.content if succeeded else "未获取到工具结果",
+                "status": "success" if succeeded else "failed"
+            })
+
+            # 对 browser-use 的 monitor_task 工具，保存步骤信息到状态中
+            if succeeded and tool_name == "monitor_task":
+                parsed_steps = None
+                try:
+                    import json as _json
+                    parsed = _json.loads(tool_msg)
+                    if isinstance(parsed, dict):
+                        parsed_steps = parsed
+                    else:
+                        parsed_steps = {"raw": parsed}
+                except Exception:
+                    parsed_steps = {"raw": tool_msg}
+
+                state["browser_use_steps"] = parsed_steps
+                state_update["browser_use_steps"] = parsed_steps
 
         logger.info("=== MCP 智能体执行器节点完成 ===")
 
@@ -1910,8 +2492,8 @@ class AgentGraph:
 
         # 编译图并保存
         self.graph = workflow.compile(
-            # 设置递归限制，避免无限循环
-            checkpointer=None,  # 不使用检查点
+            # 按 thread_id(session_id) 持久化状态，后端由 CHECKPOINTER_BACKEND 决定
+            checkpointer=get_checkpointer(),
         )
 
         print("图构建完成")
@@ -1969,6 +2551,14 @@ class AgentGraph:
         if 'configurable' not in config:
             config['configurable'] = {}
 
+        # checkpointer 以 thread_id 区分会话，默认使用 session_id
+        if 'thread_id' not in config['configurable']:
+            config['configurable']['thread_id'] = (
+                config['configurable'].get('session_id')
+                or state.get('session_id')
+                or f"session_{uuid.uuid4().hex}"
+            )
+
         print(f"开始执行智能体图，递归限制: {config.get('recursion_limit', 30)}")
 
         try:
@@ -0,0 +1,174 @@
+"""
+进程级 aiohttp 会话注册表
+
+A2A 调用与 MCP HTTP 工具共享长连接的 aiohttp.ClientSession，
+避免每次请求都重新进行 DNS 解析和 TCP/TLS 握手。
+"""
+import asyncio
+import logging
+import os
+from typing import Any, Dict, Tuple
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+class HTTPSessionRegistry:
+    """
+    按名称缓存共享的 aiohttp.ClientSession。
+
+    aiohttp 会话绑定创建时的事件循环，因此以 (名称, 事件循环) 区分；
+    请求超时由调用方在每次请求时传入，会话本身不设置总超时。
+    """
+
+    def __init__(self):
+        # (名称, 事件循环 id) -> (会话, 事件循环)
+        self._sessions: Dict[Tuple[str, int], Tuple[aiohttp.ClientSession, asyncio.AbstractEventLoop]] = {}
+        self._metrics = {"created": 0, "closed": 0}
+        # 主机 -> 请求与连接复用计数
+        self._hosts: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def _connector() -> aiohttp.TCPConnector:
+        return aiohttp.TCPConnector(
+            limit=int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "100")),
+            limit_per_host=int(os.getenv("HTTP_POOL_MAX_PER_HOST", "20")),
+            keepalive_timeout=float(os.getenv("HTTP_POOL_KEEPALIVE", "30")),
+            ttl_dns_cache=int(os.getenv("HTTP_POOL_DNS_TTL", "300")),
+            enable_cleanup_closed=True,
+        )
+
+    def _host_stats(self, host: str) -> Dict[str, int]:
+        stats = self._hosts.get(host)
+        if stats is None:
+            stats = {"requests": 0, "new_connections": 0, "reused_connections": 0, "errors": 0}
+            self._hosts[host] = stats
+        return stats
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        """通过 aiohttp 的 trace 钩子统计每个主机的请求数与连接复用情况"""
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params):
+            context.host = params.url.host or ""
+            self._host_stats(context.host)["requests"] += 1
+
+        async def on_connection_create_end(session, context, params):
+            self._host_stats(getattr(context, "host", ""))["new_connections"] += 1
+
+        async def on_connection_reuseconn(session, context, params):
+            self._host_stats(getattr(context, "host", ""))["reused_connections"] += 1
+
+        async def on_request_exception(session, context, params):
+            self._host_stats(getattr(context, "host", ""))["errors"] += 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace_config.on_request_exception.append(on_request_exception)
+        return trace_config
+
+    def _discard(self, session: aiohttp.ClientSession) -> None:
+        """
+        丢弃已关闭事件循环中的会话。
+
+        事件循环关闭后无法再 await session.close()，这里同步关闭连接器并将会话标记为关闭，
+        避免 aiohttp 在回收时报告未关闭的会话与连接器
+        """
+        connector = session.connector
+        session.detach()
+        if connector is None or connector.closed:
+            return
+        try:
+            # BaseConnector.close() 只是在 _close() 之外等待连接关闭，事件循环已关闭时无需等待
+            connector._close()
+        except Exception as e:
+            logger.warning(f"[HTTP会话] 关闭已失效事件循环中的连接器失败: {str(e)}")
+        self._metrics["closed"] += 1
+
+    def get(self, name: str = "default") -> aiohttp.ClientSession:
+        """获取当前事件循环中的共享会话，不存在或已关闭时创建（需在协程中调用）"""
+        loop = asyncio.get_running_loop()
+        key = (name, id(loop))
+        session, session_loop = self._sessions.get(key, (None, None))
+        # 事件循环 id 可能被新的事件循环复用，需同时比较事件循环对象
+        if session is not None and not session.closed and session_loop is loop:
+            return session
+
+        # 已关闭的会话直接移除；已关闭的事件循环中创建的会话无法再使用，同步关闭后丢弃
+        for other_key, (other, other_loop) in list(self._sessions.items()):
+            if other.closed:
+                self._sessions.pop(other_key, None)
+            elif other_loop.is_closed():
+                self._sessions.pop(other_key, None)
+                self._discard(other)
+
+        session = aiohttp.ClientSession(
+            connector=self._connector(),
+            timeout=aiohttp.ClientTimeout(total=None),
+            trace_configs=[self._trace_config()],
+        )
+        self._sessions[key] = (session, loop)
+        self._metrics["created"] += 1
+        logger.info(f"[HTTP会话] 创建共享会话: {name}")
+        return session
+
+    def metrics(self) -> Dict[str, Any]:
+        """返回会话、连接池与各主机的使用指标"""
+        sessions = {}
+        for (name, loop_id), (session, _) in self._sessions.items():
+            if session.closed:
+                continue
+            connector = session.connector
+            # aiohttp 未公开连接池状态，这里尽力读取
+            idle = sum(len(conns) for conns in getattr(connector, "_conns", {}).values())
+            # 同名会话在不同事件循环中各有一份，按事件循环区分
+            sessions[f"{name},loop={loop_id}"] = {
+                "limit": connector.limit,
+                "limit_per_host": connector.limit_per_host,
+                "in_use": len(getattr(connector, "_acquired", ())),
+                "idle": idle,
+            }
+        return {
+            **self._metrics,
+            "sessions": sessions,
+            "hosts": {host: dict(stats) for host, stats in self._hosts.items()},
+        }
+
+    async def aclose(self) -> None:
+        """关闭当前事件循环中的所有共享会话，其他事件循环中的会话保持不变"""
+        loop = asyncio.get_running_loop()
+        sessions = []
+        for key, (session, session_loop) in list(self._sessions.items()):
+            # 已关闭的会话或已关闭事件循环中的会话一并移除，只有当前事件循环中的会话可以 await close()
+            if session.closed:
+                self._sessions.pop(key, None)
+            elif session_loop is loop:
+                sessions.append(self._sessions.pop(key)[0])
+            elif session_loop.is_closed():
+                self._sessions.pop(key, None)
+                self._discard(session)
+        for session in sessions:
+            await session.close()
+            self._metrics["closed"] += 1
+
+
+# 全局注册表实例
+http_session_registry = HTTPSessionRegistry()
+
+
+def get_http_session(name: str = "default") -> aiohttp.ClientSession:
+    """获取共享的 aiohttp 会话"""
+    return http_session_registry.get(name)
+
+
+async def close_http_sessions() -> None:
+    """服务关闭时释放共享会话"""
+    await http_session_registry.aclose()
+    logger.info("[HTTP会话] 共享会话已关闭")
+
+
+def get_http_session_metrics() -> Dict[str, Any]:
+    """获取共享会话与各主机的连接指标"""
+    return http_session_registry.metrics()
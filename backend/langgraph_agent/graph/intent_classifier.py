@@ -0,0 +1,220 @@
+"""
+Coordinator 意图预分类器
+
+在 coordinator 调用 LLM 之前，用规则和最近决策缓存处理最常见的短消息：
+- 问候、致谢、告别、询问身份等寒暄直接回复；
+- 携带附件或链接的请求直接交给 supervisor（等价于 LLM 返回 handoff_to_planner()）；
+- 其余消息（包括含“帮我”“如何”等任务关键词的消息）仍由 LLM 决策，
+  以保留 coordinator 提示词中对有害、越界请求的拒绝逻辑。
+"""
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from langchain_core.messages import HumanMessage
+
+from langgraph_agent.graph.state import AgentState
+
+logger = logging.getLogger(__name__)
+
+COORDINATOR_CLASSIFIER = os.getenv("COORDINATOR_CLASSIFIER", "true").lower() in ("1", "true", "yes")
+COORDINATOR_CLASSIFIER_THRESHOLD = float(os.getenv("COORDINATOR_CLASSIFIER_THRESHOLD", "0.8"))
+COORDINATOR_CLASSIFIER_CACHE_SIZE = int(os.getenv("COORDINATOR_CLASSIFIER_CACHE_SIZE", "256"))
+COORDINATOR_CLASSIFIER_CACHE_TTL = float(os.getenv("COORDINATOR_CLASSIFIER_CACHE_TTL", "600"))
+
+# 归一化时去除的空白与标点
+_NORMALIZE_PATTERN = re.compile(r"[\s!！?？.。,，~～…、:：;；'\"“”‘’()（）]+")
+_CJK_PATTERN = re.compile(r"[一-鿿]")
+_URL_PATTERN = re.compile(r"https?://\S+", re.IGNORECASE)
+
+# 寒暄词表（归一化后完整匹配）
+_SMALL_TALK = {
+    "greeting": {
+        "你好", "您好", "你好呀", "你好啊", "嗨", "哈喽", "哈啰", "在吗", "在不在", "大家好",
+        "早", "早安", "早上好", "上午好", "中午好", "下午好", "晚上好", "晚安",
+        "hi", "hello", "hey", "hiya", "hithere", "hellothere",
+        "goodmorning", "goodafternoon", "goodevening",
+    },
+    "thanks": {
+        "谢谢", "谢谢你", "谢谢您", "多谢", "感谢", "谢啦", "非常感谢",
+        "thanks", "thankyou", "thx", "thanksalot",
+    },
+    "farewell": {
+        "再见", "拜拜", "回头见", "bye", "byebye", "goodbye", "seeyou", "seeyoulater",
+    },
+    "identity": {
+        "你是谁", "你叫什么", "你叫什么名字", "介绍一下你自己", "自我介绍一下", "你能做什么",
+        "whoareyou", "whatisyourname", "whatsyourname", "introduceyourself", "whatcanyoudo",
+    },
+}
+
+_SMALL_TALK_REPLIES = {
+    "greeting": (
+        "你好！我是聚智助手，有什么可以帮您的吗？",
+        "Hello! I'm Juzhi assistant. How can I help you today?",
+    ),
+    "thanks": (
+        "不客气！如果还有其他问题，随时告诉我。",
+        "You're welcome! Let me know if there's anything else I can help with.",
+    ),
+    "farewell": (
+        "再见！期待下次为您服务。",
+        "Goodbye! Feel free to come back anytime.",
+    ),
+    "identity": (
+        "我是聚智助手，由聚智团队开发的 AI 助手，可以帮您搜索信息、编写代码、分析数据和生成报告。有什么可以帮您的吗？",
+        "I'm Juzhi assistant, an AI assistant developed by the Juzhi team. I can search for information, "
+        "write code, analyze data and generate reports. How can I help you?",
+    ),
+}
+
+# 疑似提示词泄露/越狱或有害请求，即使携带附件或链接也交给 LLM 按提示词要求礼貌拒绝
+_RISK_MARKERS = (
+    "system prompt", "ignore previous", "ignore all previous", "jailbreak",
+    "提示词", "系统提示", "忽略之前", "忽略以上", "越狱",
+    "malware", "ransomware", "exploit", "hack", "crack", "phishing", "bomb", "weapon", "ddos",
+    "病毒", "木马", "勒索", "漏洞利用", "破解", "黑客", "入侵", "钓鱼", "炸弹", "武器", "毒品", "攻击",
+)
+
+
+@dataclass
+class IntentDecision:
+    """预分类结果：handoff 为 True 时交给 supervisor，否则直接回复 reply"""
+    handoff: bool
+    confidence: float
+    source: str
+    reply: str = ""
+
+
+def _normalize(text: str) -> str:
+    return _NORMALIZE_PATTERN.sub("", text).lower()
+
+
+def _latest_user_text(state: AgentState) -> Optional[str]:
+    for message in reversed(state.get("messages") or []):
+        if isinstance(message, HumanMessage):
+            # 多模态消息交给 LLM 处理
+            return message.content if isinstance(message.content, str) else None
+    return None
+
+
+def _is_fresh_conversation(state: AgentState) -> bool:
+    """会话中只有一条用户消息，决策不依赖上文"""
+    return sum(isinstance(message, HumanMessage) for message in state.get("messages") or []) == 1
+
+
+class IntentClassifier:
+    """Coordinator 意图预分类器"""
+
+    def __init__(
+            self,
+            enabled: bool = COORDINATOR_CLASSIFIER,
+            threshold: float = COORDINATOR_CLASSIFIER_THRESHOLD,
+            cache_size: int = COORDINATOR_CLASSIFIER_CACHE_SIZE,
+            cache_ttl: float = COORDINATOR_CLASSIFIER_CACHE_TTL,
+    ):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        # 归一化消息 -> 过期时间，只缓存新会话首条消息被 LLM 判定为 handoff 的决策；
+        # 直接回复的内容可能与用户相关，不在用户之间共享
+        self._cache: "OrderedDict[str, float]" = OrderedDict()
+        self._stats = {"rules": 0, "cache": 0, "llm": 0}
+
+    def _classify_rules(self, text: str, state: AgentState) -> Optional[IntentDecision]:
+        normalized = _normalize(text)
+        if not normalized:
+            return None
+
+        for category, phrases in _SMALL_TALK.items():
+            if normalized in phrases:
+                zh_reply, en_reply = _SMALL_TALK_REPLIES[category]
+                reply = zh_reply if _CJK_PATTERN.search(text) else en_reply
+                return IntentDecision(handoff=False, confidence=0.95, source="rules", reply=reply)
+
+        # 只有附件、链接这类明确的任务信号才跳过 LLM；关键词命中不足以判断请求是否越界
+        scores = []
+        if state.get("files"):
+            scores.append(0.95)
+        if _URL_PATTERN.search(text):
+            scores.append(0.9)
+        if not scores:
+            return None
+
+        # 多个信号同时命中时提高置信度
+        confidence = min(0.99, max(scores) + 0.05 * (len(scores) - 1))
+        return IntentDecision(handoff=True, confidence=confidence, source="rules")
+
+    def classify(self, state: AgentState) -> Optional[IntentDecision]:
+        """
+        对最新的用户消息进行预分类
+
+        Returns:
+            IntentDecision，置信度不足或无法判断时返回 None（需要调用 LLM）
+        """
+        if not self.enabled:
+            return None
+        text = _latest_user_text(state)
+        if not text or not text.strip():
+            return None
+        lowered = text.lower()
+        if any(marker in lowered for marker in _RISK_MARKERS):
+            self._stats["llm"] += 1
+            return None
+
+        decision = self._classify_rules(text, state)
+        if decision is not None and decision.confidence >= self.threshold:
+            self._stats["rules"] += 1
+            return decision
+
+        if _is_fresh_conversation(state):
+            key = _normalize(text)
+            expires_at = self._cache.get(key)
+            if expires_at is not None:
+                if expires_at > time.monotonic():
+                    self._cache.move_to_end(key)
+                    self._stats["cache"] += 1
+                    return IntentDecision(handoff=True, confidence=1.0, source="cache")
+                self._cache.pop(key, None)
+
+        self._stats["llm"] += 1
+        return None
+
+    def remember(self, state: AgentState) -> None:
+        """记录 LLM 对新会话首条消息的 handoff 决策，有效期内相同消息再次出现时直接交接"""
+        if not self.enabled or self.cache_size <= 0 or not _is_fresh_conversation(state):
+            return
+        text = _latest_user_text(state)
+        if not text:
+            return
+        key = _normalize(text)
+        if not key:
+            return
+        self._cache[key] = time.monotonic() + self.cache_ttl
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        total = sum(self._stats.values())
+        skipped = self._stats["rules"] + self._stats["cache"]
+        return {
+            "enabled": self.enabled,
+            **self._stats,
+            "skip_ratio": round(skipped / total, 3) if total else 0.0,
+            "cache_size": len(self._cache),
+        }
+
+
+# 全局预分类器实例
+intent_classifier = IntentClassifier()
+
+
+def get_intent_classifier_stats() -> Dict[str, Any]:
+    """预分类命中情况"""
+    return intent_classifier.stats()
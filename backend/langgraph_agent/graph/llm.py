@@ -1,17 +1,20 @@
-import copy
 
 from langgraph_agent.config import global_config
 
 import os
 import asyncio
+import atexit
 import logging
 import re
+import threading
+from typing import Any, Dict, Tuple
 
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
 from langchain_core.runnables import RunnableConfig
 
 from langgraph_agent.graph.state import AgentState
+from langgraph_agent.utils.message_utils import with_content
 
 from copilotkit.langgraph import copilotkit_customize_config
 
@@ -24,69 +27,212 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
-def get_llm_client(state: AgentState, config: RunnableConfig) -> (ChatOpenAI, str):
-    """获取或创建LLM客户端（无缓存版本）"""
-    print("\n=== 获取 LLM 客户端 ===")
 
-    # model_name = (
-    #     state.get("model")
-    #     if "model" in state and state.get("model") is not None
-    #     else config.get("configurable", {}).get("model_name", global_config.BASE_LLM)
-    # )
+class LLMClientRegistry:
+    """
+    进程级 LLM 客户端注册表
+
+    按 (base_url, model, api_key, timeout, ssl_verify) 缓存 ChatOpenAI 实例，
+    所有实例共享同一组调优过的 httpx 连接池（同步 + 异步），
+    避免每个节点每次调用都重新建立 TLS 连接。
+
+    httpx.AsyncClient 的连接绑定创建时的事件循环，因此异步连接池与 ChatOpenAI 实例
+    都按事件循环区分（与 HTTPSessionRegistry 一致），同步连接池在所有事件循环间共享。
+    """
+
+    def __init__(self):
+        # (base_url, model, api_key, timeout, ssl_verify, 事件循环 id) -> (ChatOpenAI, 事件循环)
+        self._clients: Dict[Tuple, Tuple[ChatOpenAI, Any]] = {}
+        self._lock = threading.Lock()
+        # 同步连接池（惰性创建），按 (timeout, ssl_verify) 区分
+        self._sync_pools: Dict[Tuple[int, bool], Any] = {}
+        # 异步连接池，按 (timeout, ssl_verify, 事件循环 id) 区分，值为 (httpx.AsyncClient, 事件循环)
+        self._async_pools: Dict[Tuple[int, bool, int], Tuple[Any, Any]] = {}
+        # 池使用指标
+        self._metrics = {
+            "hits": 0,
+            "misses": 0,
+            "rebuilds": 0,
+            "closed": 0,
+        }
+        self._usage: Dict[Tuple, int] = {}
+
+    @staticmethod
+    def _pool_limits():
+        return httpx.Limits(
+            max_keepalive_connections=int(os.getenv("OPENAI_POOL_MAX_KEEPALIVE", "20")),
+            max_connections=int(os.getenv("OPENAI_POOL_MAX_CONNECTIONS", "100")),
+            keepalive_expiry=float(os.getenv("OPENAI_POOL_KEEPALIVE_EXPIRY", "60")),
+        )
 
-    model_name = os.getenv("BASE_LLM", "deepseek-ai/DeepSeek-V3")
-    # print("model_name:{}".format(model_name))
+    @staticmethod
+    def _current_loop():
+        """当前运行中的事件循环，同步上下文（如启动预热）中为 None"""
+        try:
+            return asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+
+    def _prune_closed_loops(self) -> None:
+        """丢弃已关闭事件循环中创建的客户端与异步连接池（其连接已无法使用）"""
+        for key, (_, loop) in list(self._clients.items()):
+            if loop is not None and loop.is_closed():
+                self._clients.pop(key, None)
+        for key, (_, loop) in list(self._async_pools.items()):
+            if loop is not None and loop.is_closed():
+                self._async_pools.pop(key, None)
+
+    def _ensure_http_clients(self, timeout: int, ssl_verify: bool, loop) -> Dict[str, Any]:
+        """创建（或复用）共享的 httpx 连接池，返回传给 ChatOpenAI 的参数"""
+        if httpx is None:
+            return {}
+
+        pool_key = (timeout, ssl_verify, id(loop))
+        http_async_client, pool_loop = self._async_pools.get(pool_key, (None, None))
+        if http_async_client is None or http_async_client.is_closed or pool_loop is not loop:
+            http_async_client = httpx.AsyncClient(
+                verify=ssl_verify,
+                timeout=timeout,
+                limits=self._pool_limits(),
+            )
+            self._async_pools[pool_key] = (http_async_client, loop)
 
-    # openai_api_key = config.get("configurable", {}).get("model_key", os.getenv("OPENAI_API_KEY"))
+        http_client = self._sync_pools.get((timeout, ssl_verify))
+        if http_client is None or http_client.is_closed:
+            # ChatOpenAI 的 http_client 参数要求同步版 httpx.Client
+            http_client = httpx.Client(
+                verify=ssl_verify,
+                timeout=timeout,
+                limits=self._pool_limits(),
+            )
+            self._sync_pools[(timeout, ssl_verify)] = http_client
+        return {
+            "http_client": http_client,
+            "http_async_client": http_async_client,
+        }
+
+    @staticmethod
+    def _client_is_closed(client: ChatOpenAI) -> bool:
+        http_async_client = getattr(client, "http_async_client", None)
+        return bool(http_async_client is not None and getattr(http_async_client, "is_closed", False))
+
+    def get(self, base_url: str, model: str, api_key: str, timeout: int, ssl_verify: bool) -> ChatOpenAI:
+        """获取当前事件循环中共享的 LLM 客户端，不存在（或底层连接池已关闭）时创建"""
+        usage_key = (base_url, model, api_key, timeout, ssl_verify)
+        loop = self._current_loop()
+        key = usage_key + (id(loop),)
+        with self._lock:
+            client, client_loop = self._clients.get(key, (None, None))
+            # 事件循环 id 可能被新的事件循环复用，需同时比较事件循环对象
+            if client is not None and client_loop is loop and not self._client_is_closed(client):
+                self._metrics["hits"] += 1
+                self._usage[usage_key] = self._usage.get(usage_key, 0) + 1
+                return client
+
+            if client is not None:
+                logger.warning(f"[LLM客户端] 连接池已关闭，重建客户端: {model}")
+                self._metrics["rebuilds"] += 1
+            else:
+                self._metrics["misses"] += 1
+            self._prune_closed_loops()
+
+            client = ChatOpenAI(
+                base_url=base_url,
+                model=model,
+                temperature=0.1,
+                api_key=api_key,
+                model_kwargs={
+                    "extra_headers": {
+                        "Authorization": f"Bearer {api_key}"
+                    }
+                },
+                request_timeout=timeout,
+                max_retries=int(os.getenv('OPENAI_MAX_RETRIES', '5')),
+                **self._ensure_http_clients(timeout, ssl_verify, loop)
+            )
+            self._clients[key] = (client, loop)
+            self._usage[usage_key] = self._usage.get(usage_key, 0) + 1
+            logger.info(f"[LLM客户端] 创建共享客户端: {model} @ {base_url}")
+            return client
+
+    def metrics(self) -> Dict[str, Any]:
+        """返回注册表与连接池的使用指标"""
+        with self._lock:
+            pool_connections = {}
+            for (timeout, ssl_verify, loop_id), (http_async_client, _) in self._async_pools.items():
+                # httpx 未公开连接池状态，这里尽力读取 httpcore 连接池
+                pool = getattr(getattr(http_async_client, "_transport", None), "_pool", None)
+                if pool is None or not hasattr(pool, "connections"):
+                    continue
+                connections = list(pool.connections)
+                pool_connections[f"timeout={timeout},ssl_verify={ssl_verify},loop={loop_id}"] = {
+                    "total": len(connections),
+                    "idle": sum(1 for conn in connections if conn.is_idle()),
+                }
+            return {
+                **self._metrics,
+                "clients": len(self._clients),
+                "usage": {f"{key[1]}@{key[0]}": count for key, count in self._usage.items()},
+                "pool_connections": pool_connections,
+            }
+
+    async def aclose(self) -> None:
+        """关闭当前事件循环（及同步上下文）中的异步连接池与全部同步连接池"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            closable = [key for key, (_, pool_loop) in self._async_pools.items()
+                        if pool_loop is loop or pool_loop is None]
+            async_pools = [self._async_pools.pop(key)[0] for key in closable]
+            for key, (_, client_loop) in list(self._clients.items()):
+                if client_loop is loop or client_loop is None:
+                    self._clients.pop(key)
+            # 其他事件循环中的客户端仍在使用同步连接池时暂不关闭
+            sync_pools = [] if self._clients else list(self._sync_pools.values())
+            if not self._clients:
+                self._sync_pools.clear()
+            self._usage.clear()
+        for http_async_client in async_pools:
+            if not http_async_client.is_closed:
+                await http_async_client.aclose()
+                self._metrics["closed"] += 1
+        for http_client in sync_pools:
+            if not http_client.is_closed:
+                http_client.close()
+
+    def close_sync(self) -> None:
+        """进程退出时的同步清理（仅关闭同步连接池，异步连接池随事件循环释放）"""
+        with self._lock:
+            pools = list(self._sync_pools.values())
+            self._sync_pools.clear()
+            self._async_pools.clear()
+            self._clients.clear()
+        for http_client in pools:
+            if not http_client.is_closed:
+                http_client.close()
+
+
+# 全局注册表实例
+llm_client_registry = LLMClientRegistry()
+atexit.register(llm_client_registry.close_sync)
+
+
+def _resolve_llm_settings() -> Tuple[str, str, str, int, bool]:
+    """从环境变量解析 LLM 连接参数，返回注册表的缓存键"""
+    model_name = os.getenv("BASE_LLM", "deepseek-ai/DeepSeek-V3") or global_config.BASE_LLM
     openai_api_key = os.getenv("OPENAI_API_KEY")
-    # print("openai_api_key:{}".format(openai_api_key))
     base_url = os.getenv("OPENAI_BASE_URL", "https://dashscope.aliyuncs.com/compatible-mode/v1")
+    timeout = int(os.getenv('OPENAI_REQUEST_TIMEOUT', '300'))
+    # 配置 SSL 验证（默认启用，可通过环境变量禁用）
+    ssl_verify = os.getenv('OPENAI_SSL_VERIFY', 'true').lower() == 'true'
+    return base_url, model_name, openai_api_key, timeout, ssl_verify
 
-    if not model_name:
-        model_name = global_config.BASE_LLM
 
-    print(f"模型名称: {model_name}")
-    print(f"Base URL: {base_url}")
-    print(f"创建新的 LLM 客户端（无缓存）...")
+def get_llm_client(state: AgentState, config: RunnableConfig) -> (ChatOpenAI, str):
+    """获取共享的LLM客户端（由进程级注册表缓存，复用连接池）"""
+    base_url, model_name, openai_api_key, timeout, ssl_verify = _resolve_llm_settings()
 
     try:
-        # 配置 SSL 验证（默认启用，可通过环境变量禁用）
-        ssl_verify = os.getenv('OPENAI_SSL_VERIFY', 'true').lower() == 'true'
-        
-        # 创建 httpx 客户端配置（如果可用）
-        http_client_kwargs = {}
-        if httpx is not None:
-            # ChatOpenAI 期望同步版 httpx.Client，传 AsyncClient 会触发类型校验错误
-            http_client = httpx.Client(
-                verify=ssl_verify,
-                timeout=int(os.getenv('OPENAI_REQUEST_TIMEOUT', '300')),
-                limits=httpx.Limits(
-                    max_keepalive_connections=5,
-                    max_connections=10
-                )
-            )
-            http_client_kwargs['http_client'] = http_client
-        
-        # print("base_url:{}".format(base_url))
-        # print("model_name:{}".format(model_name))
-        # print("openai_api_key:{}".format(openai_api_key))
-        client = ChatOpenAI(
-            base_url=base_url,
-            model=model_name,
-            temperature=0.1,
-            api_key=openai_api_key,
-            model_kwargs={
-                "extra_headers": {
-                    "Authorization": f"Bearer {openai_api_key}"
-                }
-            },
-            request_timeout=int(os.getenv('OPENAI_REQUEST_TIMEOUT', '300')),
-            max_retries=int(os.getenv('OPENAI_MAX_RETRIES', '5')),
-            **http_client_kwargs
-        )
-        
-        
-        print(f"[LLM客户端] ✅ 创建新的客户端成功，模型: {model_name}")
+        client = llm_client_registry.get(base_url, model_name, openai_api_key, timeout, ssl_verify)
         return client, model_name
 
     except Exception as e:
@@ -96,6 +242,25 @@ def get_llm_client(state: AgentState, config: RunnableConfig) -> (ChatOpenAI, st
         raise
 
 
+def warmup_llm_clients() -> Dict[str, Any]:
+    """服务启动时预先创建默认 LLM 客户端和连接池"""
+    base_url, model_name, openai_api_key, timeout, ssl_verify = _resolve_llm_settings()
+    llm_client_registry.get(base_url, model_name, openai_api_key, timeout, ssl_verify)
+    logger.info(f"[LLM客户端] 预热完成: {model_name}")
+    return llm_client_registry.metrics()
+
+
+async def close_llm_clients() -> None:
+    """服务关闭时释放共享连接池"""
+    await llm_client_registry.aclose()
+    logger.info("[LLM客户端] 共享连接池已关闭")
+
+
+def get_llm_pool_metrics() -> Dict[str, Any]:
+    """获取 LLM 客户端注册表和连接池指标"""
+    return llm_client_registry.metrics()
+
+
 def build_messages_for_llm(model_name, messages):
     messages_for_llm = []
 
@@ -133,22 +298,23 @@ def build_messages_for_llm(model_name, messages):
                 logger.error("message的name字段未被正确设置")
                 logger.error(f"有问题的msg: {msg}")
 
+            # 不修改原消息（消息对象在各节点间共享），仅在新构造的消息上加前缀
             if isinstance(msg, AIMessage):
+                content = msg.content
                 if not msg.name == "a2a_agent":
-                    msg.content = f"Response from {msg.name}: " + msg.content
+                    content = f"Response from {msg.name}: " + content
                 messages_for_llm.append(
                     HumanMessage(
-                        content=msg.content,
+                        content=content,
                         name=msg.name,
                         tool_calls=msg.tool_calls if msg.tool_calls else [],
                         additional_kwargs=msg.additional_kwargs if msg.additional_kwargs else {}
                     ))
 
             elif isinstance(msg, ToolMessage):
-                msg.content = f"Response from {msg.name} tool: " + msg.content
                 messages_for_llm.append(
                     HumanMessage(
-                        content=msg.content,
+                        content=f"Response from {msg.name} tool: " + msg.content,
                         name=msg.name,
                         additional_kwargs=msg.additional_kwargs if msg.additional_kwargs else {}
                     ))
@@ -156,8 +322,9 @@ def build_messages_for_llm(model_name, messages):
         else:
             messages_for_llm.append(msg)
 
-    if model_name and "Qwen3-235B" in model_name:
-        messages[0].content += ' /no_think'
+    if model_name and "Qwen3-235B" in model_name and messages_for_llm:
+        first = messages_for_llm[0]
+        messages_for_llm[0] = with_content(first, first.content + ' /no_think')
 
     # logger.info(f"Messages For LLM: {messages_for_llm}")
 
@@ -168,8 +335,8 @@ async def safe_llm_invoke(llm, config: RunnableConfig, model_name, messages, max
     """安全的LLM调用，包含重试逻辑"""
     for attempt in range(max_retries):
         try:
-            # 在调用前再次验证消息格式
-            messages_for_llm = build_messages_for_llm(model_name, copy.deepcopy(messages))
+            # 在调用前再次验证消息格式（build_messages_for_llm 不修改入参，重试时无需拷贝）
+            messages_for_llm = build_messages_for_llm(model_name, messages)
             # 调用LLM
             if hidden:
                 config["tags"] = ["langsmith:hidden"]
@@ -218,9 +385,8 @@ async def safe_llm_invoke(llm, config: RunnableConfig, model_name, messages, max
             # 特殊处理连接关闭错误
             elif "Cannot send a request, as the client has been closed" in error_msg:
                 print(f"检测到客户端已关闭错误 (尝试 {attempt + 1}/{max_retries})")
-                # 这种情况下，我们无法在这里重新创建客户端
-                # 因为客户端是在外部创建的，所以直接抛出异常
-                # 让调用方处理
+                # 客户端由注册表共享，这里无法替换调用方持有的实例；
+                # 注册表会在下一次 get_llm_client 时检测到连接池已关闭并重建
                 raise Exception("LLM客户端已关闭，需要重新创建") from e
 
             # 处理其他JSON相关错误
@@ -13,15 +13,67 @@ MCP (Model Context Protocol) 客户端连接管理器
 import asyncio
 import atexit
 import logging
+import os
 import random
 import threading
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set, Tuple
+import httpx
 from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.tools import load_mcp_tools
 from langchain_core.tools import BaseTool
 
+from .mcp_session import MCPServerHealth, MCPSessionPool
+
 # 配置日志记录器
 logger = logging.getLogger(__name__)
 
+# mcp_server.json 中由本模块使用的扩展字段，创建 MultiServerMCPClient 前需剔除
+#   max_concurrency: 该服务器允许的最大并发工具调用数
+#   tool_timeout:    该服务器单次工具调用超时（秒）
+MCP_EXTRA_CONFIG_KEYS = ("max_concurrency", "tool_timeout")
+DEFAULT_SERVER_MAX_CONCURRENCY = int(os.getenv("MCP_SERVER_MAX_CONCURRENCY", "4"))
+DEFAULT_TOOL_TIMEOUT = float(os.getenv("MCP_TOOL_TIMEOUT", "120"))
+# streamable_http 连接的 httpx 连接池参数
+MCP_HTTP_MAX_CONNECTIONS = int(os.getenv("MCP_HTTP_MAX_CONNECTIONS", "10"))
+MCP_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("MCP_HTTP_KEEPALIVE_EXPIRY", "60"))
+
+
+def create_mcp_http_client(
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[httpx.Timeout] = None,
+        auth: Optional[httpx.Auth] = None,
+) -> httpx.AsyncClient:
+    """
+    streamable_http 连接使用的 httpx 客户端工厂。
+    每个持久会话持有一个开启 keep-alive 的连接池，会话内的请求复用 TCP 连接。
+    """
+    return httpx.AsyncClient(
+        headers=headers,
+        timeout=timeout or httpx.Timeout(30.0),
+        auth=auth,
+        follow_redirects=True,
+        limits=httpx.Limits(
+            max_connections=MCP_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=MCP_HTTP_MAX_CONNECTIONS,
+            keepalive_expiry=MCP_HTTP_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+def to_client_config(server_config: Optional[Dict[str, Dict]]) -> Dict[str, Dict]:
+    """
+    剔除扩展字段，得到可直接传给 MultiServerMCPClient 的连接配置。
+    streamable_http 连接未指定 httpx_client_factory 时使用带连接池的 create_mcp_http_client。
+    """
+    client_config = {}
+    for name, conn in (server_config or {}).items():
+        conn = {k: v for k, v in (conn or {}).items() if k not in MCP_EXTRA_CONFIG_KEYS}
+        if conn.get("transport") == "streamable_http" and not conn.get("httpx_client_factory"):
+            conn["httpx_client_factory"] = create_mcp_http_client
+        client_config[name] = conn
+    return client_config
+
+
 # 模块级别的单例实例和锁
 _connection_manager_instance: Optional['MCPConnectionManager'] = None
 _instance_lock = threading.Lock()
@@ -49,12 +101,34 @@ class MCPConnectionManager:
         self.lock = asyncio.Lock()
         # 心跳任务，定期发送心跳保持连接活跃
         self.heartbeat_task: Optional[asyncio.Task] = None
-        # 重连任务，在连接失败时执行重连逻辑
-        self.reconnect_task: Optional[asyncio.Task] = None
+        # 服务器名称 -> 重连任务，只对失败的服务器单独重连
+        self.reconnect_tasks: Dict[str, asyncio.Task] = {}
         # 运行状态标志，指示管理器是否正在运行
         self.running = False
-        # 工具缓存列表，存储从MCP服务器获取的工具
+        # 工具缓存列表，存储从MCP服务器获取的工具（由各服务器的工具按配置顺序合并而成）
         self.tools_cache: List[BaseTool] = []
+        # 服务器名称 -> 该服务器的工具缓存
+        self.server_tools: Dict[str, List[BaseTool]] = {}
+        # 处于降级状态的服务器名称 -> 最近一次错误
+        self.degraded_servers: Dict[str, str] = {}
+        # 工具名称 -> 所属服务器名称
+        self.tool_server_map: Dict[str, str] = {}
+        # (服务器名称, 事件循环 id) -> (事件循环, 并发上限, 信号量)：同一服务器的并发调用数在所有会话间共享
+        self._server_limiters: Dict[Tuple[Optional[str], int], Tuple[asyncio.AbstractEventLoop, int, asyncio.Semaphore]] = {}
+        # 工具集版本号，工具集合发生变化时递增，供调用方缓存派生数据
+        self.tools_version = 0
+        # 工具名称 -> 工具 的索引，随工具集一起重建
+        self._tool_index: Dict[str, BaseTool] = {}
+        # 预先小写化的 (工具, 名称, 描述) 列表，供 search_tools 使用
+        self._search_index: List[Tuple[BaseTool, str, str]] = []
+        # 关键词搜索结果缓存，工具集变化时清空
+        self._search_cache: Dict[Tuple[str, bool], List[BaseTool]] = {}
+        # 收到 tools/list_changed 或显式失效的服务器，下次 get_tools 时只重新获取这些服务器的工具
+        self._stale_servers: Set[str] = set()
+        # 每个服务器一个有界的持久会话池，工具调用、ping 健康检查与工具变更通知共用
+        self.session_pools: Dict[str, MCPSessionPool] = {}
+        # 每个服务器的健康状态
+        self.server_health: Dict[str, MCPServerHealth] = {}
         # 最后一次心跳成功的标志，初始为False直到首次成功连接
         self.last_heartbeat_ok = False
         # 是否已注册关闭处理程序的标志
@@ -204,27 +278,24 @@ class MCPConnectionManager:
                 os.access = original_access
                 
                 # 步骤 4: 现在可以安全地创建 MCP 客户端（不会触发 BlockingError）
-                self.client = MultiServerMCPClient(server_config)
-                try:
-                    self.tools_cache = await self.client.get_tools()
-                except ExceptionGroup as eg:
-                    for e in eg.exceptions:
-                        logger.error(f"MCP工具获取子错误: {e}")
-                    self.tools_cache = []
-                except Exception as e:
-                    logger.error(f"MCP工具获取失败: {e}")
-                    self.tools_cache = []
-                
-                logger.info("MCP客户端成功连接并验证")
+                self.client = MultiServerMCPClient(to_client_config(server_config))
+                # 各服务器独立、并发连接；失败的服务器进入降级状态，不影响其他服务器的工具
+                await self._fetch_tools()
+
+                logger.info(
+                    f"MCP客户端已连接: {len(server_config) - len(self.degraded_servers)}/{len(server_config)} 个服务器可用"
+                )
                 logger.info("已应用 os.access monkey-patch，在整个 MCP 客户端生命周期内避免 BlockingError")
 
                 # 标记为成功连接
-                self.last_heartbeat_ok = True
+                self.last_heartbeat_ok = not server_config or len(self.degraded_servers) < len(server_config)
                 self.running = True
 
-                # 启动心跳任务
+                # 启动心跳任务，并为失败的服务器启动单独的重连任务
                 self._loop = asyncio.get_running_loop()
                 self.heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+                for server_name in self.degraded_servers:
+                    self._ensure_reconnect(server_name)
 
             except Exception as e:
                 logger.error(f"启动MCP连接失败: {e}")
@@ -239,32 +310,181 @@ class MCPConnectionManager:
             force_refresh: 如果为True，绕过缓存并获取最新工具
 
         Returns:
-            List[BaseTool]: 可用工具列表
+            List[BaseTool]: 可用工具列表（共享的缓存列表，调用方不应修改）
         """
         if not self.client:
             logger.warning("没有可用的MCP客户端")
             return []
 
-        if not self.tools_cache or force_refresh:
+        if force_refresh or not (self.server_tools or self.degraded_servers):
+            targets = None  # 全部服务器
+        elif self._stale_servers:
+            targets = list(self._stale_servers)
+        else:
+            targets = []
+
+        if targets is None or targets:
+            logger.debug(f"从MCP客户端获取工具: {targets or '全部服务器'}")
             try:
-                logger.debug("从MCP客户端获取工具...")
-                # 显式捕获 TaskGroup 错误
-                try:
-                    self.tools_cache = await self.client.get_tools()
-                except ExceptionGroup as eg:
-                    for e in eg.exceptions:
-                        logger.error(f"MCP工具获取子错误: {e}")
-                except Exception as e:
-                    logger.error(f"从MCP客户端获取工具失败: {e}")
+                await self._fetch_tools(targets)
                 logger.info(f"从MCP服务器检索到 {len(self.tools_cache)} 个工具")
             except Exception as e:
+                # 获取失败时继续使用已缓存的工具（没有缓存时为空列表）
                 logger.error(f"从MCP客户端获取工具失败: {e}")
-                if not self.tools_cache:  # 只有在没有缓存工具时才返回空列表
-                    return []
         else:
             logger.debug(f"使用缓存工具: {len(self.tools_cache)} 个工具")
 
-        return self.tools_cache.copy()
+        # 工具集只会被整体替换，不会原地修改，这里直接返回缓存列表，避免每次调用复制
+        return self.tools_cache
+
+    def _set_tools(self, tools: List[BaseTool], tool_server_map: Dict[str, str]) -> None:
+        """
+        替换工具集并重建名称索引与搜索索引。
+        只有工具集合（名称、所属服务器或工具对象）发生变化时才递增 tools_version。
+        """
+        tool_index = {tool.name: tool for tool in tools}
+        changed = (
+            tool_server_map != self.tool_server_map
+            or tool_index.keys() != self._tool_index.keys()
+            or any(self._tool_index[name] is not tool for name, tool in tool_index.items())
+        )
+        self.tools_cache = tools
+        self.tool_server_map = tool_server_map
+        if not changed:
+            return
+
+        self._tool_index = tool_index
+        self._search_index = [
+            (tool, tool.name.lower(), (getattr(tool, "description", "") or "").lower())
+            for tool in tools
+        ]
+        self._search_cache = {}
+        self.tools_version += 1
+        logger.debug(f"MCP工具索引已重建: {len(tool_index)} 个工具, 版本 {self.tools_version}")
+
+    def invalidate_tools(self, server_name: Optional[str] = None) -> None:
+        """标记工具缓存失效，下次 get_tools 时重新获取（未指定服务器时全部失效）"""
+        if server_name:
+            logger.info(f"MCP服务器 {server_name} 工具列表变更，工具缓存失效")
+            self._stale_servers.add(server_name)
+        else:
+            self._stale_servers.update((self.server_config or {}).keys())
+
+    def _rebuild_tools(self) -> None:
+        """按配置顺序合并各服务器的工具缓存"""
+        tools: List[BaseTool] = []
+        tool_server_map: Dict[str, str] = {}
+        for server_name in (self.server_config or {}):
+            for tool in self.server_tools.get(server_name, []):
+                tools.append(tool)
+                tool_server_map[tool.name] = server_name
+        self._set_tools(tools, tool_server_map)
+
+    def get_degraded_servers(self) -> Dict[str, str]:
+        """返回处于降级状态的服务器及其最近一次错误"""
+        return dict(self.degraded_servers)
+
+    def get_server_health(self) -> Dict[str, Dict]:
+        """返回各服务器的健康状态、降级状态与会话池使用情况"""
+        result = {name: {} for name in (self.server_config or {})}
+        for name, health in self.server_health.items():
+            result.setdefault(name, {}).update(health.to_dict())
+        for name, entry in result.items():
+            entry["degraded"] = name in self.degraded_servers
+            if name in self.degraded_servers:
+                entry["degraded_error"] = self.degraded_servers[name]
+            entry["tools"] = len(self.server_tools.get(name, []))
+        for name, pool in self.session_pools.items():
+            result.setdefault(name, {})["sessions"] = pool.stats()
+        return result
+
+    def _get_session_pool(self, server_name: str) -> MCPSessionPool:
+        """获取（必要时创建）服务器的会话池，池大小与该服务器的最大并发调用数一致"""
+        pool = self.session_pools.get(server_name)
+        if pool is None:
+            connection = to_client_config(self.server_config).get(server_name) or {}
+            pool = MCPSessionPool(
+                server_name,
+                connection,
+                size=self.get_server_max_concurrency(server_name),
+                on_tools_changed=self.invalidate_tools,
+            )
+            self.session_pools[server_name] = pool
+        return pool
+
+    def get_tool_index(self) -> Dict[str, BaseTool]:
+        """返回当前工具集的 名称 -> 工具 索引（只读，随 tools_version 更新）"""
+        return self._tool_index
+
+    async def _load_server_tools(self, server_name: str) -> List[BaseTool]:
+        """获取单个服务器的工具，工具绑定到该服务器的会话池，调用时复用池中的持久会话"""
+        return await load_mcp_tools(self._get_session_pool(server_name).proxy)
+
+    async def _fetch_tools(self, server_names: Optional[List[str]] = None) -> List[BaseTool]:
+        """
+        按服务器并发获取工具，更新各服务器的工具缓存后重新合并。
+        单个服务器失败只将该服务器标记为降级并保留其已缓存的工具，
+        运行中则为其启动单独的重连任务。
+
+        Args:
+            server_names: 需要获取的服务器，None 表示全部服务器
+        """
+        if server_names is None:
+            server_names = list(self.client.connections.keys()) if self.client else []
+
+        results = await asyncio.gather(
+            *(self._load_server_tools(name) for name in server_names), return_exceptions=True
+        )
+
+        for server_name, result in zip(server_names, results):
+            self._stale_servers.discard(server_name)
+            if isinstance(result, BaseException):
+                errors = result.exceptions if isinstance(result, BaseExceptionGroup) else [result]
+                for e in errors:
+                    logger.error(f"MCP服务器 {server_name} 工具获取失败: {e}")
+                self._mark_degraded(server_name, str(errors[0]) or type(errors[0]).__name__)
+                continue
+            self.server_tools[server_name] = result
+            self.degraded_servers.pop(server_name, None)
+
+        self._rebuild_tools()
+        return self.tools_cache
+
+    def _mark_degraded(self, server_name: str, error: str) -> None:
+        """将服务器标记为降级，运行中时启动该服务器的重连任务"""
+        if server_name not in self.degraded_servers:
+            logger.warning(f"MCP服务器 {server_name} 进入降级状态: {error}")
+        self.degraded_servers[server_name] = error
+        if self.running:
+            self._ensure_reconnect(server_name)
+
+    def get_server_for_tool(self, tool_name: str) -> Optional[str]:
+        """返回工具所属的服务器名称"""
+        return self.tool_server_map.get(tool_name)
+
+    def get_server_max_concurrency(self, server_name: Optional[str]) -> int:
+        """服务器的最大并发调用数，来自 mcp_server.json 的 max_concurrency"""
+        conn = (self.server_config or {}).get(server_name) or {}
+        return max(1, int(conn.get("max_concurrency", DEFAULT_SERVER_MAX_CONCURRENCY)))
+
+    def get_server_semaphore(self, server_name: Optional[str]) -> asyncio.Semaphore:
+        """获取服务器在当前事件循环中的并发信号量，max_concurrency 变化时重新创建（需在协程中调用）"""
+        loop = asyncio.get_running_loop()
+        limit = self.get_server_max_concurrency(server_name)
+        key = (server_name, id(loop))
+        entry = self._server_limiters.get(key)
+        if entry is None or entry[0] is not loop or entry[1] != limit:
+            for other_key, (other_loop, _, _) in list(self._server_limiters.items()):
+                if other_loop.is_closed():
+                    self._server_limiters.pop(other_key, None)
+            entry = (loop, limit, asyncio.Semaphore(limit))
+            self._server_limiters[key] = entry
+        return entry[2]
+
+    def get_tool_timeout(self, tool_name: str) -> float:
+        """工具调用超时，来自所属服务器的 tool_timeout"""
+        conn = (self.server_config or {}).get(self.get_server_for_tool(tool_name)) or {}
+        return float(conn.get("tool_timeout", DEFAULT_TOOL_TIMEOUT))
 
     async def get_tool_by_name(self, tool_name: str, force_refresh: bool = False) -> Optional[BaseTool]:
         """
@@ -277,13 +497,13 @@ class MCPConnectionManager:
         Returns:
             Optional[BaseTool]: 找到的工具，如果不存在则返回None
         """
-        tools = await self.get_tools(force_refresh=force_refresh)
-        
-        for tool in tools:
-            if tool.name == tool_name:
-                logger.debug(f"找到工具: {tool_name}")
-                return tool
-        
+        await self.get_tools(force_refresh=force_refresh)
+
+        tool = self._tool_index.get(tool_name)
+        if tool is not None:
+            logger.debug(f"找到工具: {tool_name}")
+            return tool
+
         logger.warning(f"未找到工具: {tool_name}")
         return None
 
@@ -298,11 +518,11 @@ class MCPConnectionManager:
         Returns:
             Dict[str, Optional[BaseTool]]: 工具名称到工具的映射字典，不存在的工具值为None
         """
-        tools = await self.get_tools(force_refresh=force_refresh)
-        
-        # 创建工具名称到工具的映射
-        tool_map = {tool.name: tool for tool in tools}
-        
+        await self.get_tools(force_refresh=force_refresh)
+
+        # 使用预先构建的工具名称索引
+        tool_map = self._tool_index
+
         # 返回请求的工具
         result = {}
         for tool_name in tool_names:
@@ -350,26 +570,32 @@ class MCPConnectionManager:
         Returns:
             List[BaseTool]: 匹配的工具列表
         """
-        tools = await self.get_tools(force_refresh=force_refresh)
-        matching_tools = []
-        
+        await self.get_tools(force_refresh=force_refresh)
+
         keyword_lower = keyword.lower()
-        
-        for tool in tools:
+        cache_key = (keyword_lower, search_in_description)
+        cached = self._search_cache.get(cache_key)
+        if cached is not None:
+            logger.debug(f"关键词 '{keyword}' 命中搜索缓存")
+            return list(cached)
+
+        matching_tools = []
+        # 名称与描述已在工具集更新时预先小写化
+        for tool, name_lower, description_lower in self._search_index:
             # 在工具名称中搜索
-            if keyword_lower in tool.name.lower():
+            if keyword_lower in name_lower:
                 matching_tools.append(tool)
                 logger.debug(f"工具 {tool.name} 名称匹配关键词 '{keyword}'")
                 continue
-            
+
             # 在工具描述中搜索
-            if search_in_description and hasattr(tool, 'description') and tool.description:
-                if keyword_lower in tool.description.lower():
-                    matching_tools.append(tool)
-                    logger.debug(f"工具 {tool.name} 描述匹配关键词 '{keyword}'")
-        
+            if search_in_description and keyword_lower in description_lower:
+                matching_tools.append(tool)
+                logger.debug(f"工具 {tool.name} 描述匹配关键词 '{keyword}'")
+
+        self._search_cache[cache_key] = matching_tools
         logger.info(f"找到 {len(matching_tools)} 个匹配关键词 '{keyword}' 的工具")
-        return matching_tools
+        return list(matching_tools)
 
     async def get_tool_names(self, force_refresh: bool = False) -> List[str]:
         """
@@ -428,12 +654,15 @@ class MCPConnectionManager:
                 finally:
                     self.heartbeat_task = None
 
-            if self.reconnect_task:
-                self.reconnect_task.cancel()
-                try:
-                    await self._drain_task(self.reconnect_task)
-                finally:
-                    self.reconnect_task = None
+            reconnect_tasks = list(self.reconnect_tasks.values())
+            self.reconnect_tasks = {}
+            for task in reconnect_tasks:
+                task.cancel()
+                await self._drain_task(task)
+
+            # 关闭所有会话池
+            await self._reset_session_pools()
+            self.session_pools = {}
 
             # 如果客户端有清理方法则关闭客户端
             if self.client:
@@ -443,7 +672,11 @@ class MCPConnectionManager:
 
             # 清理状态
             self.server_config = None
-            self.tools_cache = []
+            self.server_tools = {}
+            self.degraded_servers = {}
+            self._stale_servers = set()
+            self._set_tools([], {})
+            self.server_health = {}
             self.last_heartbeat_ok = False
             self._loop = None
             
@@ -514,11 +747,37 @@ class MCPConnectionManager:
         except asyncio.CancelledError:
             pass
 
+    async def _reset_session_pools(self) -> None:
+        """关闭所有池中的会话，会话池保留，已绑定的工具下次调用时自动重建会话"""
+        pools = list(self.session_pools.values())
+        if pools:
+            await asyncio.gather(*(pool.reset() for pool in pools), return_exceptions=True)
+
+    async def _probe_server(self, server_name: str) -> bool:
+        """
+        通过会话池中的持久会话向单个服务器发送 MCP ping。
+        传输层失败的会话由会话池丢弃，下一次借出时重新建立。
+        """
+        health = self.server_health.setdefault(server_name, MCPServerHealth(server_name))
+        pool = self._get_session_pool(server_name)
+        opened = pool.stats()["opened"]
+        try:
+            latency_ms = await pool.ping()
+            if not health.healthy and opened and pool.stats()["opened"] > opened:
+                health.session_restarts += 1
+            health.record_ok(health.last_latency_ms if latency_ms is None else latency_ms)
+            return True
+        except Exception as e:
+            health.record_failure(str(e) or type(e).__name__)
+            logger.warning(f"MCP服务器 {server_name} 心跳失败: {health.last_error}")
+            return False
+
     async def _heartbeat_loop(self, interval_sec: int = 45) -> None:
         """
         心跳循环，用于保持SSE连接活跃。
 
-        定期发送轻量级请求来测试连接状态，如果连接失败则触发重连机制。
+        通过每个服务器的持久会话发送 MCP ping，只更新各服务器的健康状态，
+        不再重新列举工具；ping 失败的服务器进入降级状态并单独重连。
 
         Args:
             interval_sec: 心跳间隔时间（秒），默认45秒
@@ -532,80 +791,80 @@ class MCPConnectionManager:
                 if not self.running:
                     break
 
-                # 发送轻量级请求来测试连接
-                await self.client.get_tools()
-                self.last_heartbeat_ok = True
-                logger.debug("心跳成功")
+                # 并发 ping 所有未在重连中的服务器
+                server_names = [
+                    name for name in (self.server_config or {})
+                    if name not in self.reconnect_tasks
+                ]
+                results = await asyncio.gather(*(self._probe_server(name) for name in server_names))
+                for server_name, ok in zip(server_names, results):
+                    if not ok:
+                        self._mark_degraded(server_name, self.server_health[server_name].last_error)
+
+                self.last_heartbeat_ok = not self.degraded_servers or len(self.degraded_servers) < len(self.server_config or {})
+                logger.debug(f"心跳完成: {sum(results)}/{len(server_names)} 个服务器健康")
 
             except Exception as e:
                 logger.warning(f"心跳失败: {e}")
-                self.last_heartbeat_ok = False
-                if not self.running:
-                    break
-                self._ensure_reconnect()
 
-    def _ensure_reconnect(self) -> None:
+    def _ensure_reconnect(self, server_name: str) -> None:
         """
-        确保重连任务已启动（如果尚未运行）。
+        确保服务器的重连任务已启动（如果尚未运行）。
         
-        检查重连任务是否存在且未完成，如果不存在或已完成则启动新的重连任务。
+        检查该服务器的重连任务是否存在且未完成，如果不存在或已完成则启动新的重连任务。
         """
-        if self.reconnect_task is None or self.reconnect_task.done():
-            logger.info("启动重连任务")
-            self.reconnect_task = asyncio.create_task(self._reconnect_loop())
+        task = self.reconnect_tasks.get(server_name)
+        if task is None or task.done():
+            logger.info(f"启动MCP服务器 {server_name} 重连任务")
+            self.reconnect_tasks[server_name] = asyncio.create_task(self._reconnect_loop(server_name))
 
-    async def _reconnect_loop(self, base_delay: float = 0.5, max_delay: float = 30.0) -> None:
+    async def _reconnect_loop(self, server_name: str, base_delay: float = 0.5, max_delay: float = 30.0) -> None:
         """
-        带指数退避和抖动的重连循环。
+        单个服务器带指数退避和抖动的重连循环。
 
         使用指数退避算法来避免频繁重连，同时添加随机抖动来避免多个客户端同时重连。
+        只重建该服务器的会话并重新获取其工具，其他服务器不受影响。
 
         Args:
+            server_name: 需要重连的服务器名称
             base_delay: 指数退避的基础延迟时间（秒）
             max_delay: 重连尝试之间的最大延迟时间（秒）
         """
         attempt = 0
 
-        while self.running and not self.last_heartbeat_ok:
-            try:
+        try:
+            while self.running and server_name in self.degraded_servers:
                 # 计算带指数退避和完全抖动的延迟时间
                 delay = min(max_delay, base_delay * (2 ** attempt))
                 jittered_delay = random.uniform(0, delay)
 
-                logger.info(f"重连尝试 {attempt + 1}，{jittered_delay:.2f} 秒后开始")
+                logger.info(f"MCP服务器 {server_name} 重连尝试 {attempt + 1}，{jittered_delay:.2f} 秒后开始")
                 await asyncio.sleep(jittered_delay)
 
                 if not self.running:
                     break
 
-                # 尝试重新创建客户端并验证
                 try:
-                    import os as _os
-                    if (not _os.getenv("SERPER_API_KEY")) and (self.server_config and "serpersearch" in self.server_config):
-                        filtered_config = {k: v for k, v in self.server_config.items() if k != "serpersearch"}
-                    else:
-                        filtered_config = self.server_config
-                except Exception:
-                    filtered_config = self.server_config
-
-                new_client = MultiServerMCPClient(filtered_config)
-                await new_client.get_tools()
-
-                # 成功 - 交换新客户端
-                async with self.lock:
-                    self.client = new_client
-                    self.tools_cache = []  # 清空缓存以强制刷新
-                    self.last_heartbeat_ok = True
-
-                logger.info("重连成功")
-                break
-
-            except Exception as e:
-                logger.warning(f"重连尝试 {attempt + 1} 失败: {e}")
-                attempt += 1
-
-        # 清除重连任务引用
-        self.reconnect_task = None
+                    # 丢弃该服务器的旧会话后重新获取工具
+                    await self._get_session_pool(server_name).reset()
+                    tools = await self._load_server_tools(server_name)
+                except Exception as e:
+                    self.degraded_servers[server_name] = str(e) or type(e).__name__
+                    logger.warning(f"MCP服务器 {server_name} 重连尝试 {attempt + 1} 失败: {e}")
+                    attempt += 1
+                    continue
+
+                # 成功 - 更新该服务器的工具缓存
+                self.server_tools[server_name] = tools
+                self.degraded_servers.pop(server_name, None)
+                self._stale_servers.discard(server_name)
+                self._rebuild_tools()
+                self.last_heartbeat_ok = True
+                logger.info(f"MCP服务器 {server_name} 重连成功，恢复 {len(tools)} 个工具")
+        finally:
+            # 清除重连任务引用
+            if self.reconnect_tasks.get(server_name) is asyncio.current_task():
+                del self.reconnect_tasks[server_name]
 
     @property
     def is_connected(self) -> bool:
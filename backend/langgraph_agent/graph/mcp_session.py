@@ -0,0 +1,297 @@
+"""
+MCP 持久会话、会话池与服务器健康状态
+
+MCPServerSession 在一个独立任务中持有与单个 MCP 服务器的长连接会话：
+会话的建立与关闭都在该任务内完成（anyio 的 cancel scope 要求进入与退出在同一任务），
+其他协程直接复用其中的 ClientSession。服务器推送的
+notifications/tools/list_changed 通过回调通知连接管理器刷新工具列表。
+
+MCPSessionPool 为每个服务器维护一组有界的持久会话，工具通过 PooledSessionProxy
+绑定到会话池，调用时借出一个已初始化的会话，不再为每次调用新建会话（stdio 配置下即新进程）。
+"""
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set
+
+import anyio
+from langchain_mcp_adapters.sessions import create_session
+from mcp import ClientSession, types
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PING_TIMEOUT = float(os.getenv("MCP_PING_TIMEOUT", "10"))
+DEFAULT_SESSION_INIT_TIMEOUT = float(os.getenv("MCP_SESSION_INIT_TIMEOUT", "30"))
+
+# 出现这些异常说明会话的传输层已不可用，需要丢弃该会话
+_BROKEN_SESSION_ERRORS = (
+    ConnectionError,
+    TimeoutError,
+    asyncio.TimeoutError,
+    anyio.ClosedResourceError,
+    anyio.BrokenResourceError,
+    anyio.EndOfStream,
+)
+
+
+@dataclass
+class MCPServerHealth:
+    """单个 MCP 服务器的健康状态"""
+    server_name: str
+    healthy: bool = False
+    last_ok_at: float = 0.0
+    last_check_at: float = 0.0
+    last_latency_ms: float = 0.0
+    last_error: str = ""
+    consecutive_failures: int = 0
+    session_restarts: int = 0
+
+    def record_ok(self, latency_ms: float) -> None:
+        now = time.monotonic()
+        self.healthy = True
+        self.last_ok_at = now
+        self.last_check_at = now
+        self.last_latency_ms = latency_ms
+        self.last_error = ""
+        self.consecutive_failures = 0
+
+    def record_failure(self, error: str) -> None:
+        self.healthy = False
+        self.last_check_at = time.monotonic()
+        self.last_error = error
+        self.consecutive_failures += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "healthy": self.healthy,
+            "last_ok_seconds_ago": round(now - self.last_ok_at, 1) if self.last_ok_at else None,
+            "last_latency_ms": round(self.last_latency_ms, 1),
+            "last_error": self.last_error,
+            "consecutive_failures": self.consecutive_failures,
+            "session_restarts": self.session_restarts,
+        }
+
+
+class MCPServerSession:
+    """
+    单个 MCP 服务器的持久会话，由内部任务拥有。
+    """
+
+    def __init__(
+            self,
+            server_name: str,
+            connection: Dict[str, Any],
+            on_tools_changed: Optional[Callable[[str], None]] = None,
+    ):
+        self.server_name = server_name
+        self.connection = connection
+        self.on_tools_changed = on_tools_changed
+        self.session: Optional[ClientSession] = None
+        self._task: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._error: Optional[BaseException] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.session is not None and self._task is not None and not self._task.done()
+
+    async def _handle_message(self, message: Any) -> None:
+        """处理服务器主动推送的消息，只关心工具列表变更通知"""
+        if isinstance(message, types.ServerNotification) and isinstance(message.root, types.ToolListChangedNotification):
+            logger.info(f"[MCPSession] {self.server_name} 工具列表已变更")
+            if self.on_tools_changed:
+                self.on_tools_changed(self.server_name)
+        elif isinstance(message, Exception):
+            logger.debug(f"[MCPSession] {self.server_name} 收到异常消息: {message}")
+
+    def _session_connection(self) -> Dict[str, Any]:
+        connection = dict(self.connection)
+        session_kwargs = dict(connection.get("session_kwargs") or {})
+        session_kwargs["message_handler"] = self._handle_message
+        connection["session_kwargs"] = session_kwargs
+        return connection
+
+    async def _run(self) -> None:
+        try:
+            async with create_session(self._session_connection()) as session:
+                await session.initialize()
+                self.session = session
+                self._ready.set()
+                await self._closing.wait()
+        except asyncio.CancelledError:
+            raise
+        except BaseException as e:
+            self._error = e
+            logger.warning(f"[MCPSession] {self.server_name} 会话异常结束: {e}")
+        finally:
+            self.session = None
+            # 唤醒仍在等待建立会话的协程
+            self._ready.set()
+
+    async def open(self, timeout: float = DEFAULT_SESSION_INIT_TIMEOUT) -> None:
+        """启动会话任务并等待 initialize 完成"""
+        if self.is_open:
+            return
+        self._ready.clear()
+        self._closing.clear()
+        self._error = None
+        self._task = asyncio.create_task(self._run(), name=f"mcp-session-{self.server_name}")
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            await self.close()
+            raise TimeoutError(f"MCP服务器 {self.server_name} 会话建立超时（{timeout}s）")
+        if self.session is None:
+            error = self._error
+            await self.close()
+            raise ConnectionError(f"MCP服务器 {self.server_name} 会话建立失败: {error}")
+
+    async def ping(self, timeout: float = DEFAULT_PING_TIMEOUT) -> float:
+        """发送 MCP ping 请求，返回往返耗时（毫秒）"""
+        if not self.is_open:
+            raise ConnectionError(f"MCP服务器 {self.server_name} 会话未建立")
+        started = time.perf_counter()
+        await asyncio.wait_for(self.session.send_ping(), timeout=timeout)
+        return (time.perf_counter() - started) * 1000
+
+    async def close(self) -> None:
+        """通知会话任务退出，并等待其在自身任务内关闭会话"""
+        task = self._task
+        self._task = None
+        if task is None:
+            return
+        self._closing.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(task), timeout=5)
+        except Exception:
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self.session = None
+
+
+class MCPSessionPool:
+    """
+    单个 MCP 服务器的有界会话池。
+
+    会话按需建立，最多 size 个；借出时优先复用空闲会话，
+    传输层异常或会话任务已退出时丢弃该会话，下次借出时自动重建。
+    """
+
+    def __init__(
+            self,
+            server_name: str,
+            connection: Dict[str, Any],
+            size: int,
+            on_tools_changed: Optional[Callable[[str], None]] = None,
+    ):
+        self.server_name = server_name
+        self.connection = connection
+        self.size = max(1, size)
+        self.on_tools_changed = on_tools_changed
+        self.proxy = PooledSessionProxy(self)
+        self._slots = asyncio.Semaphore(self.size)
+        self._idle: List[MCPServerSession] = []
+        self._sessions: Set[MCPServerSession] = set()
+        self._in_use = 0
+        self._metrics = {"opened": 0, "discarded": 0, "checkouts": 0}
+
+    async def _checkout(self) -> MCPServerSession:
+        await self._slots.acquire()
+        try:
+            while self._idle:
+                pooled = self._idle.pop()
+                if pooled.is_open:
+                    return pooled
+                await self._discard(pooled)
+            pooled = MCPServerSession(self.server_name, self.connection, self.on_tools_changed)
+            await pooled.open()
+            self._sessions.add(pooled)
+            self._metrics["opened"] += 1
+            return pooled
+        except BaseException:
+            self._slots.release()
+            raise
+
+    async def _discard(self, pooled: MCPServerSession) -> None:
+        self._sessions.discard(pooled)
+        self._metrics["discarded"] += 1
+        await pooled.close()
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[ClientSession]:
+        """借出一个已初始化的会话，使用完毕后归还"""
+        pooled = await self._checkout()
+        self._in_use += 1
+        self._metrics["checkouts"] += 1
+        broken = False
+        try:
+            yield pooled.session
+        except BaseException as e:
+            broken = isinstance(e, _BROKEN_SESSION_ERRORS)
+            raise
+        finally:
+            self._in_use -= 1
+            try:
+                if broken or not pooled.is_open or pooled not in self._sessions:
+                    if pooled in self._sessions:
+                        logger.warning(f"[MCPSessionPool] {self.server_name} 会话不可用，已丢弃")
+                    await self._discard(pooled)
+                else:
+                    self._idle.append(pooled)
+            finally:
+                self._slots.release()
+
+    async def ping(self, timeout: float = DEFAULT_PING_TIMEOUT) -> Optional[float]:
+        """
+        通过池中会话发送 MCP ping，返回往返耗时（毫秒）。
+        所有会话都在执行调用时返回 None，此时服务器显然可用，无需排队等待。
+        """
+        if self._slots.locked():
+            return None
+        started = time.perf_counter()
+        async with self.session() as session:
+            await asyncio.wait_for(session.send_ping(), timeout=timeout)
+        return (time.perf_counter() - started) * 1000
+
+    async def reset(self) -> None:
+        """关闭全部会话；池本身保持可用，后续借出时重新建立会话"""
+        sessions = list(self._sessions)
+        self._sessions.clear()
+        self._idle.clear()
+        if sessions:
+            await asyncio.gather(*(pooled.close() for pooled in sessions), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "open": len(self._sessions),
+            "idle": len(self._idle),
+            "in_use": self._in_use,
+            **self._metrics,
+        }
+
+
+class PooledSessionProxy:
+    """
+    传给 load_mcp_tools 的会话代理。
+    工具调用与工具列举都从会话池借出会话执行，使工具始终绑定在池化的持久会话上。
+    """
+
+    def __init__(self, pool: MCPSessionPool):
+        self._pool = pool
+
+    async def call_tool(self, *args, **kwargs):
+        async with self._pool.session() as session:
+            return await session.call_tool(*args, **kwargs)
+
+    async def list_tools(self, *args, **kwargs):
+        async with self._pool.session() as session:
+            return await session.list_tools(*args, **kwargs)
@@ -10,6 +10,7 @@ from typing import Tuple, Union
 from dataclasses import dataclass
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage, ToolCall  # 添加消息类型导入
 from langchain_openai import ChatOpenAI  # 添加OpenAI客户端导入
+from langgraph_agent.graph.http_session import get_http_session
 from langgraph_agent.graph.state import AgentState
 from typing import Optional, Any, Callable, List, Dict
 from langchain_core.tools import BaseTool
@@ -103,19 +104,21 @@ async def async_http_post(url: str, json_payload: str, headers: Dict[str, str],
     """
     timeout_config = aiohttp.ClientTimeout(total=timeout)
     
-    async with aiohttp.ClientSession(timeout=timeout_config) as session:
-        async with session.post(
-            url,
-            data=json_payload.encode('utf-8'),
-            headers=headers
-        ) as response:
-            response_text = await response.text()
-            
-            return {
-                'status_code': response.status,
-                'headers': dict(response.headers),
-                'text': response_text
-            }
+    # 使用共享会话复用连接，超时按请求设置
+    session = get_http_session("mcp_tool")
+    async with session.post(
+        url,
+        data=json_payload.encode('utf-8'),
+        headers=headers,
+        timeout=timeout_config
+    ) as response:
+        response_text = await response.text()
+        
+        return {
+            'status_code': response.status,
+            'headers': dict(response.headers),
+            'text': response_text
+        }
 
 
 def debug_json_error(data, context=""):
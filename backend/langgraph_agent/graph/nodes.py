@@ -3,7 +3,6 @@
 """
 
 import os
-from copy import deepcopy
 from typing import Dict, Any, Optional, List, Literal
 import traceback
 import json
@@ -40,7 +39,7 @@ from langgraph_agent.graph.state import AgentState
 from langgraph_agent.utils.tool_utils import normalize_mcp_tool_data, normalize_tool_result
 from langgraph_agent.utils.tool_utils import fix_markdown_display, process_raw_html_content
 from langgraph_agent.utils.json_utils import sanitize_string_for_json, deep_clean_for_json, safe_json_dumps, validate_tool_calls_json, repair_json_output
-from langgraph_agent.utils.message_utils import get_last_show_message_id
+from langgraph_agent.utils.message_utils import get_last_show_message_id, share_messages
 from langgraph_agent.graph.llm import get_llm_client, safe_llm_invoke, get_error_msg
 from langgraph_agent.constant import TEAM_MEMBERS, RESPONSE_FORMAT
 from langgraph_agent.graph.a2a_agent import get_a2a_agents_from_state
@@ -67,9 +66,13 @@ async def agent_node(
         config: RunnableConfig,
         llm: Optional[ChatOpenAI],
         prompt: str,
-        cur_node: str
+        cur_node: str,
+        llm_messages: Optional[List[BaseMessage]] = None,
 ) -> Dict:
-    """Agent 节点 - 修复JSON格式错误版本，增强工具使用示例"""
+    """Agent 节点 - 修复JSON格式错误版本，增强工具使用示例
+
+    llm_messages 为经过上下文压缩的历史，仅用于本次 LLM 调用；未提供时使用 state["messages"]。
+    """
     if llm is None:
         raise ValueError("LLM is not initialized for agent_node")
         
@@ -96,8 +99,8 @@ async def agent_node(
     print(f"用户最新查询（原始）: {user_query}")
     
 
-    # 使用deepcopy，不影响state.messages
-    llm_messages = deepcopy(state["messages"])
+    # 浅拷贝列表即可：消息对象视为不可变，append 不影响 state.messages
+    llm_messages = share_messages(llm_messages if llm_messages is not None else state["messages"])
     # print("llm_messages:{}".format(llm_messages))
 
     if state.get("sub_task"):
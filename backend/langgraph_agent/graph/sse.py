@@ -0,0 +1,141 @@
+"""
+增量 SSE（Server-Sent Events）解码器
+
+按 WHATWG 规范切分事件：支持 \n、\r\n、\r 换行，多行 data: 以换行拼接，忽略注释行；
+数据按到达的字节块增量解码，只保留未完成的一行与当前事件，不保留历史内容。
+"""
+import codecs
+import os
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional
+
+SSE_MAX_EVENT_BYTES = int(os.getenv("SSE_MAX_EVENT_BYTES", str(1024 * 1024)))
+
+
+class SSEDecodeError(ValueError):
+    """SSE 数据超出缓冲区上限"""
+
+
+@dataclass
+class SSEEvent:
+    """一个完整的 SSE 事件"""
+    event: str = "message"
+    data: str = ""
+    id: Optional[str] = None
+
+
+class SSEDecoder:
+    """
+    增量 SSE 解码器：feed() 接收任意切分的字节块，返回其中已完整的事件
+
+    lenient 为 True 时，兼容部分 A2A 服务不带 data: 前缀、直接逐行输出 JSON 的格式，
+    此类行立即作为一个独立事件返回。
+    """
+
+    def __init__(self, max_event_bytes: int = SSE_MAX_EVENT_BYTES, lenient: bool = True):
+        self.max_event_bytes = max_event_bytes
+        self.lenient = lenient
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._line = ""
+        # 上一个字节块以 \r 结尾时，下一个块开头的 \n 属于同一个换行
+        self._pending_cr = False
+        self._event_type = ""
+        self._event_id: Optional[str] = None
+        self._data: List[str] = []
+        self._size = 0
+        self.last_event_id: Optional[str] = None
+
+    def feed(self, chunk: bytes) -> List[SSEEvent]:
+        """解码一个字节块，返回其中已完整的事件"""
+        return self._feed_text(self._decoder.decode(chunk))
+
+    def flush(self) -> List[SSEEvent]:
+        """流结束：处理剩余数据（规范要求丢弃未以空行结束的事件，这里为兼容仍返回）"""
+        events = self._feed_text(self._decoder.decode(b"", final=True))
+        if self._line:
+            events.extend(self._process_line(self._line))
+            self._line = ""
+        event = self._dispatch()
+        if event is not None:
+            events.append(event)
+        return events
+
+    def _feed_text(self, text: str) -> List[SSEEvent]:
+        events: List[SSEEvent] = []
+        if not text:
+            return events
+        if self._pending_cr and text.startswith("\n"):
+            text = text[1:]
+        self._pending_cr = text.endswith("\r")
+
+        lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+        # 最后一段是未完成的行
+        lines[0] = self._line + lines[0]
+        self._line = lines.pop()
+        for line in lines:
+            events.extend(self._process_line(line))
+        if len(self._line) + self._size > self.max_event_bytes:
+            self._line = ""
+            self._reset()
+            raise SSEDecodeError(f"SSE 事件超过 {self.max_event_bytes} 字节")
+        return events
+
+    def _process_line(self, line: str) -> List[SSEEvent]:
+        if not line:
+            event = self._dispatch()
+            return [event] if event is not None else []
+        if line.startswith(":"):
+            return []
+
+        if self.lenient and line.lstrip().startswith("{"):
+            return [SSEEvent(data=line.strip())]
+
+        field, colon, value = line.partition(":")
+        if not colon:
+            value = ""
+        elif value.startswith(" "):
+            value = value[1:]
+
+        if field == "data":
+            self._data.append(value)
+            self._size += len(value) + 1
+            if self._size > self.max_event_bytes:
+                self._reset()
+                raise SSEDecodeError(f"SSE 事件超过 {self.max_event_bytes} 字节")
+        elif field == "event":
+            self._event_type = value
+        elif field == "id" and "\0" not in value:
+            self._event_id = value
+        return []
+
+    def _dispatch(self) -> Optional[SSEEvent]:
+        if self._event_id is not None:
+            self.last_event_id = self._event_id
+        if not self._data:
+            self._reset()
+            return None
+        event = SSEEvent(event=self._event_type or "message", data="\n".join(self._data),
+                         id=self.last_event_id)
+        self._reset()
+        return event
+
+    def _reset(self) -> None:
+        self._event_type = ""
+        self._event_id = None
+        self._data = []
+        self._size = 0
+
+
+async def iter_sse_events(stream, decoder: Optional[SSEDecoder] = None) -> AsyncIterator[SSEEvent]:
+    """
+    从 aiohttp 响应体（StreamReader）或任意字节块异步迭代器中逐个读取 SSE 事件
+
+    数据按到达的字节块处理，不等待整行或整个响应；调用方停止迭代时不再读取 socket。
+    """
+    decoder = decoder or SSEDecoder()
+    chunks = stream.iter_any() if hasattr(stream, "iter_any") else stream
+    async for chunk in chunks:
+        for event in decoder.feed(chunk):
+            yield event
+    for event in decoder.flush():
+        yield event
@@ -1,3 +1,5 @@
+import copy
+
 from langgraph.graph import add_messages
 from typing import TypedDict, List, Optional, Annotated, Dict, Any, Union, Literal
 from langchain_core.messages import BaseMessage, AnyMessage
@@ -51,6 +53,9 @@ class AgentState(CopilotKitState):
     session_id: str = ""    # 会话ID
     conversation_round: int = 0  # 对话轮数
     attachment_processed: bool = False  # 附件处理完成标志
+    setup_completed: bool = False  # 初始化是否已完成（从检查点恢复的会话可跳过部分初始化）
+    processed_files: List[str] = []  # 已处理过的附件，恢复会话时不重复转换
+    setup_timings: Dict[str, float] = {}  # 初始化各阶段耗时（毫秒）
     last_node: str = ""     # 在图运行过程中，记录上一个节点
 
     sub_task: str = ""  # 子任务
@@ -100,8 +105,42 @@ def create_initial_state(state: AgentState):
         session_id=state.get("session_id", "default_session"),
         conversation_round=state.get("conversation_round", 0),
         attachment_processed=state.get("attachment_processed", True),
+        setup_completed=state.get("setup_completed", False),
+        processed_files=state.get("processed_files", []),
         last_node=state.get("last_node", ""),
         files=state.get("files", []),
         log_index=state.get("log_index", -1),
         browser_use_steps=state.get("browser_use_steps", None)
     )
+
+
+# 仅在单轮对话内有效的字段：从检查点恢复会话时重置，避免上一轮的计划、日志与执行结果带入新一轮
+_TURN_SCOPED_DEFAULTS: Dict[str, Any] = {
+    "iteration_count": 0,
+    "logs": [],
+    "log_index": -1,
+    "workflow_plan": None,
+    "workflow_steps": [],
+    "current_step_index": 0,
+    "current_step_completed": False,
+    "execution_results": {},
+    "sub_task": "",
+    "supervisor_decision": {},
+    "supervisor_retry_count": 0,
+    "failed_a2a_agents": [],
+    "a2a_failure_count": 0,
+    "route_to_a2a": None,
+    "last_a2a_result": None,
+    "mcp_tool_executor_data": [],
+    "mcp_tool_execution_results": [],
+    "structure_tool_results": {},
+    "temporary_images": [],
+    "temporary_message_content_list": [],
+}
+
+
+def reset_turn_state(state: AgentState) -> AgentState:
+    """将单轮字段重置为初始值（原地修改并返回 state），用于恢复会话的新一轮对话"""
+    for key, default in _TURN_SCOPED_DEFAULTS.items():
+        state[key] = copy.deepcopy(default)
+    return state
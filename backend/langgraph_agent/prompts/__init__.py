@@ -11,6 +11,9 @@ from .loader import get_loader
 
 _loader = get_loader()
 
+# 预先解析并编译全部 YAML 模板，运行时直接读取内存缓存
+_loader.precompile()
+
 # 加载简单的 YAML prompt（这些 prompt 不需要动态生成）
 # 使用同步方法在模块初始化时加载，避免异步复杂性
 COORDINATOR_PROMPT = _loader.load_simple_prompt_sync('coordinator.yaml')
@@ -18,6 +21,7 @@ CODER_PROMPT = _loader.load_simple_prompt_sync('coder.yaml')
 RESEARCHER_PROMPT = _loader.load_simple_prompt_sync('researcher.yaml')
 REPORTER_PROMPT = _loader.load_simple_prompt_sync('reporter.yaml')
 BROWSER_PROMPT = _loader.load_simple_prompt_sync('browser.yaml')
+CONTEXT_SUMMARY_PROMPT = _loader.load_simple_prompt_sync('context_summary.yaml')
 
 
 # ============================================================
@@ -57,6 +61,7 @@ __all__ = [
     'RESEARCHER_PROMPT',
     'REPORTER_PROMPT',
     'BROWSER_PROMPT',
+    'CONTEXT_SUMMARY_PROMPT',
     
     # Supervisor Prompt Builder
     'generate_supervisor_prompt',
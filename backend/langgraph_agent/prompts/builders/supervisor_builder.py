@@ -2,13 +2,87 @@
 Supervisor Prompt 构建器
 
 负责动态生成 supervisor 的 prompt、Router 类和解析器
+
+supervisor 在一轮对话中会多次执行，而 A2A 智能体与 MCP 工具列表通常不变。
+渲染后的 prompt 与 Router 类按 (a2a_agents, mcp_tools) 的指纹做有界 LRU 缓存，
+重复迭代直接复用，system prompt 字节级稳定也便于模型服务端的 prompt 缓存命中。
 """
 
-from typing import List, Dict, Any, Literal
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import List, Dict, Any, Literal, Optional
 from pydantic import BaseModel, create_model
 from langchain.output_parsers import PydanticOutputParser
 from langgraph_agent.constant import TEAM_MEMBERS, TEAM_MEMBERS_INNER
 from langgraph_agent.prompts.builders.base import BasePromptBuilder
+from langgraph_agent.prompts.loader import get_loader
+
+SUPERVISOR_CACHE_SIZE = int(os.getenv("SUPERVISOR_CACHE_SIZE", "32"))
+
+
+class _LRUCache:
+    """按指纹缓存 supervisor prompt / Router 类的有界 LRU"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max(1, max_size)
+        self._data: "OrderedDict[str, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self._data.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+_prompt_cache = _LRUCache(SUPERVISOR_CACHE_SIZE)
+_router_cache = _LRUCache(SUPERVISOR_CACHE_SIZE)
+
+
+def supervisor_fingerprint(
+    a2a_agents: List[Dict[str, Any]] = None,
+    mcp_tools: List[Dict[str, Any]] = None
+) -> str:
+    """(a2a_agents, mcp_tools) 的稳定指纹，内容相同的列表得到相同指纹"""
+    payload = json.dumps([a2a_agents or [], mcp_tools or []], ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def get_supervisor_cache_stats() -> Dict[str, Dict[str, int]]:
+    """supervisor prompt / Router 缓存命中情况"""
+    return {"prompt": _prompt_cache.stats(), "router": _router_cache.stats()}
+
+
+def clear_supervisor_cache() -> None:
+    """清空缓存（模板变更时调用）"""
+    _prompt_cache.clear()
+    _router_cache.clear()
+
+
+def _on_template_reload(template_name: str) -> None:
+    if template_name == 'supervisor.yaml':
+        clear_supervisor_cache()
+
+
+get_loader().add_reload_listener(_on_template_reload)
 
 
 class SupervisorPromptBuilder(BasePromptBuilder):
@@ -155,10 +229,15 @@ async def generate_supervisor_prompt(
     向后兼容的函数接口 - 生成 supervisor prompt（异步版本）
     
     这个函数保持与原 supervisor.py 相同的签名，
-    确保 graph.py 中的调用代码无需修改
+    确保 graph.py 中的调用代码无需修改。结果按输入指纹缓存。
     """
-    builder = SupervisorPromptBuilder()
-    return await builder.generate_prompt(a2a_agents, mcp_tools)
+    key = supervisor_fingerprint(a2a_agents, mcp_tools)
+    prompt = _prompt_cache.get(key)
+    if prompt is None:
+        builder = SupervisorPromptBuilder()
+        prompt = await builder.generate_prompt(a2a_agents, mcp_tools)
+        _prompt_cache.put(key, prompt)
+    return prompt
 
 
 def create_dynamic_router(
@@ -166,10 +245,15 @@ def create_dynamic_router(
     mcp_tools: List[Dict[str, Any]] = None
 ) -> type:
     """
-    向后兼容的函数接口 - 创建动态 Router 类
+    向后兼容的函数接口 - 创建动态 Router 类（按输入指纹缓存，相同输入返回同一个类）
     """
-    builder = SupervisorPromptBuilder()
-    return builder.create_dynamic_router(a2a_agents, mcp_tools)
+    key = supervisor_fingerprint(a2a_agents, mcp_tools)
+    router = _router_cache.get(key)
+    if router is None:
+        builder = SupervisorPromptBuilder()
+        router = builder.create_dynamic_router(a2a_agents, mcp_tools)
+        _router_cache.put(key, router)
+    return router
 
 
 def create_dynamic_supervisor_parser(
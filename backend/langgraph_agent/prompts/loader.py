@@ -1,12 +1,37 @@
 """
 YAML Prompt 加载器和渲染引擎
+
+解析后的 YAML 与编译后的 Jinja2 模板缓存在内存中，按文件 mtime 失效；
+开启 PROMPT_HOT_RELOAD 时监听模板目录，变更后立即失效。
 """
+import asyncio
+import logging
 import os
+import time
 import yaml
 from jinja2 import Environment, FileSystemLoader, Template
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, List, Optional
 import aiofiles
 
+logger = logging.getLogger(__name__)
+
+PROMPT_MTIME_CHECK_INTERVAL = float(os.getenv("PROMPT_MTIME_CHECK_INTERVAL", "2"))
+PROMPT_HOT_RELOAD = os.getenv("PROMPT_HOT_RELOAD", "false").lower() in ("1", "true", "yes")
+
+
+class _CachedPrompt:
+    """单个 YAML 模板的缓存条目"""
+
+    __slots__ = ("mtime", "checked_at", "data", "template")
+
+    def __init__(self, mtime: float, data: Dict[str, Any]):
+        self.mtime = mtime
+        self.checked_at = time.monotonic()
+        self.data = data
+        # 与原先 Template(prompt) 的渲染行为保持一致（不使用 jinja_env 的 trim_blocks 等选项）
+        self.template: Optional[Template] = Template(data.get('prompt', '') or '')
+
+
 class PromptLoader:
     """YAML Prompt 加载器和渲染引擎"""
     
@@ -25,10 +50,124 @@ class PromptLoader:
             trim_blocks=True,      # 移除块标签后的第一个换行
             lstrip_blocks=True     # 移除块标签前的空格和制表符
         )
-    
+
+        # 模板名称 -> 缓存条目
+        self._cache: Dict[str, _CachedPrompt] = {}
+        # 模板重新加载时的回调（如清空依赖模板内容的上层缓存）
+        self._reload_listeners: List[Callable[[str], None]] = []
+        self._watch_task: Optional[asyncio.Task] = None
+
+    # ---------------- 缓存 ----------------
+
+    def _filepath(self, template_name: str) -> str:
+        return os.path.join(self.templates_dir, template_name)
+
+    def _read_sync(self, template_name: str) -> _CachedPrompt:
+        filepath = self._filepath(template_name)
+        mtime = os.stat(filepath).st_mtime
+        with open(filepath, 'r', encoding='utf-8') as f:
+            data = yaml.safe_load(f) or {}
+        return _CachedPrompt(mtime, data)
+
+    def _store(self, template_name: str, entry: _CachedPrompt) -> None:
+        reloaded = template_name in self._cache
+        self._cache[template_name] = entry
+        if reloaded:
+            logger.info(f"Prompt 模板已重新加载: {template_name}")
+            self._notify_reload(template_name)
+
+    def _mtime_due(self, entry: _CachedPrompt, now: float) -> bool:
+        """是否需要重新检查 mtime；启用文件监听时由监听任务负责失效"""
+        return self._watch_task is None and now - entry.checked_at >= PROMPT_MTIME_CHECK_INTERVAL
+
+    def _notify_reload(self, template_name: str) -> None:
+        for listener in list(self._reload_listeners):
+            try:
+                listener(template_name)
+            except Exception as e:
+                logger.warning(f"Prompt 模板重载回调失败: {e}")
+
+    def add_reload_listener(self, listener: Callable[[str], None]) -> None:
+        """注册模板重新加载（或失效）时的回调，参数为模板文件名"""
+        self._reload_listeners.append(listener)
+
+    def invalidate(self, template_name: Optional[str] = None) -> None:
+        """使指定模板（或全部模板）的缓存失效"""
+        names = [template_name] if template_name else list(self._cache)
+        for name in names:
+            if self._cache.pop(name, None) is not None:
+                self._notify_reload(name)
+
+    def precompile(self) -> int:
+        """预先加载并编译模板目录下的全部 YAML 模板，返回模板数量"""
+        count = 0
+        for filename in sorted(os.listdir(self.templates_dir)):
+            if not filename.endswith(('.yaml', '.yml')):
+                continue
+            try:
+                self._cache[filename] = self._read_sync(filename)
+                count += 1
+            except Exception as e:
+                logger.warning(f"预编译 Prompt 模板 {filename} 失败: {e}")
+        return count
+
+    async def _get_entry(self, template_name: str) -> _CachedPrompt:
+        """获取缓存条目；文件 mtime 变化时重新加载"""
+        self._ensure_watcher()
+        entry = self._cache.get(template_name)
+        if entry is not None:
+            now = time.monotonic()
+            if not self._mtime_due(entry, now):
+                return entry
+            try:
+                mtime = (await asyncio.to_thread(os.stat, self._filepath(template_name))).st_mtime
+            except FileNotFoundError:
+                self._cache.pop(template_name, None)
+                raise
+            entry.checked_at = now
+            if mtime == entry.mtime:
+                return entry
+
+        filepath = self._filepath(template_name)
+        async with aiofiles.open(filepath, 'r', encoding='utf-8') as f:
+            content = await f.read()
+        mtime = (await asyncio.to_thread(os.stat, filepath)).st_mtime
+        entry = _CachedPrompt(mtime, yaml.safe_load(content) or {})
+        self._store(template_name, entry)
+        return entry
+
+    # ---------------- 热重载 ----------------
+
+    def _ensure_watcher(self) -> None:
+        if not PROMPT_HOT_RELOAD or (self._watch_task is not None and not self._watch_task.done()):
+            return
+        try:
+            import watchfiles  # noqa: F401
+        except ImportError:
+            logger.warning("未安装 watchfiles，Prompt 模板热重载不可用，回退到 mtime 检查")
+            return
+        self._watch_task = asyncio.get_running_loop().create_task(self._watch_templates())
+
+    async def _watch_templates(self) -> None:
+        from watchfiles import awatch
+
+        logger.info(f"开始监听 Prompt 模板目录: {self.templates_dir}")
+        try:
+            async for changes in awatch(self.templates_dir):
+                for _, path in changes:
+                    self.invalidate(os.path.basename(path))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Prompt 模板目录监听失败，回退到 mtime 检查: {e}")
+        finally:
+            self._watch_task = None
+
+    # ---------------- 对外接口 ----------------
+
     async def load_yaml(self, template_name: str) -> Dict[str, Any]:
         """
-        异步加载 YAML 文件
+        异步加载 YAML 文件（读取缓存，文件变更后自动重新加载）
         
         Args:
             template_name: YAML 文件名（如 'supervisor.yaml'）
@@ -36,10 +175,8 @@ class PromptLoader:
         Returns:
             解析后的 YAML 数据（字典）
         """
-        filepath = os.path.join(self.templates_dir, template_name)
-        async with aiofiles.open(filepath, 'r', encoding='utf-8') as f:
-            content = await f.read()
-            return yaml.safe_load(content)
+        entry = await self._get_entry(template_name)
+        return entry.data
     
     async def render(self, template_name: str, context: Dict[str, Any] = None) -> str:
         """
@@ -52,19 +189,15 @@ class PromptLoader:
         Returns:
             渲染后的 prompt 字符串
         """
-        # 1. 异步加载 YAML 文件
-        data = await self.load_yaml(template_name)
-        
-        # 2. 提取 prompt 字段
-        prompt_template = data.get('prompt', '')
+        # 1. 从缓存获取解析后的 YAML 与编译后的模板
+        entry = await self._get_entry(template_name)
         
-        # 3. 如果提供了 context，使用 Jinja2 渲染
+        # 2. 如果提供了 context，使用预编译的 Jinja2 模板渲染
         if context:
-            template = Template(prompt_template)
-            return template.render(**context)
+            return entry.template.render(**context)
         
-        # 4. 没有 context，直接返回原始 prompt
-        return prompt_template
+        # 3. 没有 context，直接返回原始 prompt
+        return entry.data.get('prompt', '')
     
     async def load_simple_prompt(self, template_name: str) -> str:
         """
@@ -82,16 +215,30 @@ class PromptLoader:
         """
         同步加载简单 prompt（仅用于模块初始化，非异步环境）
         
+        与异步接口共用缓存与 mtime 检查，文件变更后同样会重新加载
+        
         Args:
             template_name: YAML 文件名
         
         Returns:
             prompt 字符串
         """
-        filepath = os.path.join(self.templates_dir, template_name)
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = yaml.safe_load(f)
-            return data.get('prompt', '')
+        entry = self._cache.get(template_name)
+        if entry is not None:
+            now = time.monotonic()
+            if self._mtime_due(entry, now):
+                try:
+                    mtime = os.stat(self._filepath(template_name)).st_mtime
+                except FileNotFoundError:
+                    self._cache.pop(template_name, None)
+                    raise
+                entry.checked_at = now
+                if mtime != entry.mtime:
+                    entry = None
+        if entry is None:
+            entry = self._read_sync(template_name)
+            self._store(template_name, entry)
+        return entry.data.get('prompt', '')
 
 # 全局加载器实例（单例模式）
 _loader = PromptLoader()
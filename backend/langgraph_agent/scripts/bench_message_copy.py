@@ -0,0 +1,103 @@
+"""
+消息拷贝基准：对比旧的 deepcopy 方式与共享消息对象方式在一次 supervisor 周期中的
+内存分配与耗时。
+
+一次 supervisor 周期近似为：
+  _compress_conversation_for_llm（取 inner_messages、回写 messages/inner_messages）
+  -> coordinator/supervisor 拼接 system 消息
+  -> safe_llm_invoke 构造 LLM 入参（含重试）
+  -> agent_node 复制 messages
+
+用法:
+  python langgraph_agent/scripts/bench_message_copy.py --turns 120 --attachment-chars 120000
+"""
+import argparse
+import copy
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable, List
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_PKG_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, "..", ".."))
+if PROJECT_PKG_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_PKG_ROOT)
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+from langgraph_agent.graph.llm import build_messages_for_llm
+from langgraph_agent.utils.message_utils import share_messages
+
+
+def build_history(turns: int, attachment_chars: int) -> List[BaseMessage]:
+    """构造带附件 markdown 的多轮对话"""
+    attachment = ("| 列A | 列B |\n|---|---|\n" + "| 数据 | 内容 |\n" * (attachment_chars // 16))[:attachment_chars]
+    messages: List[BaseMessage] = [
+        HumanMessage(content=f"请分析附件内容\n\n{attachment}", name="user")
+    ]
+    for i in range(turns):
+        messages.append(AIMessage(content=f"第 {i} 步分析结果 " * 20, name="researcher"))
+        messages.append(ToolMessage(content=f"工具输出 {i} " * 50, name="web_tool", tool_call_id=f"call_{i}"))
+        messages.append(HumanMessage(content=f"继续第 {i} 步", name="user"))
+    return messages
+
+
+def legacy_cycle(inner_messages: List[BaseMessage], model_name: str, attempts: int) -> None:
+    system_message = SystemMessage(content="supervisor prompt")
+    base = copy.deepcopy(inner_messages)
+    compressed = base
+    state_inner = copy.deepcopy(compressed)
+    state_messages = copy.deepcopy(compressed)
+    llm_input = [system_message] + copy.deepcopy(compressed)
+    for _ in range(attempts):
+        build_messages_for_llm(model_name, copy.deepcopy(llm_input))
+    agent_messages = copy.deepcopy(state_messages)
+    agent_messages.append(HumanMessage(content="子任务"))
+    del state_inner
+
+
+def shared_cycle(inner_messages: List[BaseMessage], model_name: str, attempts: int) -> None:
+    system_message = SystemMessage(content="supervisor prompt")
+    base = share_messages(inner_messages)
+    compressed = base
+    state_inner = share_messages(compressed)
+    state_messages = share_messages(compressed)
+    llm_input = [system_message] + compressed
+    for _ in range(attempts):
+        build_messages_for_llm(model_name, llm_input)
+    agent_messages = share_messages(state_messages)
+    agent_messages.append(HumanMessage(content="子任务"))
+    del state_inner
+
+
+def measure(name: str, fn: Callable[[], None], rounds: int) -> None:
+    fn()  # 预热
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    elapsed = (time.perf_counter() - start) / rounds
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<8} 每周期耗时: {elapsed * 1000:8.2f} ms    峰值分配: {peak / 1024 / 1024:8.2f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="supervisor 周期消息拷贝基准")
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--attachment-chars", type=int, default=120000)
+    parser.add_argument("--attempts", type=int, default=1, help="模拟 safe_llm_invoke 的重试次数")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--model", default="gpt-4o")
+    args = parser.parse_args()
+
+    history = build_history(args.turns, args.attachment_chars)
+    print(f"消息数: {len(history)}, 附件字符数: {args.attachment_chars}, 重试次数: {args.attempts}")
+
+    measure("legacy", lambda: legacy_cycle(history, args.model, args.attempts), args.rounds)
+    measure("shared", lambda: shared_cycle(history, args.model, args.attempts), args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""
+测试原生异步 A2AHttpClient2：共享实例、agent card 与端点缓存、SSE 流式读取、并发限制与取消
+"""
+import asyncio
+import json
+
+import pytest
+from aiohttp import web
+from python_a2a import Message, MessageRole, TextContent
+
+import langgraph_agent.graph.a2a_agent as a2a_agent
+from langgraph_agent.graph.a2a_agent import A2AApplicationError, get_a2a_http_client
+from langgraph_agent.graph.http_session import close_http_sessions
+
+
+class _FakeA2AServer:
+    """模拟 python_a2a 服务端的 agent card、tasks/send、tasks/cancel 与 /stream 接口"""
+
+    def __init__(self, streaming=False, delay=0.0, legacy=False):
+        self.streaming = streaming
+        self.delay = delay
+        # 旧版服务端没有 tasks/send，只接受直接发送的消息
+        self.legacy = legacy
+        self.calls = {"card": 0, "send": 0, "cancel": 0, "stream": 0, "message": 0}
+        self.cancelled_ids = []
+        self.stream_message_ids = []
+        self.active = 0
+        self.max_active = 0
+        self.runner = None
+        self.url = ""
+
+    async def card(self, request):
+        self.calls["card"] += 1
+        return web.json_response({"name": "Weather", "description": "Weather agent",
+                                  "capabilities": {"streaming": self.streaming}})
+
+    async def send(self, request):
+        self.calls["send"] += 1
+        body = await request.json()
+        text = body["params"]["message"]["content"]["text"]
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        if text == "fail":
+            return web.json_response({"error": {"message": "boom"}}, status=500)
+        if text == "rpc_error":
+            return web.json_response({"jsonrpc": "2.0", "id": 1, "error": {"code": -32000, "message": "bad input"}})
+        return web.json_response({"jsonrpc": "2.0", "id": 1, "result": {
+            "id": body["params"]["id"], "status": {"state": "completed"},
+            "artifacts": [{"parts": [{"type": "text", "text": f"sunny: {text}"}]}]}})
+
+    async def message(self, request):
+        self.calls["message"] += 1
+        body = await request.json()
+        return web.json_response({"content": {"type": "text", "text": f"sunny: {body['content']['text']}"},
+                                  "role": "agent"})
+
+    async def cancel(self, request):
+        self.calls["cancel"] += 1
+        self.cancelled_ids.append((await request.json())["params"]["id"])
+        return web.json_response({"jsonrpc": "2.0", "id": 1, "result": {}})
+
+    async def stream(self, request):
+        self.calls["stream"] += 1
+        self.stream_message_ids.append((await request.json())["message_id"])
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        await response.write(b": SSE stream established\n\n")
+        for chunk in ({"content": "sun"}, {"content": "ny"}):
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.active += 1
+            try:
+                await asyncio.sleep(self.delay)
+            finally:
+                self.active -= 1
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/.well-known/agent.json", self.card)
+        if self.legacy:
+            app.router.add_post("/", self.message)
+        else:
+            app.router.add_post("/tasks/send", self.send)
+        app.router.add_post("/tasks/cancel", self.cancel)
+        app.router.add_post("/stream", self.stream)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/"
+
+    async def stop(self):
+        await close_http_sessions()
+        await self.runner.cleanup()
+
+
+@pytest.fixture(autouse=True)
+def _clear_clients(monkeypatch):
+    monkeypatch.setattr(a2a_agent, "_a2a_clients", {})
+
+
+def _call(client, text="weather?"):
+    return client.call_a2a_agent("weather", "s1", [{"type": "text", "content": text}])
+
+
+def _run(server, scenario):
+    async def run():
+        await server.start()
+        try:
+            return await scenario(server.url)
+        finally:
+            await server.stop()
+
+    return asyncio.run(run())
+
+
+def test_card_and_endpoint_reused():
+    server = _FakeA2AServer()
+
+    async def scenario(url):
+        client = get_a2a_http_client(url)
+        assert get_a2a_http_client(url.rstrip("/")) is client
+        return client, [await _call(client) for _ in range(3)]
+
+    client, results = _run(server, scenario)
+    assert all(result.status and result.content == "sunny: weather?" for result in results)
+    # agent card 只拉取一次，每次调用只发送一次消息请求
+    assert server.calls["card"] == 1
+    assert server.calls["send"] == 3
+    assert client._endpoint[0] == "task"
+
+
+def test_error_invalidates_and_refresh_replaces_card():
+    server = _FakeA2AServer()
+
+    async def scenario(url):
+        client = get_a2a_http_client(url)
+        failed = await _call(client, "fail")
+        assert client._card is None
+        await _call(client)
+        endpoint = client._endpoint
+
+        # card 未变化时刷新不丢弃已确定的流式能力与端点
+        await client.refresh_card()
+        assert client._streaming is False and client._endpoint == endpoint
+
+        # card 变化时重新确定
+        server.streaming = True
+        card = await client.refresh_card()
+        assert card.capabilities["streaming"]
+        return client, failed
+
+    client, failed = _run(server, scenario)
+    assert not failed.status
+    # 出错后重新获取一次，目录刷新 card 时再获取两次
+    assert server.calls["card"] == 4
+    assert client._streaming is None and client._endpoint is None
+
+
+def test_application_errors_are_not_resent_to_other_endpoints():
+    server = _FakeA2AServer()
+
+    async def scenario(url):
+        client = get_a2a_http_client(url)
+        return [await _call(client, "fail"), await _call(client, "rpc_error")]
+
+    server_error, rpc_error = _run(server, scenario)
+    assert not server_error.status and "HTTP 500" in server_error.error_msg
+    assert not rpc_error.status and "bad input" in rpc_error.error_msg
+    # 请求已被服务端处理，不会再发到其他端点执行第二次
+    assert server.calls["send"] == 2
+    assert server.calls["message"] == 0
+
+
+def test_missing_endpoint_falls_back_to_legacy_message():
+    server = _FakeA2AServer(legacy=True)
+
+    async def scenario(url):
+        client = get_a2a_http_client(url)
+        return client, [await _call(client) for _ in range(2)]
+
+    client, results = _run(server, scenario)
+    assert all(result.status and result.content == "sunny: weather?" for result in results)
+    assert client._endpoint == ("message", client._base_url)
+    # 记住可用端点后第二次调用直接发往旧版消息端点
+    assert server.calls["message"] == 2
+
+
+def test_sse_stream_accumulates_chunks():
+    server = _FakeA2AServer(streaming=True)
+    received = []
+
+    async def on_chunk(chunk):
+        received.append(chunk)
+
+    async def scenario(url):
+        return await get_a2a_http_client(url).call_a2a_agent(
+            "weather", "s1", [{"type": "text", "content": "weather?"}], on_chunk=on_chunk)
+
+    result = _run(server, scenario)
+    assert result.status
+    assert result.content == "sunny"
+    assert received == ["sun", "ny"]
+    assert server.calls["stream"] == 1
+    assert server.calls["send"] == 0
+
+
+def test_concurrency_limited(monkeypatch):
+    monkeypatch.setenv("A2A_MAX_CONCURRENCY", "2")
+    server = _FakeA2AServer(delay=0.05)
+
+    async def scenario(url):
+        client = get_a2a_http_client(url)
+        return await asyncio.gather(*(_call(client, str(i)) for i in range(6)))
+
+    results = _run(server, scenario)
+    assert all(result.status for result in results)
+    assert server.max_active == 2
+
+
+def test_cancellation_propagates_to_remote_task():
+    server = _FakeA2AServer(delay=5)
+
+    async def scenario(url):
+        client = get_a2a_http_client(url)
+        task = asyncio.create_task(_call(client))
+        while server.active == 0:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # 等待后台的 tasks/cancel 请求完成
+        await asyncio.gather(*client._cancel_tasks)
+
+    _run(server, scenario)
+    assert server.calls["cancel"] == 1
+
+
+def test_stream_cancellation_propagates_to_remote_task():
+    server = _FakeA2AServer(streaming=True, delay=5)
+    received = []
+
+    async def on_chunk(chunk):
+        received.append(chunk)
+
+    async def scenario(url):
+        client = get_a2a_http_client(url)
+        task = asyncio.create_task(client.call_a2a_agent(
+            "weather", "s1", [{"type": "text", "content": "weather?"}], on_chunk=on_chunk))
+        while server.active == 0:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.gather(*client._cancel_tasks)
+
+    _run(server, scenario)
+    assert received == ["sun"]
+    # 以流式请求的 message_id 作为任务 id 取消
+    assert server.cancelled_ids == server.stream_message_ids
+
+
+def test_application_error_type():
+    server = _FakeA2AServer()
+
+    async def scenario(url):
+        client = get_a2a_http_client(url)
+        with pytest.raises(A2AApplicationError):
+            await client._send_task(f"{url.rstrip('/')}/tasks/send", Message(
+                content=TextContent(text="rpc_error"), role=MessageRole.USER), "s1")
+        return await _call(client, "rpc_error")
+
+    result = _run(server, scenario)
+    # 业务错误不是传输错误，不重试、不计入熔断
+    assert not result.status and not result.retryable
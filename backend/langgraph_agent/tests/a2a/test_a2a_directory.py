@@ -0,0 +1,140 @@
+"""
+测试 A2A 智能体目录：并发获取合并、TTL 与后台刷新、失败时沿用上次结果、按事件循环区分后台任务
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import langgraph_agent.graph.a2a_directory as a2a_directory
+from langgraph_agent.graph.a2a_directory import A2ADirectory
+
+CONFIG = {
+    "weather": {"enabled": True, "base_url": "http://weather/"},
+    "news": {"enabled": True, "base_url": "http://news"},
+    "offline": {"enabled": False, "base_url": "http://offline"},
+}
+
+
+class _FakeClient:
+    def __init__(self, server, base_url):
+        self.server = server
+        self.base_url = base_url
+
+    async def refresh_card(self):
+        self.server.calls.append(self.base_url)
+        await asyncio.sleep(0.01)
+        if self.base_url in self.server.failing:
+            raise ConnectionError("card unavailable")
+        name = self.base_url.rsplit("/", 1)[-1]
+        return SimpleNamespace(name=f"{name}-v{self.server.version}", description=f"{name} agent")
+
+
+class _FakeServer:
+    def __init__(self):
+        self.calls = []
+        self.failing = set()
+        self.version = 1
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = _FakeServer()
+    monkeypatch.setattr(a2a_directory, "get_a2a_http_client", lambda base_url: _FakeClient(server, base_url))
+    return server
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    # 只替换目录模块看到的时钟，事件循环仍使用真实的 time.monotonic
+    monkeypatch.setattr(a2a_directory, "time", SimpleNamespace(monotonic=lambda: now[0], perf_counter=time.perf_counter))
+    return now
+
+
+def _directory(monkeypatch):
+    monkeypatch.setenv("A2A_CARD_TTL", "300")
+    monkeypatch.setenv("A2A_CARD_FAILURE_TTL", "30")
+    monkeypatch.setenv("A2A_CARD_REFRESH_INTERVAL", "3600")
+    return A2ADirectory()
+
+
+def test_concurrent_requests_share_one_fetch(monkeypatch, server, clock):
+    directory = _directory(monkeypatch)
+
+    async def run():
+        results = await asyncio.gather(*(directory.get_agents(CONFIG) for _ in range(5)))
+        await directory.close()
+        return results
+
+    results = asyncio.run(run())
+    assert all(agents == results[0] for agents in results)
+    assert results[0] == [
+        {"name": "weather-v1", "agent_id": "weather", "desc": "weather agent", "base_url": "http://weather"},
+        {"name": "news-v1", "agent_id": "news", "desc": "news agent", "base_url": "http://news"},
+    ]
+    # 每个启用的智能体只获取一次，未启用的智能体不获取
+    assert sorted(server.calls) == ["http://news", "http://weather"]
+
+
+def test_stale_entries_served_and_refreshed_in_background(monkeypatch, server, clock):
+    directory = _directory(monkeypatch)
+
+    async def run():
+        await directory.start(CONFIG)
+        clock[0] += 301
+        server.version = 2
+        # 过期的条目直接返回，不在请求路径上等待获取
+        stale = await directory.get_agents(CONFIG)
+        await asyncio.sleep(0.05)
+        fresh = await directory.get_agents(CONFIG)
+        await directory.close()
+        return stale, fresh
+
+    stale, fresh = asyncio.run(run())
+    assert stale[0]["name"] == "weather-v1"
+    assert fresh[0]["name"] == "weather-v2"
+    assert len(server.calls) == 4
+
+
+def test_failed_fetch_keeps_previous_card(monkeypatch, server, clock):
+    directory = _directory(monkeypatch)
+
+    async def run():
+        await directory.start(CONFIG)
+        server.failing.add("http://news")
+        await directory.refresh(force=True)
+        agents = await directory.get_agents(CONFIG)
+        await directory.close()
+        return agents
+
+    agents = asyncio.run(run())
+    assert agents[1]["name"] == "news-v1"
+    stats = directory.stats()["news"]
+    assert not stats["available"] and stats["last_error"] == "card unavailable"
+    assert stats["fetch_count"] == 2
+
+
+def test_background_tasks_are_per_event_loop(monkeypatch, server, clock):
+    directory = _directory(monkeypatch)
+
+    async def start():
+        await directory.start(CONFIG)
+        return directory._tasks().refresh_task
+
+    first_task = asyncio.run(start())
+    # 前一个事件循环已关闭，新事件循环中重新获取与启动后台刷新，不复用旧循环的任务
+    clock[0] += 301
+
+    async def get_and_close():
+        agents = await directory.get_agents(CONFIG)
+        refresh_task = directory._tasks().refresh_task
+        assert refresh_task is not first_task and not refresh_task.done()
+        await directory.close()
+        return agents, refresh_task
+
+    agents, second_task = asyncio.run(get_and_close())
+    assert [agent["agent_id"] for agent in agents] == ["weather", "news"]
+    assert second_task.cancelled()
+    assert len(directory._loop_tasks) == 0
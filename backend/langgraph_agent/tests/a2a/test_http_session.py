@@ -0,0 +1,110 @@
+"""
+测试共享 aiohttp 会话注册表的会话复用、连接复用统计与关闭
+"""
+import asyncio
+import gc
+import warnings
+
+from aiohttp import web
+
+from langgraph_agent.graph.http_session import HTTPSessionRegistry
+
+
+async def _start_server():
+    async def handle(request):
+        return web.json_response({"ok": True})
+
+    app = web.Application()
+    app.router.add_post("/", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/"
+
+
+def test_session_reused_and_connections_kept_alive():
+    async def run():
+        registry = HTTPSessionRegistry()
+        runner, url = await _start_server()
+        try:
+            session = registry.get("a2a")
+            assert registry.get("a2a") is session
+            assert registry.get("mcp_tool") is not session
+
+            for _ in range(3):
+                async with session.post(url, json={}) as response:
+                    assert response.status == 200
+                    await response.read()
+            metrics = registry.metrics()
+        finally:
+            await registry.aclose()
+            await runner.cleanup()
+        return registry, session, metrics
+
+    registry, session, metrics = asyncio.run(run())
+    host = metrics["hosts"]["127.0.0.1"]
+    assert host["requests"] == 3
+    # 只建立一次连接，后续请求复用 keep-alive 连接
+    assert host["new_connections"] == 1
+    assert host["reused_connections"] == 2
+    assert session.closed
+    assert registry.metrics()["closed"] == 2
+
+
+def test_new_event_loop_gets_new_session():
+    registry = HTTPSessionRegistry()
+
+    async def get():
+        return registry.get("a2a")
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        first = asyncio.run(get())
+        second = asyncio.run(get())
+        assert first is not second
+        # 已关闭事件循环中的会话在丢弃时同步关闭
+        assert first.closed
+        del first
+        gc.collect()
+    assert not [w for w in caught if "Unclosed" in str(w.message)]
+    metrics = registry.metrics()
+    assert metrics["created"] == 2 and metrics["closed"] == 1
+
+    # 关闭时同样同步关闭已关闭事件循环中的会话，不在当前事件循环中 await
+    async def close():
+        await registry.aclose()
+
+    asyncio.run(close())
+    assert second.closed
+    assert registry.metrics()["closed"] == 2
+
+
+def test_aclose_keeps_other_loop_sessions():
+    registry = HTTPSessionRegistry()
+
+    async def get():
+        return registry.get("a2a")
+
+    # 保持另一个事件循环存活，模拟其他线程仍在使用
+    other_loop = asyncio.new_event_loop()
+    try:
+        other = other_loop.run_until_complete(get())
+
+        async def get_and_close():
+            session = registry.get("a2a")
+            assert len(registry.metrics()["sessions"]) == 2
+            await registry.aclose()
+            return session
+
+        current = asyncio.run(get_and_close())
+        assert current.closed
+        assert not other.closed
+        # 其他事件循环的会话仍在注册表中，可继续复用并在其事件循环中关闭
+        assert other_loop.run_until_complete(get()) is other
+        other_loop.run_until_complete(registry.aclose())
+        assert other.closed
+        assert registry.metrics()["closed"] == 2
+    finally:
+        other_loop.close()
@@ -0,0 +1,107 @@
+"""
+测试增量 SSE 解码器的事件切分、缓冲区上限，以及 A2AHttpClient 的流式内容实时转发
+"""
+import asyncio
+import json
+
+import pytest
+from aiohttp import web
+
+import langgraph_agent.graph.a2a_agent as a2a_agent
+from langgraph_agent.graph.a2a_agent import A2AHttpClient
+from langgraph_agent.graph.http_session import close_http_sessions
+from langgraph_agent.graph.sse import SSEDecodeError, SSEDecoder
+
+
+def _decode(chunks, **kwargs):
+    decoder = SSEDecoder(**kwargs)
+    events = []
+    for chunk in chunks:
+        events.extend(decoder.feed(chunk))
+    return events + decoder.flush()
+
+
+def test_events_split_across_chunks():
+    payload = "event: update\r\nid: 7\r\ndata: 第一行\r\ndata: second\r\n\r\n: comment\n\ndata:{\"a\": 1}\n\n".encode()
+    # 按单字节切分，覆盖 \r\n 与多字节字符跨块的情况
+    events = _decode([payload[i:i + 1] for i in range(len(payload))])
+
+    assert [(e.event, e.data, e.id) for e in events] == [
+        ("update", "第一行\nsecond", "7"),
+        ("message", '{"a": 1}', "7"),
+    ]
+
+
+def test_bare_json_lines_and_unterminated_event():
+    events = _decode([b'{"content": "hi"}\n', b"data: tail"])
+    assert [e.data for e in events] == ['{"content": "hi"}', "tail"]
+
+    assert _decode([b'{"content": "hi"}\n'], lenient=False) == []
+
+
+def test_event_size_bounded():
+    decoder = SSEDecoder(max_event_bytes=16)
+    with pytest.raises(SSEDecodeError):
+        decoder.feed(b"data: " + b"x" * 32)
+    # 超限后解码器状态已重置，可以继续处理后续事件
+    assert [e.data for e in decoder.feed(b"\ndata: ok\n\n")] == ["ok"]
+
+
+def test_a2a_http_client_forwards_chunks():
+    chunks = [{"content": "sun"}, {"content": "ny"}, {"type": "text", "content": "", "final": True, "taskId": "t1"}]
+
+    async def handle(request):
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for chunk in chunks:
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        return response
+
+    async def run():
+        app = web.Application()
+        app.router.add_post("/mae/api/v1.0/rest/a2aChat", handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+        received = []
+
+        async def on_chunk(chunk):
+            received.append(chunk)
+
+        try:
+            result = await A2AHttpClient(url).call_a2a_agent(
+                "weather", "s1", [{"type": "text", "content": "weather?"}], on_chunk=on_chunk)
+        finally:
+            await close_http_sessions()
+            await runner.cleanup()
+        return result, received
+
+    result, received = asyncio.run(run())
+    assert received == ["sun", "ny"]
+    assert result.status and result.content == "sunny"
+    assert result.task_id == "t1"
+
+
+def test_forwarder_throttles_and_reuses_message_id(monkeypatch):
+    emitted = []
+
+    async def fake_dispatch(name, data, config=None):
+        emitted.append(data)
+
+    monkeypatch.setattr(a2a_agent, "adispatch_custom_event", fake_dispatch)
+    monkeypatch.setenv("A2A_STREAM_FORWARD_INTERVAL", "60")
+    forwarder = a2a_agent._A2AStreamForwarder("Weather", "m1", config={})
+
+    async def run():
+        for chunk in ("sun", "ny", "!"):
+            await forwarder(chunk)
+        forwarder.reset()
+        await forwarder("rain")
+
+    asyncio.run(run())
+    # 间隔内只转发第一段；重试后重新累积并立即转发
+    assert [item["message"].endswith(text) for item, text in zip(emitted, ("sun", "rain"))] == [True, True]
+    assert len(emitted) == 2
+    assert {item["message_id"] for item in emitted} == {"m1"}
@@ -0,0 +1,119 @@
+"""
+测试 /chat 流式模式：astream_events 事件到 SSE 事件的转换，以及 logs 的增量推送
+"""
+import json
+
+from langchain_core.messages import AIMessageChunk, ToolMessage
+from langgraph.types import Command
+
+import api
+from api import _convert_stream_event, _LogsTracker, _sse
+
+
+def _parse(item):
+    """解析 _sse 生成的文本，返回 (event, data)"""
+    event_line, data_line = item.strip().split("\n")
+    assert event_line.startswith("event: ") and data_line.startswith("data: ")
+    return event_line[len("event: "):], json.loads(data_line[len("data: "):])
+
+
+def _convert(event, tracker=None):
+    return [_parse(item) for item in _convert_stream_event(event, tracker or _LogsTracker())]
+
+
+def test_sse_format():
+    assert _sse("token", {"content": "你好"}) == 'event: token\ndata: {"content": "你好"}\n\n'
+
+
+def test_token_events():
+    event = {
+        "event": "on_chat_model_stream",
+        "data": {"chunk": AIMessageChunk(content=[{"type": "text", "text": "你"}, "好"])},
+        "metadata": {"langgraph_node": "researcher"},
+    }
+    assert _convert(event) == [("token", {"node": "researcher", "content": "你好"})]
+    # 空增量（如只有工具调用的 chunk）不推送
+    event["data"]["chunk"] = AIMessageChunk(content="")
+    assert _convert(event) == []
+
+
+def test_node_events_only_for_graph_nodes():
+    assert "supervisor" in api._GRAPH_NODE_NAMES
+    start = {"event": "on_chain_start", "name": "supervisor", "metadata": {"langgraph_node": "supervisor"}}
+    assert _convert(start) == [("node", {"node": "supervisor", "status": "start"})]
+    # 节点内部的子链与非业务节点不产生节点事件
+    assert _convert({**start, "name": "RunnableSequence"}) == []
+    assert _convert({**start, "metadata": {"langgraph_node": "coordinator"}}) == []
+
+    end = {
+        "event": "on_chain_end",
+        "name": "supervisor",
+        "metadata": {"langgraph_node": "supervisor"},
+        "data": {"output": Command(update={"logs": [{"message": "规划中", "done": True}]})},
+    }
+    assert _convert(end) == [
+        ("node", {"node": "supervisor", "status": "end"}),
+        ("log", {"index": 0, "entry": {"message": "规划中", "done": True}}),
+    ]
+
+
+def test_tool_events():
+    start = {
+        "event": "on_tool_start",
+        "name": "web_search",
+        "run_id": "r1",
+        "metadata": {"langgraph_node": "mcp_tool_executor"},
+        "data": {"input": {"query": "金价", "state": {"messages": []}, "special_config_param": {}}},
+    }
+    assert _convert(start) == [("tool", {
+        "node": "mcp_tool_executor", "name": "web_search", "status": "start", "run_id": "r1",
+        "args": {"query": "金价"},
+    })]
+
+    end = {**start, "event": "on_tool_end",
+           "data": {"output": ({}, ToolMessage(content="x" * 5000, tool_call_id="c1"))}}
+    [(kind, payload)] = _convert(end)
+    assert kind == "tool" and payload["status"] == "end"
+    assert payload["output"] == "x" * api.STREAM_TOOL_OUTPUT_MAX_CHARS + "...(truncated)"
+
+    error = {**start, "event": "on_tool_error", "data": {"error": TimeoutError("超时")}}
+    assert _convert(error) == [("tool", {
+        "node": "mcp_tool_executor", "name": "web_search", "status": "error", "run_id": "r1", "error": "超时",
+    })]
+
+
+def test_custom_events():
+    metadata = {"langgraph_node": "coordinator"}
+    message = {"event": "on_custom_event", "name": "copilotkit_manually_emit_message",
+               "metadata": metadata, "data": {"message_id": "m1", "message": "你好"}}
+    assert _convert(message) == [("message", {"node": "coordinator", "message_id": "m1", "message": "你好"})]
+
+    tool_call = {**message, "name": "copilotkit_manually_emit_tool_call", "data": {"name": "search"}}
+    assert _convert(tool_call) == [("tool_call", {"node": "coordinator", "name": "search"})]
+
+    assert _convert({**message, "name": "unknown_event"}) == []
+
+
+def test_logs_are_forwarded_incrementally():
+    tracker = _LogsTracker()
+
+    def emit(logs):
+        event = {"event": "on_custom_event", "name": "copilotkit_manually_emit_intermediate_state",
+                 "metadata": {}, "data": {"logs": logs}}
+        return [payload for _, payload in _convert(event, tracker)]
+
+    first = {"message": "搜索中", "done": False}
+    assert emit([first]) == [{"index": 0, "entry": first}]
+    # 未变化的条目不重复推送
+    assert emit([first]) == []
+
+    done = {"message": "搜索中", "done": True}
+    second = {"message": "生成报告", "done": False}
+    assert emit([done, second]) == [{"index": 0, "entry": done}, {"index": 1, "entry": second}]
+    assert emit([done, second]) == []
+
+    # 节点返回的 dict 输出同样提取 logs
+    third = {"message": "完成", "done": True}
+    end = {"event": "on_chain_end", "name": "reporter", "metadata": {"langgraph_node": "reporter"},
+           "data": {"output": {"logs": [done, second, third]}}}
+    assert _convert(end, tracker)[1:] == [("log", {"index": 2, "entry": third})]
@@ -0,0 +1,160 @@
+"""
+测试 ContextManager 的增量 token 计数缓存
+"""
+import asyncio
+
+import langgraph_agent.graph.graph as graph_module
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from langgraph_agent.graph.graph import AgentGraph, ContextManager
+
+
+def _fake_counter(calls):
+    def counter(model=None, messages=None, text=None):
+        calls.append(len(messages or []))
+        # 每条消息 3 个固定开销 + 内容字符数，整段再加 3 个 reply priming
+        return sum(3 + len(str(m.get("content", ""))) for m in messages or []) + 3
+    return counter
+
+
+def test_only_new_messages_are_tokenized(monkeypatch):
+    calls = []
+    monkeypatch.setattr(graph_module, "token_counter", _fake_counter(calls))
+    manager = ContextManager()
+
+    history = [{"role": "user", "content": "你好", "message_id": "m1"},
+               {"role": "assistant", "content": "请问需要什么帮助", "message_id": "m2"}]
+    first = asyncio.run(manager.count_tokens("gpt-4o", history, thread_id="s1"))
+    assert first == (3 + 2) + (3 + 8) + 3
+
+    calls.clear()
+    history.append({"role": "user", "content": "写一份报告", "message_id": "m3"})
+    second = asyncio.run(manager.count_tokens("gpt-4o", history, thread_id="s1"))
+    assert second == first + 3 + 5
+    # 只对新增的一条消息调用 token_counter
+    assert calls == [1]
+
+    stats = manager.get_session_stats("s1")
+    assert stats["calls"] == 2
+    assert stats["tokenized_messages"] == 3
+    assert stats["cached_messages"] == 2
+    assert stats["total_tokens"] == second
+
+
+def test_changed_content_is_recounted(monkeypatch):
+    calls = []
+    monkeypatch.setattr(graph_module, "token_counter", _fake_counter(calls))
+    manager = ContextManager()
+
+    asyncio.run(manager.count_tokens("gpt-4o", [{"role": "user", "content": "a", "message_id": "m1"}]))
+    calls.clear()
+    total = asyncio.run(manager.count_tokens("gpt-4o", [{"role": "user", "content": "abc", "message_id": "m1"}]))
+    assert total == 3 + 3 + 3
+    assert calls == [1]
+
+
+def test_compression_truncates_tools_and_summarizes(monkeypatch):
+    monkeypatch.setattr(graph_module, "token_counter", _fake_counter([]))
+    summarizer_calls = []
+
+    async def summarizer(model, segment, previous):
+        summarizer_calls.append((len(segment), previous))
+        return "摘要"
+
+    manager = ContextManager(summarizer=summarizer)
+    manager.tool_result_max_chars = 50
+
+    # 每轮一次并行调用两个工具，末尾追加用户消息，使默认切分点落在 ToolMessage 上
+    messages = [{"role": "user", "content": "原始任务"}]
+    for i in range(4):
+        messages.append({"role": "assistant", "content": f"调用工具{i}",
+                         "tool_calls": [{"id": f"c{i}a"}, {"id": f"c{i}b"}]})
+        messages.append({"role": "tool", "content": "x" * 500, "tool_call_id": f"c{i}a"})
+        messages.append({"role": "tool", "content": "y" * 500, "tool_call_id": f"c{i}b"})
+    messages.append({"role": "user", "content": "继续"})
+    naive_cut = len(messages) - manager.min_keep_messages
+    assert messages[naive_cut]["role"] == "tool"
+
+    result = asyncio.run(manager.compress_messages(messages, "gpt-4o", max_tokens=300, thread_id="s1"))
+
+    # 首条原始任务保留，其后为摘要
+    assert result[0] == messages[0]
+    assert result[1]["name"] == "context_compression"
+    assert "摘要" in result[1]["content"]
+    # 切分点回退到发起调用的 assistant 消息，tool_calls 与两条结果成对保留
+    assert result[2] is messages[naive_cut - 1]
+    assert [m.get("tool_call_id") for m in result[3:5]] == ["c2a", "c2b"]
+    assert all(m.get("tool_call_id") != "c2a" for m in result[5:])
+    assert summarizer_calls[0][0] == naive_cut - 2
+    # 原消息未被修改
+    assert len(messages[2]["content"]) == 500
+    assert len(summarizer_calls) == 1
+
+    # 相同片段再次压缩时命中摘要缓存
+    asyncio.run(manager.compress_messages(messages, "gpt-4o", max_tokens=300, thread_id="s1"))
+    assert len(summarizer_calls) == 1
+
+
+def test_compression_does_not_rewrite_state(monkeypatch):
+    monkeypatch.setattr(graph_module, "token_counter", _fake_counter([]))
+    monkeypatch.setenv("CONTEXT_TOKEN_BUDGETS", '{"default": 300}')
+
+    async def summarizer(model, segment, previous):
+        return "摘要"
+
+    agent_graph = AgentGraph.__new__(AgentGraph)
+    agent_graph.context_manager = ContextManager(summarizer=summarizer)
+    agent_graph.context_manager.tool_result_max_chars = 50
+
+    history = [HumanMessage(content="原始任务", id="h0")]
+    for i in range(4):
+        history.append(AIMessage(content=f"调用工具{i}", id=f"a{i}",
+                                 tool_calls=[{"id": f"c{i}", "name": "search", "args": {}}]))
+        history.append(ToolMessage(content="x" * 500, tool_call_id=f"c{i}", id=f"t{i}"))
+    state = {"session_id": "s2", "messages": list(history), "inner_messages": list(history)}
+
+    compressed, stats = asyncio.run(agent_graph._compress_conversation_for_llm(state, "gpt-4o"))
+
+    assert stats["compressed_tokens"] < stats["original_tokens"]
+    assert any(getattr(m, "name", None) == "context_compression" for m in compressed)
+    # 压缩结果只用于 LLM 调用，state 中的历史保持原样
+    assert state["messages"] == history
+    assert state["inner_messages"] == history
+    assert "context_compression" not in state
+    assert all(m.content == "x" * 500 for m in state["inner_messages"] if isinstance(m, ToolMessage))
+
+
+def test_token_budget_matches_model_substring(monkeypatch):
+    monkeypatch.setenv("CONTEXT_TOKEN_BUDGETS", '{"Qwen3": 28000, "Qwen3-235B": 20000, "default": 50000}')
+    manager = ContextManager()
+    assert manager.get_token_budget("Qwen/Qwen3-235B-A22B") == 20000
+    assert manager.get_token_budget("Qwen/Qwen3-32B") == 28000
+    assert manager.get_token_budget("deepseek-ai/DeepSeek-V3") == 50000
+    # 未配置的模型且没有 default 时使用构造参数中的预算
+    monkeypatch.setenv("CONTEXT_TOKEN_BUDGETS", '{"Qwen3": 28000}')
+    assert ContextManager(token_threshold=12000).get_token_budget("deepseek-ai/DeepSeek-V3") == 12000
+    assert ContextManager().get_token_budget("deepseek-ai/DeepSeek-V3") == ContextManager.DEFAULT_TOKEN_BUDGET
+
+
+def test_summary_cache_keyed_by_sha256_of_segment():
+    calls = []
+
+    async def summarizer(model, segment, previous):
+        calls.append(segment)
+        return f"摘要{len(calls)}"
+
+    manager = ContextManager(summarizer=summarizer)
+    segment = [{"role": "user", "content": "任务"}, {"role": "assistant", "content": "回答"}]
+
+    first = asyncio.run(manager._summarize_segment("gpt-4o", segment, None))
+    # 内容相同的新消息对象命中缓存
+    assert asyncio.run(manager._summarize_segment("gpt-4o", [dict(m) for m in segment], None)) == first
+    assert len(calls) == 1
+    [key] = manager._summary_cache
+    assert len(key) == 64 and int(key, 16) >= 0
+
+    # 内容或模型不同时重新生成
+    changed = [segment[0], {"role": "assistant", "content": "另一个回答"}]
+    assert asyncio.run(manager._summarize_segment("gpt-4o", changed, None)) != first
+    asyncio.run(manager._summarize_segment("qwen", segment, None))
+    assert len(calls) == 3
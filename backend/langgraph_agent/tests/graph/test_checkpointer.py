@@ -0,0 +1,80 @@
+"""
+测试 BoundedMemorySaver 的会话数上限与空闲过期，以及恢复会话时单轮字段的重置
+"""
+from langgraph.checkpoint.base import empty_checkpoint
+
+import langgraph_agent.graph.checkpointer as checkpointer_module
+from langgraph_agent.graph.checkpointer import BoundedMemorySaver
+from langgraph_agent.graph.state import create_initial_state, reset_turn_state
+
+
+def _config(thread_id):
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+
+
+def _put(saver, thread_id):
+    saver.put(_config(thread_id), empty_checkpoint(), {}, {})
+
+
+def test_least_recently_used_thread_is_evicted():
+    saver = BoundedMemorySaver(max_threads=2, ttl=0)
+    _put(saver, "s1")
+    _put(saver, "s2")
+    # 读取 s1 使其成为最近访问的会话
+    assert saver.get_tuple(_config("s1")) is not None
+    _put(saver, "s3")
+
+    assert saver.get_tuple(_config("s2")) is None
+    assert saver.get_tuple(_config("s1")) is not None
+    assert saver.get_tuple(_config("s3")) is not None
+    assert saver.stats()["evicted_threads"] == 1
+
+
+def test_idle_threads_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(checkpointer_module.time, "monotonic", lambda: now[0])
+    saver = BoundedMemorySaver(max_threads=10, ttl=60)
+    _put(saver, "old")
+    now[0] += 61
+    _put(saver, "new")
+
+    assert "old" not in saver.storage
+    assert saver.stats() == {"threads": 1, "evicted_threads": 1}
+
+
+def test_resumed_state_resets_turn_scoped_fields():
+    saved = {
+        "messages": [],
+        "session_id": "s1",
+        "setup_completed": True,
+        "processed_files": ["a.pdf"],
+        "e2b_sandbox_id": "sbx-1",
+        "workflow_plan": {"steps": [{"agent": "researcher"}]},
+        "current_step_index": 2,
+        "logs": [{"message": "上一轮", "done": True}],
+        "execution_results": {"step_0": "done"},
+        "failed_a2a_agents": ["agent-x"],
+        "mcp_tool_execution_results": [{"tool": "search"}],
+        "supervisor_decision": {"next": "FINISH"},
+        "structure_tool_results": {"search": []},
+        "temporary_images": ["img.png"],
+    }
+    state = reset_turn_state(create_initial_state(saved))
+
+    assert state["workflow_plan"] is None
+    assert state["current_step_index"] == 0
+    assert state["logs"] == []
+    assert state["execution_results"] == {}
+    assert state["failed_a2a_agents"] == []
+    # 不在 create_initial_state 中的字段也必须显式写回，否则检查点中的旧值会保留
+    assert state["mcp_tool_execution_results"] == []
+    assert state["supervisor_decision"] == {}
+    assert state["structure_tool_results"] == {}
+    assert state["temporary_images"] == []
+    # 跨轮次的会话资源保持不变
+    assert state["e2b_sandbox_id"] == "sbx-1"
+    assert state["processed_files"] == ["a.pdf"]
+    assert state["session_id"] == "s1"
+    # 默认值不在多次重置之间共享
+    state["logs"].append({"message": "新一轮"})
+    assert reset_turn_state({})["logs"] == []
@@ -0,0 +1,186 @@
+"""
+测试 A2A 熔断器的状态切换、重试预算，以及 a2a_agent_node 在熔断时跳过调用
+"""
+import asyncio
+
+import aiohttp
+
+import langgraph_agent.graph.a2a_agent as a2a_agent
+from langgraph_agent.graph.a2a_agent import A2AAgentInfo, A2AExecutionResult, a2a_agent_node
+from langgraph_agent.graph.circuit_breaker import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitBreakerRegistry, RetryBudget,
+)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _breaker(clock, **kwargs):
+    options = dict(window=60, min_calls=4, failure_rate=0.5, open_seconds=30, max_open_seconds=100,
+                   half_open_probes=1)
+    options.update(kwargs)
+    return CircuitBreaker("weather", clock=clock, **options)
+
+
+def test_opens_on_failure_rate_and_recovers_through_half_open():
+    clock = _Clock()
+    breaker = _breaker(clock)
+    breaker.record_success()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    # 窗口内 4 次调用，失败率 50%
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert not breaker.available()
+
+    clock.now += 30
+    assert breaker.available()
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # 半开状态只放行一个探测调用
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.stats()["opened"] == 1
+
+
+def test_failed_probe_reopens_with_longer_cooldown():
+    clock = _Clock()
+    breaker = _breaker(clock, min_calls=1)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    clock.now += 30
+    assert not breaker.available()
+    clock.now += 30
+    assert breaker.available()
+
+    # 取消的探测调用归还名额
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_old_results_leave_window():
+    clock = _Clock()
+    breaker = _breaker(clock)
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 61
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_retry_budget_limits_retries(monkeypatch):
+    clock = _Clock()
+    budget = RetryBudget(window=60, ratio=0.2, min_retries=1, base_delay=1, max_delay=4, clock=clock)
+    for _ in range(10):
+        budget.record_call()
+    # 10 次调用 × 0.2 + 1 次保底
+    assert [budget.try_acquire() for _ in range(4)] == [True, True, True, False]
+    clock.now += 61
+    assert budget.try_acquire()
+
+    monkeypatch.setattr("random.uniform", lambda low, high: high)
+    assert [budget.backoff(attempt) for attempt in range(4)] == [1, 2, 4, 4]
+
+
+def test_registry_treats_unknown_agents_as_available():
+    registry = CircuitBreakerRegistry()
+    assert registry.available("unknown")
+    assert registry.available(None)
+    assert registry.breaker("weather") is registry.breaker("weather")
+
+
+class _FailingClient:
+    def __init__(self, error_msg="请求异常: Cannot connect to host", retryable=True):
+        self.calls = 0
+        self.error_msg = error_msg
+        self.retryable = retryable
+
+    async def call_a2a_agent(self, agent_id, session_id, messages, user_id="", on_chunk=None):
+        self.calls += 1
+        return A2AExecutionResult(type="error", content="", final=True, status=False,
+                                  session_id=session_id, error_msg=self.error_msg, retryable=self.retryable)
+
+
+def _state():
+    return {"messages": [], "inner_messages": [], "logs": [], "a2a_sessions": {}, "sub_task": "查天气"}
+
+
+def test_node_stops_calling_dead_agent_across_sessions(monkeypatch):
+    monkeypatch.setenv("A2A_MAX_RETRIES", "3")
+    monkeypatch.setenv("A2A_RETRY_BASE_DELAY", "0")
+    monkeypatch.setenv("A2A_BREAKER_MIN_CALLS", "3")
+    client = _FailingClient()
+    monkeypatch.setattr(a2a_agent, "a2a_breakers", CircuitBreakerRegistry())
+    monkeypatch.setattr(a2a_agent, "get_a2a_http_client", lambda base_url: client)
+    agent = A2AAgentInfo(agent_id="weather", name="Weather", description="", base_url="http://a2a.local")
+
+    async def run():
+        first = await a2a_agent_node(_state(), {}, agent)
+        second = await a2a_agent_node(_state(), {}, agent)
+        return first, second
+
+    first, second = asyncio.run(run())
+    # 第一个会话重试 3 次后熔断打开，第二个会话不再发起调用
+    assert client.calls == 3
+    assert a2a_agent.a2a_breakers.breaker("weather").state == OPEN
+    assert "熔断" in second["last_a2a_result"]
+    assert not a2a_agent.a2a_breakers.available("weather")
+
+
+def test_retry_budget_counts_only_original_calls(monkeypatch):
+    monkeypatch.setenv("A2A_MAX_RETRIES", "3")
+    monkeypatch.setenv("A2A_RETRY_BASE_DELAY", "0")
+    monkeypatch.setenv("A2A_BREAKER_MIN_CALLS", "100")
+    client = _FailingClient()
+    monkeypatch.setattr(a2a_agent, "a2a_breakers", CircuitBreakerRegistry())
+    monkeypatch.setattr(a2a_agent, "get_a2a_http_client", lambda base_url: client)
+    agent = A2AAgentInfo(agent_id="weather", name="Weather", description="", base_url="http://a2a.local")
+
+    asyncio.run(a2a_agent_node(_state(), {}, agent))
+    # 一次原始调用加两次重试
+    assert client.calls == 3
+    assert a2a_agent.a2a_breakers.retry_budget("weather").stats() == {"calls": 1, "retries": 2}
+
+
+def test_application_errors_are_not_retried_or_counted(monkeypatch):
+    monkeypatch.setenv("A2A_MAX_RETRIES", "3")
+    monkeypatch.setenv("A2A_RETRY_BASE_DELAY", "0")
+    monkeypatch.setenv("A2A_BREAKER_MIN_CALLS", "2")
+    # 错误信息中含 "connect" 字样，但属于智能体返回的业务错误
+    client = _FailingClient(error_msg="请求异常: A2A 智能体返回错误: cannot connect to database", retryable=False)
+    monkeypatch.setattr(a2a_agent, "a2a_breakers", CircuitBreakerRegistry())
+    monkeypatch.setattr(a2a_agent, "get_a2a_http_client", lambda base_url: client)
+    agent = A2AAgentInfo(agent_id="weather", name="Weather", description="", base_url="http://a2a.local")
+
+    async def run():
+        for _ in range(3):
+            await a2a_agent_node(_state(), {}, agent)
+
+    asyncio.run(run())
+    # 每个会话只调用一次，熔断器保持关闭
+    assert client.calls == 3
+    breaker = a2a_agent.a2a_breakers.breaker("weather")
+    assert breaker.state == CLOSED
+    assert breaker.stats()["failures"] == 0
+
+
+def test_transport_errors_are_classified_by_type():
+    assert a2a_agent._is_transport_error(asyncio.TimeoutError())
+    assert a2a_agent._is_transport_error(aiohttp.ServerDisconnectedError())
+    assert a2a_agent._is_transport_error(a2a_agent.A2AHTTPError(503, "unavailable"))
+    assert not a2a_agent._is_transport_error(a2a_agent.A2AHTTPError(500, "timeout in handler"))
+    assert not a2a_agent._is_transport_error(ConnectionError("A2A 智能体返回错误: connect failed"))
+    assert not a2a_agent._is_transport_error(None)
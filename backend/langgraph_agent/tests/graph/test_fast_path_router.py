@@ -0,0 +1,77 @@
+"""
+测试 supervisor 快速路由：确定性转移跳过 LLM，存在歧义时回退
+"""
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+import langgraph_agent.graph.graph as graph_module
+from langgraph_agent.graph.fast_path import REPORT_COMPLETED_KEY, FastPathRouter
+from langgraph_agent.graph.graph import AgentGraph
+
+
+def _reporter_state(completed=True, content="报告已生成"):
+    additional_kwargs = {REPORT_COMPLETED_KEY: True} if completed else {}
+    return {
+        "messages": [HumanMessage(content="写报告")],
+        "inner_messages": [
+            HumanMessage(content="写报告"),
+            AIMessage(content=content, name="reporter", additional_kwargs=additional_kwargs),
+        ],
+        "logs": [],
+    }
+
+
+def test_reporter_finished_goes_to_finish():
+    router = FastPathRouter(enabled=True)
+    decision = router.route(_reporter_state())
+    assert decision.next == "FINISH" and decision.rule == "reporter_finished"
+
+    # 只依据完成标记，不依据消息文本
+    assert router.route(_reporter_state(content="reporter智能体的报告")).next == "FINISH"
+    # reporter 生成失败（无完成标记）时交给 LLM 决策
+    assert router.route(_reporter_state(completed=False)) is None
+    # 其他智能体的回答不能确定下一步
+    state = _reporter_state()
+    state["inner_messages"][-1] = AIMessage(content="今日金价 600 元/克", name="researcher")
+    assert router.route(state) is None
+
+
+def test_supervisor_finishes_without_llm_call(monkeypatch):
+    async def emit_state(config, state):
+        pass
+
+    async def send_temp_message(*args, **kwargs):
+        pass
+
+    def no_llm(state, config):
+        raise AssertionError("快速路由命中时不应调用 supervisor LLM")
+
+    class FakeMCPClient:
+        async def get_tools(self):
+            return []
+
+    router = FastPathRouter(enabled=True)
+    monkeypatch.setattr(graph_module, "fast_path_router", router)
+    monkeypatch.setattr(graph_module, "copilotkit_emit_state", emit_state)
+    monkeypatch.setattr(graph_module, "send_temp_message_to_frontend", send_temp_message)
+    monkeypatch.setattr(graph_module, "get_llm_client", no_llm)
+    graph = AgentGraph.__new__(AgentGraph)
+    graph.mcp_client = FakeMCPClient()
+
+    command = asyncio.run(graph.supervisor_node(_reporter_state(), {}))
+    assert command.goto == "__end__"
+    assert command.update["inner_messages"][-1].content == "任务已完成"
+    assert router.stats()["rules"] == {"reporter_finished": 1}
+
+
+def test_stats_and_disabled():
+    router = FastPathRouter(enabled=True)
+    router.route(_reporter_state())
+    router.record_llm_decision()
+    stats = router.stats()
+    assert stats["fast_path"] == 1 and stats["llm"] == 1
+    assert stats["fast_path_ratio"] == 0.5
+    assert stats["rules"] == {"reporter_finished": 1}
+
+    assert FastPathRouter(enabled=False).route(_reporter_state()) is None
@@ -0,0 +1,165 @@
+"""
+测试 initial_setup_node 的并发初始化阶段：阶段相互重叠执行，结果与顺序执行一致
+"""
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+import langgraph_agent.graph.graph as graph_module
+from langgraph_agent.graph.graph import AgentGraph
+
+STAGE_DELAY = 0.05
+ALIVE_SANDBOXES = {"sbx-alive"}
+
+
+class _Tracker:
+    """记录同时运行的阶段数"""
+
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+
+    async def run(self, delay=STAGE_DELAY):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(delay)
+        self.running -= 1
+
+
+def _install_fakes(monkeypatch, tracker):
+    agents = [{"agent_id": "a1", "name": "weather"}]
+
+    class FakeDirectory:
+        async def get_agents(self, a2a_config):
+            await tracker.run()
+            return list(agents)
+
+    class FakeMCPClient:
+        async def start(self, mcp_config):
+            await tracker.run()
+
+    class FakeConfig:
+        async def load_mcp_config(self):
+            return {}
+
+    class FakeSandboxManager:
+        async def get_sandbox_async(self, state):
+            await tracker.run()
+            # 与 SandboxManager 一致：能连接到已有沙箱时复用，否则创建新沙箱
+            sandbox_id = state["e2b_sandbox_id"] if state["e2b_sandbox_id"] in ALIVE_SANDBOXES else "sbx-new"
+            state["e2b_sandbox_id"] = sandbox_id
+            return state, type("Sandbox", (), {"sandbox_id": sandbox_id})()
+
+    class FakeA2AManager:
+        def preload_a2a_agents(self, state):
+            pass
+
+    async def fake_process_a2a_agents(state):
+        return state
+
+    async def fake_process_attachment(state, config):
+        await tracker.run()
+        state["inner_messages"].append(
+            AIMessage(content=f"附件 {state['files']} @ {state['e2b_sandbox_id']}", name="attachment")
+        )
+        state["logs"].append({"message": "附件解析完成", "done": True})
+        return state
+
+    async def fake_add_dynamic_a2a_nodes(state, config):
+        pass
+
+    monkeypatch.setattr(graph_module, "global_config", FakeConfig())
+    monkeypatch.setattr(graph_module, "sbx_manager", FakeSandboxManager())
+    monkeypatch.setattr(graph_module, "process_a2a_agents", fake_process_a2a_agents)
+    monkeypatch.setattr(graph_module, "process_attachment", fake_process_attachment)
+
+    graph = AgentGraph.__new__(AgentGraph)
+    graph.a2a_directory = FakeDirectory()
+    graph.a2a_config = {}
+    graph.mcp_client = FakeMCPClient()
+    graph.a2a_manager = FakeA2AManager()
+    graph.add_dynamic_a2a_nodes = fake_add_dynamic_a2a_nodes
+    return graph
+
+
+def _input_state():
+    return {
+        "messages": [HumanMessage(content="总结附件")],
+        "files": ["report.pdf"],
+        "processed_files": [],
+        "logs": [],
+    }
+
+
+async def _sequential_setup(graph, state, config):
+    """并发改造前的顺序初始化流程"""
+    state = graph_module.create_initial_state(state)
+    state["inner_messages"] = list(state["messages"])
+    state["a2a_agents"] = await graph.a2a_directory.get_agents(graph.a2a_config)
+    await graph_module.process_a2a_agents(state)
+    await graph.mcp_client.start(await graph_module.global_config.load_mcp_config())
+    _, sbx = await graph_module.sbx_manager.get_sandbox_async(state)
+    state["e2b_sandbox_id"] = sbx.sandbox_id
+    await graph_module.process_attachment(state, config)
+    state["processed_files"] = list(state["files"])
+    return state
+
+
+def test_stages_overlap_and_match_sequential_result(monkeypatch):
+    tracker = _Tracker()
+    graph = _install_fakes(monkeypatch, tracker)
+    config = {"configurable": {"session_id": "s1"}}
+
+    command = asyncio.run(graph.initial_setup_node(_input_state(), config))
+    update = command.update
+    # a2a、mcp、sandbox 三个阶段同时运行
+    assert tracker.peak >= 3
+
+    expected = asyncio.run(_sequential_setup(graph, _input_state(), config))
+    for key in ("a2a_agents", "e2b_sandbox_id", "logs", "files", "processed_files"):
+        assert update[key] == expected[key], key
+    assert [m.content for m in update["inner_messages"]] == [m.content for m in expected["inner_messages"]]
+    assert update["inner_messages"][-1].content == "附件 ['report.pdf'] @ sbx-new"
+    assert update["session_id"] == "s1"
+
+
+def test_failed_stage_does_not_leak_partial_writes(monkeypatch):
+    tracker = _Tracker()
+    graph = _install_fakes(monkeypatch, tracker)
+
+    async def broken_attachment(state, config):
+        state["inner_messages"].append(AIMessage(content="半成品", name="attachment"))
+        raise RuntimeError("转换失败")
+
+    monkeypatch.setattr(graph_module, "process_attachment", broken_attachment)
+    update = asyncio.run(graph.initial_setup_node(_input_state(), {"configurable": {"session_id": "s1"}})).update
+
+    assert update["e2b_sandbox_id"] == "sbx-new"
+    assert [m.content for m in update["inner_messages"]] == ["总结附件"]
+    assert update["processed_files"] == []
+
+
+def test_resumed_sandbox_is_verified(monkeypatch):
+    graph = _install_fakes(monkeypatch, _Tracker())
+    config = {"configurable": {"session_id": "s1"}}
+
+    def resumed_state(sandbox_id):
+        state = _input_state()
+        state.update({"setup_completed": True, "session_id": "s1", "e2b_sandbox_id": sandbox_id})
+        return state
+
+    # 仍然存在的沙箱继续使用
+    update = asyncio.run(graph.initial_setup_node(resumed_state("sbx-alive"), config)).update
+    assert update["e2b_sandbox_id"] == "sbx-alive"
+    assert update["inner_messages"][-1].content == "附件 ['report.pdf'] @ sbx-alive"
+    # 已销毁的沙箱被替换，附件写入新沙箱
+    update = asyncio.run(graph.initial_setup_node(resumed_state("sbx-expired"), config)).update
+    assert update["e2b_sandbox_id"] == "sbx-new"
+    assert update["inner_messages"][-1].content == "附件 ['report.pdf'] @ sbx-new"
+
+
+def test_generated_session_id_uses_full_uuid(monkeypatch):
+    graph = _install_fakes(monkeypatch, _Tracker())
+    update = asyncio.run(graph.initial_setup_node(_input_state(), {"configurable": {}})).update
+    assert update["session_id"].startswith("session_")
+    assert len(update["session_id"]) == len("session_") + 32
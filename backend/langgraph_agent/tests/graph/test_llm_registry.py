@@ -0,0 +1,50 @@
+"""
+测试 LLMClientRegistry 按事件循环区分客户端与异步连接池
+"""
+import asyncio
+
+from langgraph_agent.graph.llm import LLMClientRegistry
+
+_SETTINGS = ("http://llm.local/v1", "test-model", "sk-test", 30, True)
+
+
+def test_client_reused_within_loop_and_isolated_across_loops():
+    registry = LLMClientRegistry()
+
+    async def get_twice():
+        first = registry.get(*_SETTINGS)
+        assert registry.get(*_SETTINGS) is first
+        return first
+
+    first = asyncio.run(get_twice())
+    second = asyncio.run(get_twice())
+    assert first is not second
+    assert first.http_async_client is not second.http_async_client
+    # 同步连接池在事件循环间共享
+    assert first.http_client is second.http_client
+    assert registry.metrics()["hits"] == 2
+
+
+def test_aclose_only_closes_current_loop_pools():
+    registry = LLMClientRegistry()
+
+    async def get():
+        return registry.get(*_SETTINGS)
+
+    # 保持另一个事件循环存活，模拟其他线程仍在使用
+    other_loop = asyncio.new_event_loop()
+    other = other_loop.run_until_complete(get())
+
+    async def get_and_close():
+        client = registry.get(*_SETTINGS)
+        await registry.aclose()
+        return client
+
+    try:
+        current = asyncio.run(get_and_close())
+    finally:
+        other_loop.close()
+    assert current.http_async_client.is_closed
+    assert not other.http_async_client.is_closed
+    # 其他事件循环的客户端仍在使用同步连接池
+    assert not other.http_client.is_closed
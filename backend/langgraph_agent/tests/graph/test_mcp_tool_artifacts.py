@@ -0,0 +1,54 @@
+"""
+测试 mcp_node 工具派生数据（schema、prompt）随 MCPConnectionManager.tools_version 失效
+"""
+from types import SimpleNamespace
+
+from langchain_core.tools import tool
+
+from langgraph_agent.graph.graph import AgentGraph
+
+
+@tool
+def web_search(query: str) -> str:
+    """Search the web"""
+    return query
+
+
+@tool
+def read_page(url: str) -> str:
+    """Read a web page"""
+    return url
+
+
+def _graph():
+    graph = AgentGraph.__new__(AgentGraph)
+    graph.mcp_client = SimpleNamespace(tools_version=1)
+    graph._mcp_tool_artifacts = None
+    return graph
+
+
+def test_artifacts_cached_until_tools_version_changes():
+    graph = _graph()
+
+    artifacts = graph._get_mcp_tool_artifacts([web_search])
+    assert [s["function"]["name"] for s in artifacts["tool_schemas"]] == ["web_search"]
+    # 版本不变时直接复用缓存，即使传入的工具列表不同
+    assert graph._get_mcp_tool_artifacts([web_search, read_page]) is artifacts
+
+    graph.mcp_client.tools_version = 2
+    rebuilt = graph._get_mcp_tool_artifacts([web_search, read_page])
+    assert rebuilt is not artifacts
+    assert rebuilt["version"] == 2
+    assert [t["name"] for t in rebuilt["prompt_tools"]] == ["web_search", "read_page"]
+
+
+def test_prompt_cache_is_dropped_with_artifacts():
+    graph = _graph()
+    artifacts = graph._get_mcp_tool_artifacts([web_search])
+    prompt = graph._get_mcp_tools_prompt(artifacts, [])
+    assert "web_search" in prompt and "read_page" not in prompt
+    assert graph._get_mcp_tools_prompt(artifacts, []) is prompt
+
+    graph.mcp_client.tools_version = 2
+    artifacts = graph._get_mcp_tool_artifacts([web_search, read_page])
+    assert "read_page" in graph._get_mcp_tools_prompt(artifacts, [])
@@ -0,0 +1,111 @@
+"""
+测试 tool_executor_node 的并发工具调用：state 副本的合并、结果顺序与全局并发上限
+"""
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+import langgraph_agent.graph.graph as graph_module
+from langgraph_agent.graph.graph import AgentGraph
+
+
+class _FakeTool:
+    """按给定延迟完成的假工具，记录并发数并写入 state"""
+
+    def __init__(self, name, delay, scalar=None, probe=None):
+        self.name = name
+        self.delay = delay
+        self.scalar = scalar
+        self.probe = probe
+
+    async def ainvoke(self, args, config=None):
+        state = args["state"]
+        if self.probe is not None:
+            self.probe["running"] += 1
+            self.probe["peak"] = max(self.probe["peak"], self.probe["running"])
+        log_entry = {"message": f"{self.name} 开始", "done": False}
+        state["logs"].append(log_entry)
+        await asyncio.sleep(self.delay)
+        log_entry["done"] = True
+        state["temporary_images"].append(f"{self.name}.png")
+        state["structure_tool_results"][self.name] = [self.name]
+        if self.scalar is not None:
+            state["current_agent"] = self.scalar
+        if self.probe is not None:
+            self.probe["running"] -= 1
+        return state, f"{self.name} 结果"
+
+
+def _graph(tools):
+    graph = AgentGraph.__new__(AgentGraph)
+    graph.tools_by_name = {tool.name: tool for tool in tools}
+    return graph
+
+
+def _state():
+    return {
+        "messages": [HumanMessage(content="查询"), AIMessage(content="")],
+        "inner_messages": [],
+        "logs": [],
+        "temporary_images": [],
+        "structure_tool_results": {},
+        "current_agent": "researcher",
+    }
+
+
+def _calls(*names):
+    return [{"name": name, "args": {}, "id": f"call_{name}"} for name in names]
+
+
+def test_batch_merges_in_call_order():
+    # 第一个调用最慢，完成顺序与调用顺序相反
+    graph = _graph([_FakeTool("a", 0.05, scalar="a"), _FakeTool("b", 0.02, scalar="b"), _FakeTool("c", 0.0)])
+    state = _state()
+    logs = state["logs"]
+
+    state, results = asyncio.run(graph._execute_tool_batch(_calls("a", "b", "c"), state, {}))
+
+    assert [message.tool_call_id for message, _ in results] == ["call_a", "call_b", "call_c"]
+    assert [message.content for message, _ in results] == ["a 结果", "b 结果", "c 结果"]
+    # 日志共享同一个列表，并发调用中更新的日志条目直接可见
+    assert state["logs"] is logs
+    assert len(logs) == 3 and all(entry["done"] for entry in logs)
+    # 列表字段按调用顺序追加，字典字段合并
+    assert state["temporary_images"] == ["a.png", "b.png", "c.png"]
+    assert state["structure_tool_results"] == {"a": ["a"], "b": ["b"], "c": ["c"]}
+    # 冲突的标量写入按调用顺序，后面的调用生效
+    assert state["current_agent"] == "b"
+    # 消息列表不受并发调用影响
+    assert len(state["messages"]) == 2
+
+
+def test_forked_state_isolates_lists():
+    state = _state()
+    forked = AgentGraph._fork_tool_state(state)
+    forked["messages"].append(AIMessage(content="x"))
+    forked["structure_tool_results"]["x"] = []
+
+    assert forked["logs"] is state["logs"]
+    assert len(state["messages"]) == 2
+    assert state["structure_tool_results"] == {}
+
+    AgentGraph._merge_tool_states(state, [forked])
+    assert len(state["messages"]) == 3
+    assert state["structure_tool_results"] == {"x": []}
+
+
+def test_concurrency_limit_is_shared_across_batches(monkeypatch):
+    monkeypatch.setenv("TOOL_EXECUTOR_MAX_CONCURRENCY", "2")
+    monkeypatch.setattr(graph_module, "_tool_call_limiters", {})
+    probe = {"running": 0, "peak": 0}
+    graph = _graph([_FakeTool(name, 0.02, probe=probe) for name in ("a", "b", "c")])
+
+    async def run():
+        # 两个会话同时执行并发批次
+        await asyncio.gather(
+            graph._execute_tool_batch(_calls("a", "b", "c"), _state(), {}),
+            graph._execute_tool_batch(_calls("a", "b", "c"), _state(), {}),
+        )
+
+    asyncio.run(run())
+    assert probe["peak"] == 2
@@ -0,0 +1,96 @@
+"""
+测试 mcp_executor_node 的并发工具调用：同一服务器的并发数受 max_concurrency 限制（跨会话共享），结果按原始顺序写入
+"""
+import asyncio
+
+from langchain_core.messages import ToolMessage
+
+import langgraph_agent.graph.graph as graph_module
+from langgraph_agent.graph.graph import AgentGraph
+from langgraph_agent.graph.mcp_client import MCPConnectionManager
+
+TOOL_SERVERS = {"search": "serper", "fetch": "jina"}
+
+
+class _FakeTool:
+    def __init__(self, name, probe):
+        self.name = name
+        self.probe = probe
+
+    async def ainvoke(self, arguments):
+        server = TOOL_SERVERS[self.name]
+        running = self.probe.setdefault(server, {"running": 0, "peak": 0})
+        running["running"] += 1
+        running["peak"] = max(running["peak"], running["running"])
+        await asyncio.sleep(0.02)
+        running["running"] -= 1
+        return f"{self.name}: {arguments['query']}"
+
+
+def _graph(monkeypatch, probe):
+    async def noop(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(graph_module, "copilotkit_emit_state", noop)
+    monkeypatch.setattr(graph_module, "send_temp_tool_call_to_frontend", noop)
+
+    manager = MCPConnectionManager()
+    manager.server_config = {"serper": {"max_concurrency": 1}, "jina": {"max_concurrency": 2}}
+    manager.tool_server_map = dict(TOOL_SERVERS)
+    tools = {name: _FakeTool(name, probe) for name in TOOL_SERVERS}
+
+    async def get_tool_by_name(tool_name, force_refresh=False):
+        return tools.get(tool_name)
+
+    manager.get_tool_by_name = get_tool_by_name
+    graph = AgentGraph.__new__(AgentGraph)
+    graph.mcp_client = manager
+    return graph
+
+
+def _state(session):
+    calls = [("search", "金价"), ("fetch", "a"), ("search", "油价"), ("fetch", "b"), ("fetch", "c")]
+    return {
+        "mcp_tool_executor_data": [
+            {"id": f"{session}-ai", "name": name, "arguments": {"query": query}, "tool_call_id": f"{session}-{index}"}
+            for index, (name, query) in enumerate(calls)
+        ],
+        "logs": [{"message": "MCP智能体执行中", "done": False, "sub_logs": []}],
+        "log_index": 0,
+    }
+
+
+def test_per_server_limit_is_enforced_across_sessions(monkeypatch):
+    probe = {}
+    graph = _graph(monkeypatch, probe)
+
+    async def run():
+        # 两个会话同时执行 MCP 工具调用
+        return await asyncio.gather(
+            graph.mcp_executor_node(_state("s1"), {}),
+            graph.mcp_executor_node(_state("s2"), {}),
+        )
+
+    commands = asyncio.run(run())
+    assert probe["serper"]["peak"] == 1
+    assert probe["jina"]["peak"] == 2
+
+    # 工具结果按原始调用顺序写入
+    tool_messages = [m for m in commands[0].update["messages"] if isinstance(m, ToolMessage)]
+    assert [m.tool_call_id for m in tool_messages] == [f"s1-{i}" for i in range(5)]
+    assert tool_messages[0].content == "search: 金价"
+    assert all(r["status"] == "success" for r in commands[0].update["mcp_tool_execution_results"])
+
+
+def test_limit_follows_config_changes():
+    manager = MCPConnectionManager()
+    manager.server_config = {"serper": {"max_concurrency": 1}}
+
+    async def run():
+        first = manager.get_server_semaphore("serper")
+        assert manager.get_server_semaphore("serper") is first
+        manager.server_config = {"serper": {"max_concurrency": 3}}
+        return first, manager.get_server_semaphore("serper")
+
+    first, second = asyncio.run(run())
+    assert second is not first
@@ -0,0 +1,74 @@
+"""
+测试 mcp-remote stdio 桥接配置到 streamable_http 直连配置的改写
+"""
+import pytest
+
+from langgraph_agent.config import Config, global_config
+
+URL = "http://127.0.0.1:7801/mcp"
+
+
+def _bridge(*args, **extra):
+    return {"transport": "stdio", "command": "npx", "args": ["-y", "mcp-remote", *args], **extra}
+
+
+@pytest.mark.parametrize(
+    "conn, expected",
+    [
+        # 最简单的桥接：只有 URL
+        (_bridge(URL), {"transport": "streamable_http", "url": URL}),
+        # --header 解析为 headers，值中的冒号保留
+        (
+            _bridge(URL, "--header", "Authorization: Bearer a:b", "--header", "X-Trace:1"),
+            {"transport": "streamable_http", "url": URL,
+             "headers": {"Authorization": "Bearer a:b", "X-Trace": "1"}},
+        ),
+        # --header 写在 URL 之前也能识别 URL
+        (
+            _bridge("--header", "X-Trace:1", URL),
+            {"transport": "streamable_http", "url": URL, "headers": {"X-Trace": "1"}},
+        ),
+        # 扩展字段保留，command/env/cwd 等 stdio 字段丢弃
+        (
+            _bridge(URL, env={"A": "1"}, cwd="/tmp", max_concurrency=2, tool_timeout=30),
+            {"transport": "streamable_http", "url": URL, "max_concurrency": 2, "tool_timeout": 30},
+        ),
+        # 非 stdio 传输不改写
+        ({"transport": "sse", "url": URL}, None),
+        # 普通 stdio 服务不改写
+        ({"transport": "stdio", "command": "python", "args": ["server.py"]}, None),
+        # 缺少 URL 不改写
+        (_bridge("--header", "X-Trace:1"), None),
+        # mcp-remote 之前的参数不作为 URL
+        ({"transport": "stdio", "command": "npx", "args": [URL, "mcp-remote"]}, None),
+    ],
+)
+def test_mcp_remote_to_streamable_http(conn, expected):
+    assert Config._mcp_remote_to_streamable_http(conn) == expected
+
+
+@pytest.mark.parametrize(
+    "prefixes, converted",
+    [
+        ("joinai-", {"joinai-serper"}),
+        ("joinai-, other-", {"joinai-serper", "other-search"}),
+        ("", set()),
+        (" , ", set()),
+    ],
+)
+def test_use_native_http_transport_respects_prefixes(monkeypatch, prefixes, converted):
+    monkeypatch.setattr(global_config, "MCP_NATIVE_HTTP_PREFIXES", prefixes)
+    config_data = {
+        "joinai-serper": _bridge(URL),
+        "other-search": _bridge(URL),
+        "joinai-local": {"transport": "stdio", "command": "python", "args": ["server.py"]},
+    }
+
+    result = global_config._use_native_http_transport(config_data)
+
+    assert list(result) == list(config_data)
+    for name, conn in result.items():
+        if name in converted:
+            assert conn["transport"] == "streamable_http" and conn["url"] == URL
+        else:
+            assert conn is config_data[name]
@@ -0,0 +1,85 @@
+"""
+测试 MCPSessionPool 的会话复用、并发上限与失效会话丢弃
+"""
+import asyncio
+
+import pytest
+
+import langgraph_agent.graph.mcp_session as mcp_session
+from langgraph_agent.graph.mcp_session import MCPSessionPool
+
+
+class _FakeClientSession:
+    def __init__(self, owner):
+        self.owner = owner
+
+    async def call_tool(self, name, arguments=None, **kwargs):
+        if name == "broken":
+            raise ConnectionError("transport closed")
+        if name == "invalid":
+            raise ValueError("invalid arguments")
+        await asyncio.sleep(0.01)
+        return {"session": self.owner.index, "tool": name}
+
+    async def send_ping(self):
+        return None
+
+
+class _FakeServerSession:
+    created = []
+
+    def __init__(self, server_name, connection, on_tools_changed=None):
+        self.index = len(_FakeServerSession.created)
+        self.session = None
+        self.closed = False
+        _FakeServerSession.created.append(self)
+
+    @property
+    def is_open(self):
+        return self.session is not None and not self.closed
+
+    async def open(self):
+        self.session = _FakeClientSession(self)
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_sessions(monkeypatch):
+    _FakeServerSession.created = []
+    monkeypatch.setattr(mcp_session, "MCPServerSession", _FakeServerSession)
+    return _FakeServerSession.created
+
+
+def test_sessions_are_reused_and_bounded(fake_sessions):
+    async def run():
+        pool = MCPSessionPool("joinai-web", {}, size=2)
+        results = await asyncio.gather(*(pool.proxy.call_tool("web_search", {}) for _ in range(6)))
+        return pool, results
+
+    pool, results = asyncio.run(run())
+    # 6 次调用最多只建立 2 个会话
+    assert len(fake_sessions) == 2
+    assert {r["session"] for r in results} <= {0, 1}
+    stats = pool.stats()
+    assert stats["checkouts"] == 6
+    assert stats["in_use"] == 0 and stats["idle"] == 2
+
+
+def test_broken_session_is_discarded(fake_sessions):
+    async def run():
+        pool = MCPSessionPool("joinai-web", {}, size=1)
+        with pytest.raises(ValueError):
+            await pool.proxy.call_tool("invalid", {})
+        # 业务错误不影响会话复用
+        assert len(fake_sessions) == 1
+        with pytest.raises(ConnectionError):
+            await pool.proxy.call_tool("broken", {})
+        assert fake_sessions[0].closed
+        result = await pool.proxy.call_tool("web_search", {})
+        return pool, result
+
+    pool, result = asyncio.run(run())
+    assert result["session"] == 1
+    assert pool.stats()["discarded"] == 1
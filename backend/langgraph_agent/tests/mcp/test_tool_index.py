@@ -0,0 +1,84 @@
+"""
+测试 MCPConnectionManager 的工具名称索引与关键词搜索索引
+"""
+import asyncio
+from types import SimpleNamespace
+
+from langgraph_agent.graph.mcp_client import MCPConnectionManager
+
+
+def _tool(name, description=""):
+    return SimpleNamespace(name=name, description=description)
+
+
+def _manager(tools, server="joinai-web"):
+    manager = MCPConnectionManager()
+    # 只测试索引，不建立真实连接
+    manager.client = object()
+    manager.server_config = {server: {}}
+    manager.server_tools = {server: tools}
+    manager._rebuild_tools()
+    return manager
+
+
+def test_lookup_uses_index_without_copy():
+    tools = [_tool("web_search", "Search the web"), _tool("jina_reader", "Read a web page")]
+    manager = _manager(tools)
+
+    assert asyncio.run(manager.get_tool_by_name("jina_reader")) is tools[1]
+    assert asyncio.run(manager.get_tool_by_name("missing")) is None
+    assert asyncio.run(manager.get_tools()) is manager.tools_cache
+
+    found = asyncio.run(manager.get_tools_by_names(["web_search", "missing"]))
+    assert found == {"web_search": tools[0], "missing": None}
+
+
+def test_version_only_changes_with_tool_set():
+    tools = [_tool("web_search"), _tool("jina_reader")]
+    manager = _manager(tools)
+    version = manager.tools_version
+
+    manager._set_tools(list(tools), {tool.name: "joinai-web" for tool in tools})
+    assert manager.tools_version == version
+
+    manager._set_tools(tools[:1], {"web_search": "joinai-web"})
+    assert manager.tools_version == version + 1
+    assert set(manager.get_tool_index()) == {"web_search"}
+
+
+def test_search_uses_prebuilt_lowercase_index():
+    tools = [_tool("Web_Search", "Search the WEB"), _tool("file_reader", "Read files from the Web")]
+    manager = _manager(tools)
+
+    assert asyncio.run(manager.search_tools("web")) == tools
+    assert asyncio.run(manager.search_tools("WEB", search_in_description=False)) == tools[:1]
+
+    # 缓存结果返回副本，调用方修改不影响后续搜索
+    result = asyncio.run(manager.search_tools("web"))
+    result.clear()
+    assert asyncio.run(manager.search_tools("web")) == tools
+
+    # 工具集变化后搜索缓存失效
+    manager._set_tools(tools[1:], {"file_reader": "joinai-file"})
+    assert asyncio.run(manager.search_tools("web")) == tools[1:]
+
+
+def test_degraded_server_keeps_other_tools():
+    web = [_tool("web_search")]
+    files = [_tool("file_reader")]
+    manager = MCPConnectionManager()
+    manager.client = object()
+    manager.server_config = {"joinai-web": {}, "joinai-file": {}}
+    manager.server_tools = {"joinai-web": web, "joinai-file": files}
+    manager._rebuild_tools()
+
+    # 未运行时只标记降级，不启动重连任务
+    manager._mark_degraded("joinai-file", "connection refused")
+    assert manager.get_degraded_servers() == {"joinai-file": "connection refused"}
+    assert asyncio.run(manager.get_tool_by_name("web_search")) is web[0]
+    # 降级服务器保留已缓存的工具
+    assert asyncio.run(manager.get_tool_by_name("file_reader")) is files[0]
+
+    health = manager.get_server_health()
+    assert health["joinai-file"]["degraded"] is True
+    assert health["joinai-web"]["degraded"] is False
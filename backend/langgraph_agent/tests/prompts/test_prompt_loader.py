@@ -0,0 +1,59 @@
+"""
+测试 PromptLoader 的模板缓存与 mtime 失效
+"""
+import asyncio
+import os
+
+import langgraph_agent.prompts.loader as loader_module
+from langgraph_agent.prompts.loader import PromptLoader
+
+
+def _write(path, prompt, mtime):
+    path.write_text(f"prompt: |\n  {prompt}\n", encoding="utf-8")
+    os.utime(path, (mtime, mtime))
+
+
+def test_render_uses_cached_template(tmp_path, monkeypatch):
+    monkeypatch.setattr(loader_module, "PROMPT_MTIME_CHECK_INTERVAL", 0)
+    template = tmp_path / "greet.yaml"
+    _write(template, "Hello {{ name }}", 1_000_000)
+
+    loader = PromptLoader(str(tmp_path))
+    assert loader.precompile() == 1
+    entry = loader._cache["greet.yaml"]
+
+    assert asyncio.run(loader.render("greet.yaml", {"name": "JoinAI"})) == "Hello JoinAI"
+    assert asyncio.run(loader.render("greet.yaml")) == "Hello {{ name }}\n"
+    # 文件未变更时复用同一缓存条目
+    assert loader._cache["greet.yaml"] is entry
+
+
+def test_mtime_change_reloads_and_notifies(tmp_path, monkeypatch):
+    monkeypatch.setattr(loader_module, "PROMPT_MTIME_CHECK_INTERVAL", 0)
+    template = tmp_path / "greet.yaml"
+    _write(template, "Hello {{ name }}", 1_000_000)
+
+    loader = PromptLoader(str(tmp_path))
+    reloaded = []
+    loader.add_reload_listener(reloaded.append)
+    assert asyncio.run(loader.render("greet.yaml", {"name": "a"})) == "Hello a"
+
+    _write(template, "Hi {{ name }}", 1_000_100)
+    assert asyncio.run(loader.render("greet.yaml", {"name": "a"})) == "Hi a"
+    assert reloaded == ["greet.yaml"]
+    assert loader.load_simple_prompt_sync("greet.yaml") == "Hi {{ name }}\n"
+
+
+def test_sync_load_checks_mtime(tmp_path, monkeypatch):
+    monkeypatch.setattr(loader_module, "PROMPT_MTIME_CHECK_INTERVAL", 0)
+    template = tmp_path / "greet.yaml"
+    _write(template, "Hello", 1_000_000)
+
+    loader = PromptLoader(str(tmp_path))
+    reloaded = []
+    loader.add_reload_listener(reloaded.append)
+    assert loader.load_simple_prompt_sync("greet.yaml") == "Hello\n"
+
+    _write(template, "Hi", 1_000_100)
+    assert loader.load_simple_prompt_sync("greet.yaml") == "Hi\n"
+    assert reloaded == ["greet.yaml"]
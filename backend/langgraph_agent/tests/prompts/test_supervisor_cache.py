@@ -0,0 +1,44 @@
+"""
+测试 supervisor prompt 与 Router 类的指纹缓存
+"""
+import asyncio
+
+import langgraph_agent.prompts.builders.supervisor_builder as supervisor_builder
+from langgraph_agent.prompts.builders.supervisor_builder import (
+    clear_supervisor_cache,
+    create_dynamic_router,
+    generate_supervisor_prompt,
+)
+
+A2A_AGENTS = [{"agent_id": "weather", "name": "weather", "desc": "天气查询"}]
+MCP_TOOLS = [{"name": "web_search", "description": "Search the web"}]
+
+
+def test_prompt_is_rendered_once_per_fingerprint(monkeypatch):
+    clear_supervisor_cache()
+    calls = []
+
+    async def fake_generate(self, a2a_agents=None, mcp_tools=None):
+        calls.append(1)
+        return f"prompt-{len(calls)}"
+
+    monkeypatch.setattr(supervisor_builder.SupervisorPromptBuilder, "generate_prompt", fake_generate)
+
+    first = asyncio.run(generate_supervisor_prompt(A2A_AGENTS, MCP_TOOLS))
+    # 内容相同的新列表命中缓存
+    second = asyncio.run(generate_supervisor_prompt([dict(A2A_AGENTS[0])], [dict(MCP_TOOLS[0])]))
+    assert first == second == "prompt-1"
+    assert len(calls) == 1
+
+    asyncio.run(generate_supervisor_prompt(A2A_AGENTS, []))
+    assert len(calls) == 2
+
+
+def test_router_class_is_reused():
+    clear_supervisor_cache()
+    router = create_dynamic_router(A2A_AGENTS, MCP_TOOLS)
+    assert create_dynamic_router(A2A_AGENTS, MCP_TOOLS) is router
+    assert create_dynamic_router(A2A_AGENTS, []) is not router
+
+    parsed = router(next="a2a_weather", sub_task="查询天气", final_answer="")
+    assert parsed.next == "a2a_weather"
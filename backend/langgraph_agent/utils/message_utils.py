@@ -1,4 +1,4 @@
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List, Tuple, Any, Iterable, Optional
 import re
 import json
 import logging
@@ -90,4 +90,18 @@ def get_last_show_message_id(messages: List[BaseMessage]):
                 return message.id
             elif hasattr(message, "tool_calls") and not message.tool_calls:
                 return message.id
-    return messages[-1].id
\ No newline at end of file
+    return messages[-1].id
+# ---------------------------------------------------------------------------
+# 消息共享（copy-on-write）约定：
+# 节点之间传递的 BaseMessage 一律视为不可变值，列表只做浅拷贝以共享消息对象；
+# 需要修改内容时，通过 with_content 生成新对象，而不是原地修改或 deepcopy 整段历史。
+# ---------------------------------------------------------------------------
+
+def share_messages(messages: Optional[Iterable[BaseMessage]]) -> List[BaseMessage]:
+    """返回新的列表容器，内部消息对象与原列表共享（结构共享，O(n) 指针拷贝）"""
+    return list(messages or [])
+
+
+def with_content(message: BaseMessage, content: Any) -> BaseMessage:
+    """返回替换了 content 的新消息，原消息保持不变"""
+    return message.model_copy(update={"content": content})